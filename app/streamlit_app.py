@@ -4,9 +4,9 @@
 
 import os
 import sys
+import time
 import streamlit as st
 from dotenv import load_dotenv
-from openai import OpenAI
 
 # --- 🔥 FIX PYTHON PATH ---
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -22,19 +22,26 @@ from ui_text import (
     ANSWER_HEADER, CITATIONS_HEADER, CONTEXT_HEADER,
     BUILD_INDEX_BTN, SPINNER_INDEX, SPINNER_ANSWER,
     NEED_INDEX_WARNING, UPLOAD_SUCCESS, INDEX_SUCCESS,
-    NO_CITATIONS, FOOTER_NOTE
+    NO_CITATIONS, FOOTER_NOTE,
+    FILTER_HEADER, FILTER_SOURCES, FILTER_TAGS, FILTER_UPLOADED_AFTER,
+    TIMINGS_HEADER, SPINNER_EXPLORE, JOB_PROGRESS, JOB_FAILED, CANCEL_JOB_BTN,
+    NAMESPACE_LABEL, NAMESPACE_NEW, NAMESPACE_HELP,
 )
 
 # --- RAG core ---
 from rag_core.config import settings
 from rag_core.pipeline import Pipeline
-
-# ✅ Your structure: rag_core/retrieval/
-from rag_core.retrieval.vector_store import VectorStore
-from rag_core.retrieval.bm25_store import BM25Store
+from rag_core.llm import build_llm
+from rag_core.tracing import serve_prometheus
+from rag_core.retrieval.filters import MetadataFilter
+from rag_core.namespaces import get_pool, list_namespaces, namespace_dir, namespace_exists, raw_dir
+from rag_core.jobs import ACTIVE, JobQueue, ensure_worker
 
 load_dotenv()
 
+if int(getattr(settings, "METRICS_PORT", 0)) > 0:
+    serve_prometheus(int(settings.METRICS_PORT))
+
 # -------------------------
 # Streamlit page config
 # -------------------------
@@ -43,9 +50,6 @@ st.title(APP_TITLE)
 st.caption(APP_SUBTITLE)
 st.markdown(INTRO)
 
-RAW_DIR = os.path.join("data", "raw_pdfs")
-os.makedirs(RAW_DIR, exist_ok=True)
-
 # -------------------------
 # Helpers
 # -------------------------
@@ -59,40 +63,14 @@ def list_pdf_paths(folder: str):
     ])
 
 # -------------------------
-# LLM wrapper
+# LLM (rag_core/llm.py; prefer Streamlit secrets, else env)
 # -------------------------
-def build_llm():
-    # prefer Streamlit secrets, else env
-    api_key = ""
-    try:
-        api_key = (st.secrets.get("OPENAI_API_KEY", "") or "").strip()
-    except Exception:
-        api_key = ""
-
-    if not api_key:
-        api_key = os.getenv("OPENAI_API_KEY", "").strip()
-
-    if not api_key:
-        return None, "OPENAI_API_KEY missing. Set it in .env or Streamlit secrets."
-
-    client = OpenAI(api_key=api_key)
-    model = getattr(settings, "MODEL", "gpt-4o-mini")
-    temperature = float(getattr(settings, "OPENAI_TEMPERATURE", 0.2))
-
-    def _llm(prompt: str) -> str:
-        resp = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "You are a strict grounded QA assistant. Use ONLY provided context."},
-                {"role": "user", "content": prompt},
-            ],
-            temperature=temperature,
-        )
-        return resp.choices[0].message.content or ""
+try:
+    secret_key = (st.secrets.get("OPENAI_API_KEY", "") or "").strip()
+except Exception:
+    secret_key = ""
 
-    return _llm, None
-
-llm, llm_err = build_llm()
+llm, llm_err = build_llm(api_key=secret_key or None)
 if llm_err:
     st.error(llm_err)
     st.stop()
@@ -101,19 +79,37 @@ if llm_err:
 # Sidebar
 # -------------------------
 with st.sidebar:
+    # ✅ Namespace selector (each team has its own PDFs + indexes)
+    known = list_namespaces()
+    namespace = st.selectbox(NAMESPACE_LABEL, options=known, help=NAMESPACE_HELP)
+    new_ns = st.text_input(NAMESPACE_NEW, value="").strip()
+    if new_ns:
+        try:
+            namespace_dir(new_ns)
+            namespace = new_ns
+        except ValueError as e:
+            st.error(str(e))
+
     st.header(SIDEBAR_TITLE)
     st.json({
         "ENABLE_HYBRID": getattr(settings, "ENABLE_HYBRID", True),
         "ENABLE_QUERY_EXPA": getattr(settings, "ENABLE_QUERY_EXPA", False),
         "ENABLE_RERANK": getattr(settings, "ENABLE_RERANK", False),
-        "ENABLE_SELF_RAG": getattr(settings, "ENABLE_SELF_RAG", False),
         "ENABLE_CRAG": getattr(settings, "ENABLE_CRAG", False),
+        "ENABLE_EVIDENCE_GATE": getattr(settings, "ENABLE_EVIDENCE_GATE", False),
         "TOP_K": getattr(settings, "TOP_K", 5),
         "ALPHA": getattr(settings, "ALPHA", 0.55),
         "MODEL": getattr(settings, "MODEL", "gpt-4o-mini"),
     })
+    st.json({
+        "namespace": namespace,
+        "pool": get_pool().stats(),
+        "llm_cache": llm.stats() if hasattr(llm, "stats") else "off",
+    })
     st.caption(FOOTER_NOTE)
 
+RAW_DIR = raw_dir(namespace)
+
 # -------------------------
 # Upload PDFs
 # -------------------------
@@ -121,6 +117,9 @@ st.subheader(UPLOAD_HEADER)
 uploads = st.file_uploader(UPLOAD_HELP, type=["pdf"], accept_multiple_files=True)
 
 if uploads:
+    # ✅ a new namespace is created by its first upload (not by typing its name)
+    os.makedirs(RAW_DIR, exist_ok=True)
+    os.makedirs(namespace_dir(namespace), exist_ok=True)
     for f in uploads:
         with open(os.path.join(RAW_DIR, f.name), "wb") as out:
             out.write(f.getbuffer())
@@ -132,62 +131,114 @@ if uploads:
 st.subheader(INDEX_HEADER)
 st.caption(INDEX_HELP)
 
-if st.button(BUILD_INDEX_BTN):
-    with st.spinner(SPINNER_INDEX):
-        try:
-            pdf_paths = list_pdf_paths(RAW_DIR)
-            if not pdf_paths:
-                st.error("No PDFs found in data/raw_pdfs. Upload at least one PDF first.")
-                st.stop()
+job_queue = JobQueue()
 
-            # ✅ DEBUG: check extraction (tell scanned vs text)
-            from rag_core.ingestion.pdf_loader import load_pdfs
-            debug_lines = []
-            for p in pdf_paths:
-                txt = load_pdfs(p, ocr=False, max_pages=2)  # first try WITHOUT OCR
-                preview = (txt[:500] + "..." if len(txt) > 500 else txt)
-                debug_lines.append((os.path.basename(p), len(txt), preview))
+# ✅ Stores come from the process-wide pool (loaded on demand, shared across sessions);
+#    a namespace that was only typed in is not opened (opening it would create its dirs)
+ns = get_pool().get(namespace) if namespace_exists(namespace) else None
+if ns is not None and not ns.ready:
+    ns = None
 
-            with st.expander("🔎 Debug: Extracted text preview (first 2 pages, no OCR)"):
-                for name, n_chars, preview in debug_lines:
-                    st.markdown(f"**{name}** → extracted chars: `{n_chars}`")
-                    st.code(preview if preview else "<<< EMPTY TEXT >>>")
-
-            # ✅ Build stores normally (DIRECT CALL)
-            vector_store = VectorStore()
-            bm25_store = BM25Store()
-
-            vector_store.build(RAW_DIR)
-            bm25_store.build(RAW_DIR)
-
-            st.session_state["vector_store"] = vector_store
-            st.session_state["bm25_store"] = bm25_store
-
-        except Exception as e:
-            st.error(f"Index build failed: {e}")
-            st.stop()
-
-    st.success(INDEX_SUCCESS)
+if st.button(BUILD_INDEX_BTN):
+    pdf_paths = list_pdf_paths(RAW_DIR)
+    if not pdf_paths:
+        st.error(f"No PDFs found in {RAW_DIR}. Upload at least one PDF first.")
+        st.stop()
+
+    # ✅ DEBUG: check extraction (tell scanned vs text)
+    from rag_core.ingestion.text_cache import cached_pages
+    debug_lines = []
+    with st.spinner(SPINNER_INDEX):
+        for p in pdf_paths:
+            pages = cached_pages(p, ocr=False, max_pages=2)  # first try WITHOUT OCR (served from the text cache)
+            txt = "\n\n".join(pg["text"] for pg in pages if pg["text"])
+            preview = (txt[:500] + "..." if len(txt) > 500 else txt)
+            methods = ", ".join(sorted({pg["method"] for pg in pages})) or "none"
+            debug_lines.append((os.path.basename(p), len(txt), methods, preview))
+
+    with st.expander("🔎 Debug: Extracted text preview (first 2 pages, no OCR)"):
+        for name, n_chars, methods, preview in debug_lines:
+            st.markdown(f"**{name}** → extracted chars: `{n_chars}` ({methods})")
+            st.code(preview if preview else "<<< EMPTY TEXT >>>")
+
+    # ✅ Build runs in a background worker; unchanged PDFs are not re-extracted
+    ensure_worker(job_queue)
+    st.session_state["index_job"] = job_queue.submit("update", pdf_paths, index_dir=namespace_dir(namespace))
+    st.session_state["index_job_ns"] = namespace
+
+# ✅ Poll the background index job
+job_id = st.session_state.get("index_job")
+job = job_queue.get(job_id) if job_id else None
+if job is not None:
+    prog = job.get("progress") or {}
+    n_done, n_total = len(prog.get("files_done", [])), int(prog.get("files_total", 0))
+    if job["status"] in ACTIVE:
+        eta = prog.get("eta_s")
+        st.progress(
+            n_done / max(1, n_total),
+            text=JOB_PROGRESS.format(
+                phase=prog.get("phase", job["status"]),
+                done=n_done,
+                total=n_total,
+                current=prog.get("current", ""),
+                eta=f"{eta:.0f}s" if eta is not None else "…",
+            ),
+        )
+        if st.button(CANCEL_JOB_BTN):
+            job_queue.cancel(job_id)
+        time.sleep(1.0)
+        st.rerun()
+    else:
+        st.session_state.pop("index_job", None)
+        job_ns = st.session_state.pop("index_job_ns", namespace)
+        get_pool().invalidate(job_ns)  # ✅ next get() reloads the rebuilt indexes
+        built = get_pool().get(job_ns) if job["status"] == "done" else None
+        if built is not None and built.ready:
+            # ✅ Optional per-document explore snapshots (served from cache later)
+            if getattr(settings, "EXPLORE_PRECOMPUTE", False):
+                with st.spinner(SPINNER_EXPLORE):
+                    Pipeline(built.vector_store, built.bm25_store, llm, raptor_index=built.raptor_index).warm_explore()
+            if job_ns == namespace:
+                ns = built
+            st.success(INDEX_SUCCESS)
+        else:
+            st.error(JOB_FAILED.format(status=job["status"], error=job.get("error", "")))
 
 # -------------------------
 # Ask Question
 # -------------------------
 st.subheader(QUERY_HEADER)
+
+# ✅ Metadata filters (pushed into both indexes)
+filters = None
+if ns is not None:
+    table = ns.bm25_store.sources
+    with st.expander(FILTER_HEADER):
+        pick_sources = st.multiselect(FILTER_SOURCES, options=table.sources)
+        pick_tags = st.multiselect(FILTER_TAGS, options=table.tags) if table.tags else []
+        pick_after = st.date_input(FILTER_UPLOADED_AFTER, value=None)
+    filters = MetadataFilter(
+        sources=pick_sources or None,
+        tags=pick_tags or None,
+        uploaded_after=pick_after.isoformat() if pick_after else None,
+    )
+
 query = st.text_input("Ask:", value="", placeholder=QUERY_PLACEHOLDER)
 
 if query:
-    if "vector_store" not in st.session_state or "bm25_store" not in st.session_state:
+    if ns is None:
         st.warning(NEED_INDEX_WARNING)
     else:
         pipeline = Pipeline(
-            vector_store=st.session_state["vector_store"],
-            bm25_store=st.session_state["bm25_store"],
+            vector_store=ns.vector_store,
+            bm25_store=ns.bm25_store,
             llm=llm,
+            raptor_index=ns.raptor_index,
         )
 
         with st.spinner(SPINNER_ANSWER):
             try:
-                answer, citations, docs = pipeline.run(query.strip())
+                answer, citations, docs = pipeline.run(query.strip(), filters=filters)
             except Exception as e:
                 st.error(f"Query failed: {e}")
                 st.stop()
@@ -202,6 +253,10 @@ if query:
         else:
             st.write(NO_CITATIONS)
 
+        if pipeline.last_trace is not None:
+            with st.expander(TIMINGS_HEADER):
+                st.json(pipeline.last_trace.breakdown())
+
         st.markdown(f"## {CONTEXT_HEADER}")
         for d in docs:
             src = getattr(d, "source", "unknown")
@@ -21,15 +21,30 @@ INDEX_HELP = "Build or refresh BM25 + Vector indexes."
 QUERY_HEADER = "3) Ask Questions"
 QUERY_PLACEHOLDER = "e.g., What is the notice period?"
 
+NAMESPACE_LABEL = "📚 Namespace"
+NAMESPACE_NEW = "New namespace"
+NAMESPACE_HELP = "Each namespace has its own PDFs and indexes."
+
+FILTER_HEADER = "🗂️ Filter documents"
+FILTER_SOURCES = "Only these PDFs"
+FILTER_TAGS = "Only these tags"
+FILTER_UPLOADED_AFTER = "Uploaded on/after"
+
 ANSWER_HEADER = "🧠 Answer"
 CITATIONS_HEADER = "📌 Citations"
 CONTEXT_HEADER = "🔎 Retrieved Context (debug)"
+TIMINGS_HEADER = "⏱️ Stage timings (debug)"
 
 NO_CITATIONS = "No citations available."
 
 BUILD_INDEX_BTN = "📌 Build/Refresh Index"
 SPINNER_INDEX = "Indexing PDFs..."
 SPINNER_ANSWER = "Thinking..."
+SPINNER_EXPLORE = "Preparing document snapshots..."
+
+JOB_PROGRESS = "Indexing ({phase}): {done}/{total} files • {current} • ETA {eta}"
+JOB_FAILED = "Index job {status}: {error}"
+CANCEL_JOB_BTN = "✖ Cancel indexing"
 
 NEED_INDEX_WARNING = "Please click **Build/Refresh Index** first."
 UPLOAD_SUCCESS = "PDFs saved successfully ✅"
@@ -0,0 +1,242 @@
+# rag_core/cli.py
+"""
+Command-line entry points for offline work (no browser needed).
+
+  rag-index build|update [--namespace NS] [--pdf-dir DIR] [--queue]
+      build or incrementally update a namespace's indexes in this process
+      (--queue hands the job to the background worker instead)
+
+  rag-query QUERIES_FILE [--out results.jsonl] [--namespace NS]
+            [--batch-size 64] [--concurrency 8] [--retrieve-only] [--resume]
+      answers one query per line: retrieval is batched (one index call per leg
+      per batch), LLM reranking and generation run on a bounded pool of
+      concurrent LLM calls, results are written as JSONL in input order with
+      per-query timings
+
+Also available as `python -m rag_core.cli index ...` / `... query ...`.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Set, Tuple
+
+from rag_core.config import settings
+from rag_core.logger import get_logger
+
+log = get_logger("rag.cli")
+
+
+def _read_queries(path: str) -> Iterator[Tuple[int, str]]:
+    """
+    (line number, query) for every non-empty line; '-' reads stdin.
+    """
+    f = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        for i, line in enumerate(f, 1):
+            q = line.strip()
+            if q:
+                yield i, q
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def _batches(items: Iterator, size: int) -> Iterator[list]:
+    batch: list = []
+    for it in items:
+        batch.append(it)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _done_lines(out_path: str) -> Set[int]:
+    done: Set[int] = set()
+    if not out_path or not os.path.exists(out_path):
+        return done
+    with open(out_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue  # partial last line of an interrupted run
+            if not row.get("error"):
+                done.add(int(row["line"]))
+    return done
+
+
+def _answer_one(pipeline, query: str, docs, retrieve_ms: float, generate: bool, route: Optional[dict] = None) -> dict:
+    from rag_core.tracing import trace
+
+    row = {"query": query, "answer": None, "citations": [], "sources": [], "error": ""}
+    with trace("cli_query") as tr:
+        try:
+            if not generate:
+                sent = pipeline.rerank(query, docs)
+            elif getattr(settings, "ENABLE_CRAG", False):
+                # CRAG re-retrieves on low confidence, so it runs its own loop
+                row["answer"], row["citations"], sent = pipeline.run(query)
+            else:
+                row["answer"], row["citations"], sent = pipeline.generate(query, pipeline.rerank(query, docs), route=route)
+            row["sources"] = [{"id": d.id, "source": d.source, "score": round(float(d.score), 6)} for d in sent]
+        except Exception as e:
+            row["error"] = f"{type(e).__name__}: {e}"
+    row["timings"] = {
+        "retrieve_ms": round(retrieve_ms, 3),
+        "generate_ms": round(tr.total_ms, 3),
+        "stages_ms": tr.breakdown()["stages_ms"],
+    }
+    return row
+
+
+def run_queries(
+    pipeline,
+    queries: Iterator[Tuple[int, str]],
+    out,
+    batch_size: int = 64,
+    concurrency: int = 8,
+    generate: bool = True,
+    skip: Optional[Set[int]] = None,
+) -> dict:
+    """
+    Batched retrieval + bounded concurrent generation; writes one JSON line per query.
+    Returns run totals.
+    """
+    skip = skip or set()
+    totals = {"queries": 0, "errors": 0, "skipped": 0, "wall_s": 0.0}
+    t_start = time.perf_counter()
+
+    def _todo() -> Iterator[Tuple[int, str]]:
+        for i, q in queries:
+            if i in skip:
+                totals["skipped"] += 1
+            else:
+                yield i, q
+
+    with ThreadPoolExecutor(max_workers=max(1, int(concurrency)), thread_name_prefix="llm") as pool:
+        for batch in _batches(_todo(), max(1, int(batch_size))):
+            lines, texts = [i for i, _ in batch], [q for _, q in batch]
+
+            t0 = time.perf_counter()
+            routes: List[Optional[dict]] = [None] * len(texts)
+            if generate and getattr(settings, "ENABLE_CRAG", False):
+                retrieved: List[list] = [[] for _ in texts]
+            else:
+                retrieved = pipeline.retrieve_batch(texts, rerank=False)  # LLM rerank runs in the pool below
+                routes = list(getattr(pipeline, "last_routes", None) or routes)
+            per_query_ms = (time.perf_counter() - t0) * 1000 / len(texts)
+
+            futures = [
+                pool.submit(_answer_one, pipeline, q, docs, per_query_ms, generate, route)
+                for q, docs, route in zip(texts, retrieved, routes)
+            ]
+            for line, fut in zip(lines, futures):
+                row = {"line": line, **fut.result()}
+                out.write(json.dumps(row, ensure_ascii=False) + "\n")
+                totals["queries"] += 1
+                totals["errors"] += bool(row["error"])
+            out.flush()
+            log.info("answered %d queries (%d errors)", totals["queries"], totals["errors"])
+
+    totals["wall_s"] = round(time.perf_counter() - t_start, 3)
+    return totals
+
+
+def index_main(argv: Optional[List[str]] = None) -> int:
+    from rag_core.namespaces import namespace_dir, raw_dir
+
+    ap = argparse.ArgumentParser(prog="rag-index", description="Build or update a namespace's indexes.")
+    ap.add_argument("kind", choices=["build", "update"], help="build re-extracts every PDF; update reuses unchanged ones")
+    ap.add_argument("--namespace", default="default")
+    ap.add_argument("--pdf-dir", default=None, help="default: the namespace's PDF folder")
+    ap.add_argument("--jobs-dir", default=None)
+    ap.add_argument("--queue", action="store_true", help="only queue the job for the background worker")
+    args = ap.parse_args(argv)
+
+    from rag_core.ingestion.corpus import resolve_pdf_paths
+    from rag_core.jobs import JobQueue, run_job
+
+    queue = JobQueue(args.jobs_dir)
+    pdf_paths = resolve_pdf_paths(args.pdf_dir or raw_dir(args.namespace))
+    job_id = queue.submit(args.kind, pdf_paths, index_dir=namespace_dir(args.namespace))
+    if args.queue:
+        print(job_id)
+        return 0
+
+    # run the job in this process (the claim keeps a background worker away from it)
+    job = queue.claim(job_id)
+    if job is None:
+        print(f"job {job_id} was taken by another process", file=sys.stderr)
+        return 1
+    job = run_job(queue, job)
+    print(json.dumps({"id": job_id, "status": job["status"], "result": job.get("result"), "error": job.get("error", "")}))
+    return 0 if job["status"] == "done" else 1
+
+
+def query_main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="rag-query", description="Answer a file of queries (one per line) into JSONL.")
+    ap.add_argument("queries", help="text file, one query per line ('-' = stdin)")
+    ap.add_argument("--out", default="-", help="JSONL output ('-' = stdout)")
+    ap.add_argument("--namespace", default="default")
+    ap.add_argument("--batch-size", type=int, default=64, help="queries per retrieval batch")
+    ap.add_argument("--concurrency", type=int, default=8, help="max concurrent LLM calls")
+    ap.add_argument("--retrieve-only", action="store_true", help="skip generation (no API key needed)")
+    ap.add_argument("--resume", action="store_true", help="skip lines already answered in --out (needs a file)")
+    args = ap.parse_args(argv)
+    if args.resume and args.out == "-":
+        ap.error("--resume needs --out FILE (answers written to stdout cannot be resumed)")
+
+    from rag_core.namespaces import open_namespace
+    from rag_core.pipeline import Pipeline
+
+    llm = None
+    if not args.retrieve_only:
+        from rag_core.llm import build_llm
+
+        llm, err = build_llm()
+        if llm is None:
+            print(err, file=sys.stderr)
+            return 2
+
+    ns = open_namespace(args.namespace)
+    if not ns.ready:
+        print(f"namespace {args.namespace!r} has no index; run rag-index first", file=sys.stderr)
+        return 2
+    pipeline = Pipeline(ns.vector_store, ns.bm25_store, llm, raptor_index=ns.raptor_index)
+
+    skip = _done_lines(args.out) if args.resume else set()
+    out = sys.stdout if args.out == "-" else open(args.out, "a" if args.resume else "w", encoding="utf-8")
+    try:
+        totals = run_queries(
+            pipeline,
+            _read_queries(args.queries),
+            out,
+            batch_size=args.batch_size,
+            concurrency=args.concurrency,
+            generate=not args.retrieve_only,
+            skip=skip,
+        )
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(json.dumps(totals), file=sys.stderr)
+    return 0 if totals["errors"] == 0 else 1
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or argv[0] not in ("index", "query"):
+        print("usage: python -m rag_core.cli {index,query} ...", file=sys.stderr)
+        return 2
+    return index_main(argv[1:]) if argv[0] == "index" else query_main(argv[1:])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
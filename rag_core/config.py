@@ -13,22 +13,110 @@ class Settings(BaseModel):
     ENABLE_HYBRID: bool = _env_bool("ENABLE_HYBRID", True)
     ENABLE_RERANK: bool = _env_bool("ENABLE_RERANK", False)
     ENABLE_QUERY_EXPANSION: bool = _env_bool("ENABLE_QUERY_EXPANSION", False)
-    ENABLE_SELF_RAG: bool = _env_bool("ENABLE_SELF_RAG", True)
-    ENABLE_CRAG: bool = _env_bool("ENABLE_CRAG", False)  # uses self-rag + retry loop
+    ENABLE_CRAG: bool = _env_bool("ENABLE_CRAG", False)  # confidence-gated corrective retrieval
+    ENABLE_EVIDENCE_GATE: bool = _env_bool("ENABLE_EVIDENCE_GATE", False)  # cosine pre-generation gate (opt-in)
 
     # retrieval params
     TOP_K: int = int(os.getenv("TOP_K", "5"))
     ALPHA: float = float(os.getenv("ALPHA", "0.55"))  # hybrid weight: vectors vs bm25
     QUERY_EXPANSION_N: int = int(os.getenv("QUERY_EXPANSION_N", "3"))
+    SELF_RAG_MIN_RELEVANCE: float = float(os.getenv("SELF_RAG_MIN_RELEVANCE", "0.15"))  # evidence gate: drop chunk below
+    SELF_RAG_MIN_SUFFICIENCY: float = float(os.getenv("SELF_RAG_MIN_SUFFICIENCY", "0.25"))  # evidence gate: else no LLM call
+    CRAG_CONFIDENCE: float = float(os.getenv("CRAG_CONFIDENCE", "0.45"))  # below -> escalate retrieval
+    ENABLE_ROUTER: bool = _env_bool("ENABLE_ROUTER", False)  # per-query leg skipping (retrieval/router.py)
+    ROUTER_EXIT_RATIO: float = float(os.getenv("ROUTER_EXIT_RATIO", "1.5"))  # BM25 top/runner-up -> skip vectors
+    ROUTER_LOG: str = os.getenv("ROUTER_LOG", "")  # append routing decisions as JSON lines
+    ENABLE_MMR: bool = _env_bool("ENABLE_MMR", False)  # query-time diversity filter
+    MMR_LAMBDA: float = float(os.getenv("MMR_LAMBDA", "0.7"))  # relevance vs diversity
+
+    # LLM reranking (see reranking/llm_reranker.py)
+    RERANK_POOL: int = int(os.getenv("RERANK_POOL", "20"))  # hybrid candidates handed to the reranker
+    RERANK_WINDOW: int = int(os.getenv("RERANK_WINDOW", "20"))  # passages per listwise prompt
+    RERANK_STRIDE: int = int(os.getenv("RERANK_STRIDE", "15"))  # window step (overlap = window - stride)
+    RERANK_WORKERS: int = int(os.getenv("RERANK_WORKERS", "4"))  # concurrent window prompts
+    RERANK_SENTENCES: int = int(os.getenv("RERANK_SENTENCES", "3"))  # query-relevant sentences kept; 0 = no trim
+
+    # BM25 analyzer (applies to newly built indexes)
+    BM25_STOPWORDS: bool = _env_bool("BM25_STOPWORDS", True)
+    BM25_STEMMER: str = os.getenv("BM25_STEMMER", "light")  # light | none
+    BM25_NGRAMS: int = int(os.getenv("BM25_NGRAMS", "1"))  # 2 adds word bigrams
 
     # chunking
     CHUNK_SIZE: int = int(os.getenv("CHUNK_SIZE", "800"))
     CHUNK_OVERLAP: int = int(os.getenv("CHUNK_OVERLAP", "200"))
+    ENABLE_PARENT_CHILD: bool = _env_bool("ENABLE_PARENT_CHILD", False)  # index small children, answer from parents
+    CHILD_CHUNK_SIZE: int = int(os.getenv("CHILD_CHUNK_SIZE", "300"))
+    CHILD_CHUNK_OVERLAP: int = int(os.getenv("CHILD_CHUNK_OVERLAP", "40"))
+    PARENT_CHUNK_SIZE: int = int(os.getenv("PARENT_CHUNK_SIZE", "2400"))  # page window (chars) sent to the LLM
+    ENABLE_DEDUP: bool = _env_bool("ENABLE_DEDUP", True)  # near-duplicate chunks at index time
+    DEDUP_THRESHOLD: float = float(os.getenv("DEDUP_THRESHOLD", "0.9"))  # est. Jaccard; see ingestion/dedup.py before lowering
+
+    # embeddings
+    EMBED_BACKEND: str = os.getenv("EMBED_BACKEND", "sentence-transformers")  # | onnx | onnx-int8 | hashing
+    EMBED_THREADS: int = int(os.getenv("EMBED_THREADS", "0"))  # 0 = library default
+    EMBED_ONNX_DIR: str = os.getenv("EMBED_ONNX_DIR", "data/models/onnx")
+    VECTOR_QUANTIZATION: str = os.getenv("VECTOR_QUANTIZATION", "none")  # | int8 | binary
+    VECTOR_RESCORE_MULT: int = int(os.getenv("VECTOR_RESCORE_MULT", "4"))  # shortlist = k * mult
+
+    # sharding (1 = single monolithic index)
+    INDEX_SHARDS: int = int(os.getenv("INDEX_SHARDS", "1"))
+    SHARD_WORKERS: int = int(os.getenv("SHARD_WORKERS", "0"))  # 0 = one thread per shard
+
+    # index namespaces (see rag_core/namespaces.py)
+    INDEX_ROOT: str = os.getenv("INDEX_ROOT", os.path.join("data", "indexes"))  # default namespace; others under ns/
+    INDEX_POOL_MB: float = float(os.getenv("INDEX_POOL_MB", "2048"))  # loaded namespaces before LRU eviction
+
+    # RAPTOR summary tree (see ingestion/raptor.py)
+    ENABLE_RAPTOR: bool = _env_bool("ENABLE_RAPTOR", False)
+    RAPTOR_TOP_K: int = int(os.getenv("RAPTOR_TOP_K", "2"))  # summaries added per query
+    RAPTOR_USE_LLM: bool = _env_bool("RAPTOR_USE_LLM", False)  # else extractive summaries (offline)
+    RAPTOR_MAX_WORKERS: int = int(os.getenv("RAPTOR_MAX_WORKERS", "4"))  # concurrent summary calls
+
+    # context assembly (model tokens)
+    CONTEXT_MAX_TOKENS: int = int(os.getenv("CONTEXT_MAX_TOKENS", "6000"))
+    EXPLORE_CONTEXT_MAX_TOKENS: int = int(os.getenv("EXPLORE_CONTEXT_MAX_TOKENS", "4000"))
+
+    # extracted page text cache (see ingestion/text_cache.py)
+    TEXT_CACHE: bool = _env_bool("TEXT_CACHE", True)
+    TEXT_CACHE_DIR: str = os.getenv("TEXT_CACHE_DIR", os.path.join("data", "cache", "text"))
+
+    # streaming ingestion (bounded build memory)
+    INGEST_BATCH_SIZE: int = int(os.getenv("INGEST_BATCH_SIZE", "256"))  # chunks encoded + written per batch
+    INGEST_MEMORY_MB: float = float(os.getenv("INGEST_MEMORY_MB", "512"))  # build memory ceiling
+
+    # background indexing jobs (see rag_core/jobs.py)
+    JOBS_DIR: str = os.getenv("JOBS_DIR", os.path.join("data", "jobs"))
+    JOB_STALE_SECONDS: float = float(os.getenv("JOB_STALE_SECONDS", "30"))  # no heartbeat -> requeue
+
+    # explore snapshots (cached next to the indexes, keyed by index version)
+    EXPLORE_CACHE: bool = _env_bool("EXPLORE_CACHE", True)
+    EXPLORE_PRECOMPUTE: bool = _env_bool("EXPLORE_PRECOMPUTE", False)  # per-document snapshots at index build
 
     # LLM
+    LLM_BACKEND: str = os.getenv("LLM_BACKEND", "openai")  # | stub (offline, see rag_core/llm.py)
+    STUB_LLM_LATENCY_MS: float = float(os.getenv("STUB_LLM_LATENCY_MS", "800"))  # median time to first token
+    STUB_LLM_JITTER: float = float(os.getenv("STUB_LLM_JITTER", "0.5"))
+    STUB_LLM_DISTRIBUTION: str = os.getenv("STUB_LLM_DISTRIBUTION", "lognormal")  # fixed | uniform | exponential
+    STUB_LLM_TOKENS_PER_S: float = float(os.getenv("STUB_LLM_TOKENS_PER_S", "60"))
+    STUB_LLM_OUTPUT_TOKENS: int = int(os.getenv("STUB_LLM_OUTPUT_TOKENS", "80"))
+    STUB_LLM_ERROR_RATE: float = float(os.getenv("STUB_LLM_ERROR_RATE", "0"))
+    STUB_LLM_MAX_CONCURRENCY: int = int(os.getenv("STUB_LLM_MAX_CONCURRENCY", "0"))  # 0 = unlimited
+    LLM_CACHE: str = os.getenv("LLM_CACHE", "readwrite")  # off | record | replay (see rag_core/llm_cache.py)
+    LLM_CACHE_PATH: str = os.getenv("LLM_CACHE_PATH", os.path.join("data", "cache", "llm_cache.sqlite"))
+    LLM_CACHE_TTL_S: float = float(os.getenv("LLM_CACHE_TTL_S", str(7 * 86400)))  # 0 = never expires
+    LLM_CACHE_MAX_MB: float = float(os.getenv("LLM_CACHE_MAX_MB", "256"))
     OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
     OPENAI_TEMPERATURE: float = float(os.getenv("OPENAI_TEMPERATURE", "0.2"))
 
+    # observability
+    TRACE_JSONL: str = os.getenv("TRACE_JSONL", "")  # append one JSON line per traced request
+    METRICS_PORT: int = int(os.getenv("METRICS_PORT", "0"))  # Prometheus /metrics; 0 = off
+
+    # profiling (see rag_core/profiling.py)
+    PROFILE: bool = _env_bool("RAG_PROFILE", False)
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "data/profiles")
+    PROFILE_SAMPLE_INTERVAL: float = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))  # seconds
+
     # paths
     RAW_PDF_DIR: str = os.getenv("RAW_PDF_DIR", "data/raw_pdfs")
 
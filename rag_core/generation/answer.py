@@ -2,50 +2,29 @@
 from __future__ import annotations
 
 from typing import List, Tuple
+from rag_core.generation.context import build_context
 from rag_core.prompts import ANSWER_PROMPT
 from rag_core.schemas import DocChunk
-
-
-def _format_context(docs: List[DocChunk], max_chars: int = 24000) -> str:
-    """
-    Build a context string with stable chunk labels.
-    Increased max_chars for stronger grounding on academic PDFs.
-    """
-    parts: List[str] = []
-    total = 0
-
-    for d in docs:
-        source = getattr(d, "source", "unknown")
-        chunk_index = getattr(d, "chunk_index", getattr(d, "chunk_id", "NA"))
-        text = (getattr(d, "text", "") or "").strip()
-
-        if not text:
-            continue
-
-        block = f"[{source} | chunk {chunk_index}]\n{text}\n"
-        if total + len(block) > max_chars:
-            break
-
-        parts.append(block)
-        total += len(block)
-
-    return "\n".join(parts).strip()
+from rag_core.tracing import span
 
 
 def generate_answer(llm, question: str, docs: List[DocChunk]) -> Tuple[str, List[str]]:
     """
     Returns: (answer, citations_sources_list)
-    Answer is grounded and expects inline citations like:
-    [file.pdf | chunk 94]
+    Answer is grounded and expects inline citations copied from the context labels:
+    [file.pdf | chunk 94], [file.pdf | chunk 94-96], [file.pdf | section 3], [file.pdf | summary 2]
     """
-    context = _format_context(docs)
+    with span("prompt_build"):
+        context = build_context(docs)
+
+        # If retrieval gave nothing, short-circuit
+        if not context:
+            return "Not available in documents.", []
 
-    # If retrieval gave nothing, short-circuit
-    if not context:
-        return "Not available in documents.", []
+        prompt = ANSWER_PROMPT.format(context=context, question=question)
 
-    prompt = ANSWER_PROMPT.format(context=context, question=question)
-    answer = (llm(prompt) or "").strip()
+    with span("llm_call"):
+        answer = (llm(prompt) or "").strip()
 
     # Enforce exact missing policy
     if (not answer) or (answer.strip().lower() == "not available in documents.") or ("not available in documents" in answer.lower() and len(answer) < 60):
@@ -55,9 +34,12 @@ def generate_answer(llm, question: str, docs: List[DocChunk]) -> Tuple[str, List
     citations: List[str] = []
     seen = set()
     for d in docs:
-        src = getattr(d, "source", None)
-        if src and src not in seen:
-            citations.append(src)
-            seen.add(src)
+        srcs = [getattr(d, "source", None)]
+        # deduplicated chunks also appear in other sources
+        srcs += [loc.get("source") for loc in (getattr(d, "locations", None) or [])]
+        for src in srcs:
+            if src and src not in seen:
+                citations.append(src)
+                seen.add(src)
 
     return answer, citations
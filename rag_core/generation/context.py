@@ -0,0 +1,158 @@
+# rag_core/generation/context.py
+"""
+Token-budgeted context assembly shared by answer + explore prompts.
+
+1) adjacent/overlapping chunks of the same source merge into one span
+   (the chunk overlap region is sent once)
+2) sentences already included by a higher-scoring span are dropped
+3) spans fill the token budget greedily by score; a span that does not fit
+   is skipped, smaller ones after it can still fit
+"""
+from __future__ import annotations
+
+import math
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from rag_core.config import settings
+from rag_core.schemas import DocChunk
+
+_SENT_SPLIT_RE = re.compile(r"((?<=[.!?])\s+|\n+)")
+_WS_RE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4)
+def _encoding(model: str):
+    try:
+        import tiktoken
+    except Exception:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """
+    Model tokens via tiktoken when installed, else ~4 chars per token.
+    """
+    enc = _encoding(model or getattr(settings, "OPENAI_MODEL", "gpt-4o-mini"))
+    if enc is None:
+        return int(math.ceil(len(text or "") / 4))
+    return len(enc.encode(text or "", disallowed_special=()))
+
+
+def join_overlapping(a: str, b: str, probe: int = 40) -> str:
+    """
+    Append b to a, sending the shared a-suffix / b-prefix region only once.
+    """
+    head = b[: min(probe, len(b))]
+    if head:
+        pos = a.find(head, max(0, len(a) - len(b)))
+        while pos != -1:
+            tail = a[pos:]
+            if b.startswith(tail):
+                return a + b[len(tail) :]
+            pos = a.find(head, pos + 1)
+    return a + "\n" + b
+
+
+def _label(source: str, first: int, last: int, method: str = "") -> str:
+    if method == "raptor":
+        return f"[{source} | summary {first}]"
+    if method == "parent":
+        return f"[{source} | section {first}]" if first == last else f"[{source} | section {first}-{last}]"
+    if first == last:
+        return f"[{source} | chunk {first}]"
+    return f"[{source} | chunk {first}-{last}]"
+
+
+def merge_spans(docs: List[DocChunk]) -> List[dict]:
+    """
+    Group docs by source and merge runs of consecutive chunk indices.
+    Returns spans: {source, first, last, text, score, method}
+    RAPTOR summaries and parent sections are never merged with leaf chunks.
+    """
+    by_source: Dict[Tuple[str, str], List[DocChunk]] = {}
+    for d in docs:
+        if (getattr(d, "text", "") or "").strip():
+            method = getattr(d, "method", "")
+            kind = method if method in ("raptor", "parent") else ""
+            by_source.setdefault((getattr(d, "source", "unknown"), kind), []).append(d)
+
+    spans: List[dict] = []
+    for (source, kind), items in by_source.items():
+        items = sorted(items, key=lambda d: int(getattr(d, "chunk_index", 0)))
+        cur: Optional[dict] = None
+        for d in items:
+            idx = int(getattr(d, "chunk_index", 0))
+            text = d.text.strip()
+            if kind == "raptor":
+                spans.append({"source": source, "first": idx, "last": idx, "text": text, "score": float(d.score), "method": kind})
+                continue
+            if cur is not None and idx == cur["last"]:
+                cur["score"] = max(cur["score"], float(d.score))
+                continue
+            if cur is not None and idx == cur["last"] + 1:
+                cur["text"] = join_overlapping(cur["text"], text)
+                cur["last"] = idx
+                cur["score"] = max(cur["score"], float(d.score))
+                continue
+            cur = {"source": source, "first": idx, "last": idx, "text": text, "score": float(d.score), "method": kind}
+            spans.append(cur)
+    return spans
+
+
+def _drop_seen_sentences(text: str, seen: set) -> Tuple[str, set]:
+    """
+    Remove sentences already sent in an earlier span; keep original separators.
+    Returns (text, new sentence keys).
+    """
+    pieces = _SENT_SPLIT_RE.split(text)
+    kept: List[str] = []
+    new: set = set()
+    for i in range(0, len(pieces), 2):
+        sent = pieces[i]
+        sep = pieces[i + 1] if i + 1 < len(pieces) else ""
+        key = _WS_RE.sub(" ", sent.strip().lower())
+        if not key:
+            continue
+        if len(key) > 20 and (key in seen or key in new):
+            continue
+        new.add(key)
+        kept.append(sent + sep)
+    return "".join(kept).strip(), new
+
+
+def build_context(
+    docs: List[DocChunk],
+    max_tokens: Optional[int] = None,
+    model: Optional[str] = None,
+) -> str:
+    """
+    Build a context string with stable chunk labels within a model-token budget.
+    """
+    if max_tokens is None:
+        max_tokens = int(getattr(settings, "CONTEXT_MAX_TOKENS", 6000))
+
+    spans = merge_spans(docs)
+    spans.sort(key=lambda s: s["score"], reverse=True)
+
+    seen: set = set()
+    parts: List[str] = []
+    used = 0
+    for s in spans:
+        text, keys = _drop_seen_sentences(s["text"], seen)
+        if not text:
+            continue
+        block = f"{_label(s['source'], s['first'], s['last'], s['method'])}\n{text}\n"
+        cost = count_tokens(block, model)
+        if used + cost > max_tokens:
+            continue
+        parts.append(block)
+        used += cost
+        seen |= keys
+
+    return "\n".join(parts).strip()
@@ -1,10 +1,130 @@
 # rag_core/generation/crag.py
-from rag_core.generation.self_rag import should_retry
-
-def crag_run(pipeline, query: str, max_iters: int = 2):
-    last = None
-    for _ in range(max_iters):
-        last = pipeline.run(query)
-        if not should_retry(last.answer):
-            return last
-    return last
+"""
+Corrective RAG: judge retrieval before generating, and only when confidence
+is low escalate to retrieval that can find *new* evidence:
+
+  initial -> wider pool -> query expansion (RRF) -> LLM rerank -> one generation
+
+Confident queries stop after the initial retrieval; every query gets at most
+one answer generation (the Self-RAG gate in Pipeline.generate may skip it).
+"""
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Tuple
+
+from rag_core.config import settings
+from rag_core.retrieval.fusion import rrf_fusion
+from rag_core.retrieval.query_expansion import expand_queries
+from rag_core.schemas import DocChunk
+from rag_core.tracing import incr, span
+
+ESCALATIONS = ("widen", "expand", "rerank")
+
+
+def retrieval_confidence(
+    fused: List[DocChunk],
+    v_docs: List[DocChunk],
+    b_docs: List[DocChunk],
+    top_k: int = 5,
+) -> Dict[str, float]:
+    """
+    Cheap pre-generation signals (no LLM call):
+    - agreement: overlap of the vector and BM25 top-k ids
+    - margin: relative gap between the best and the k-th fused score
+    - top_vector: best raw cosine similarity (absolute relevance)
+    """
+    if not fused:
+        return {"agreement": 0.0, "margin": 0.0, "top_vector": 0.0, "confidence": 0.0}
+
+    v_ids = {d.id for d in v_docs[:top_k]}
+    b_ids = {d.id for d in b_docs[:top_k]}
+    agreement = len(v_ids & b_ids) / float(max(1, min(top_k, len(v_ids), len(b_ids))))
+
+    scores = [float(d.score) for d in fused]
+    kth = scores[min(len(scores), top_k) - 1]
+    margin = max(0.0, (scores[0] - kth) / scores[0]) if scores[0] > 0 else 0.0
+
+    top_vector = max(0.0, min(1.0, float(v_docs[0].score))) if v_docs else 0.0
+
+    confidence = 0.5 * agreement + 0.2 * margin + 0.3 * top_vector
+    return {
+        "agreement": round(agreement, 4),
+        "margin": round(margin, 4),
+        "top_vector": round(top_vector, 4),
+        "confidence": round(confidence, 4),
+    }
+
+
+def _merge_legs(a: List[DocChunk], b: List[DocChunk]) -> List[DocChunk]:
+    best: Dict[str, DocChunk] = {d.id: d for d in a}
+    for d in b:
+        if d.id not in best or d.score > best[d.id].score:
+            best[d.id] = d
+    return sorted(best.values(), key=lambda d: d.score, reverse=True)
+
+
+def crag_run(
+    pipeline,
+    query: str,
+    max_iters: int = len(ESCALATIONS),
+    threshold: Optional[float] = None,
+    filters=None,
+) -> Tuple[str, List[str], List[DocChunk]]:
+    """
+    Returns (answer, citations, docs) like Pipeline.run().
+    The escalation log is left on pipeline.last_crag.
+    """
+    top_k = int(getattr(settings, "TOP_K", 5))
+    pool_mult = 4
+    if threshold is None:
+        threshold = float(getattr(settings, "CRAG_CONFIDENCE", 0.45))
+
+    retriever = pipeline.retriever()
+    cand_k = top_k * 3  # candidates kept for a possible rerank step
+
+    with span("crag_assess"):
+        pool, v_docs, b_docs = retriever.retrieve_legs(query, top_k=cand_k, pool_mult=pool_mult, filters=filters)
+        conf = retrieval_confidence(pool, v_docs, b_docs, top_k=top_k)
+        route = getattr(retriever, "last_route", None)
+        if route is not None and route["early_exit"]:
+            conf["confidence"] = 1.0  # decisive lexical match; the vector leg was skipped on purpose
+    log = [{"step": "initial", **conf}]
+    if route is not None:
+        log[0]["route"] = route["kind"]
+    reranked = False
+
+    for step in ESCALATIONS[: max(0, int(max_iters))]:
+        if conf["confidence"] >= threshold:
+            break
+        incr(f"crag_{step}")
+
+        if step == "widen":
+            pool_mult *= 4
+            pool, v_docs, b_docs = retriever.retrieve_legs(query, top_k=cand_k, pool_mult=pool_mult, filters=filters)
+
+        elif step == "expand":
+            n = int(getattr(settings, "QUERY_EXPANSION_N", 3))
+            result_sets = [pool]
+            for q in expand_queries(pipeline.llm, query, n=n + 1):
+                if q.strip() == query.strip():
+                    continue
+                fused, v2, b2 = retriever.retrieve_legs(q, top_k=cand_k, pool_mult=pool_mult, filters=filters)
+                result_sets.append(fused)
+                v_docs, b_docs = _merge_legs(v_docs, v2), _merge_legs(b_docs, b2)
+            pool = rrf_fusion(result_sets, top_k=cand_k)
+
+        elif step == "rerank":
+            pool = pipeline.reranker.rerank(query=query, docs=pool, top_k=top_k)
+            reranked = True
+            log.append({"step": step})
+            break
+
+        conf = retrieval_confidence(pool, v_docs, b_docs, top_k=top_k)
+        log.append({"step": step, **conf})
+
+    if not reranked and getattr(settings, "ENABLE_RERANK", False):
+        pool = pipeline.reranker.rerank(query=query, docs=pool, top_k=top_k)
+
+    answer, citations, docs = pipeline.generate(query, pool[:top_k], route=route)
+    pipeline.last_crag = {"threshold": threshold, "steps": log}
+    return answer, citations, docs
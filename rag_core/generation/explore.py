@@ -2,29 +2,60 @@
 from __future__ import annotations
 
 import json
-from typing import List, Dict, Any
+import os
+import threading
+from typing import List, Dict, Any, Optional
 
+from rag_core.config import settings
+from rag_core.generation.context import build_context
 from rag_core.prompts import EXPLORE_PROMPT
 from rag_core.schemas import DocChunk
 
 
-def _format_context(docs: List[DocChunk], max_chars: int = 16000) -> str:
-    parts = []
-    total = 0
-    for d in docs:
-        source = getattr(d, "source", "unknown")
-        chunk_index = getattr(d, "chunk_index", getattr(d, "chunk_id", "NA"))
-        text = (getattr(d, "text", "") or "").strip()
-        if not text:
-            continue
+class ExploreCache:
+    """
+    Explore results persisted next to the indexes.
+    - key: the sorted source names the snapshot covers
+    - version: SourceTable.version() of those sources; a re-ingested source
+      invalidates every entry that includes it
+    """
+
+    def __init__(self, index_dir: str = os.path.join("data", "indexes"), name: str = "explore_cache.json"):
+        self.path = os.path.join(index_dir, name)
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, dict]] = None
+
+    @staticmethod
+    def key_for(sources: List[str]) -> str:
+        return "|".join(sorted(sources))
+
+    def _load(self) -> Dict[str, dict]:
+        if self._entries is None:
+            self._entries = {}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        self._entries = json.load(f)
+                except Exception:
+                    self._entries = {}
+        return self._entries
 
-        block = f"[{source} | chunk {chunk_index}]\n{text}\n"
-        if total + len(block) > max_chars:
-            break
-        parts.append(block)
-        total += len(block)
+    def get(self, key: str, version: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._load().get(key)
+        if entry and entry.get("version") == version:
+            return entry.get("result")
+        return None
 
-    return "\n".join(parts).strip()
+    def put(self, key: str, version: str, result: Dict[str, Any]) -> None:
+        with self._lock:
+            entries = self._load()
+            entries[key] = {"version": version, "result": result}
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(entries, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.path)
 
 
 def explore_document(llm, docs: List[DocChunk]) -> Dict[str, Any]:
@@ -36,7 +67,7 @@ def explore_document(llm, docs: List[DocChunk]) -> Dict[str, Any]:
       questions: [{q:..., support:[...]}]
     }
     """
-    context = _format_context(docs)
+    context = build_context(docs, max_tokens=int(getattr(settings, "EXPLORE_CONTEXT_MAX_TOKENS", 4000)))
 
     if not context:
         return {
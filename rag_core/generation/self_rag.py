@@ -1,12 +1,81 @@
 # rag_core/generation/self_rag.py
+from __future__ import annotations
 
-def should_retry(answer: str) -> bool:
-    a = (answer or "").lower()
-    triggers = [
-        "not available in documents",
-        "i don't know",
-        "cannot find",
-        "not sure",
-        "insufficient",
-    ]
-    return any(t in a for t in triggers)
+from typing import List, Optional, Tuple
+
+import re
+
+import numpy as np
+
+from rag_core.retrieval.analyzers import STOPWORDS
+from rag_core.retrieval.router import code_tokens
+from rag_core.schemas import DocChunk
+from rag_core.tracing import incr, span
+
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def lexical_match(query: str, text: str) -> bool:
+    """
+    True when the chunk contains a code from the query ("GDM-07") or every
+    content term of it: exact evidence the cosine gate must not overrule.
+    """
+    low = (text or "").lower()
+    if any(c.lower() in low for c in code_tokens(query)):
+        return True
+    terms = {w for w in _WORD_RE.findall((query or "").lower()) if w not in STOPWORDS}
+    return bool(terms) and terms <= set(_WORD_RE.findall(low))
+
+
+class EvidenceGrader:
+    """
+    Pre-generation relevance / sufficiency grading on CPU.
+    - relevance of each chunk = cosine(query, chunk) with the vector store's encoder
+    - chunk vectors come from the index when available (no re-encoding),
+      otherwise all chunks are encoded in one batch
+    - sufficient = best chunk clears min_sufficiency; if not, the answer is
+      "Not available in documents." without any LLM call
+    - chunks that match the query lexically (codes / all terms) are always kept
+      and count as sufficient evidence
+    - opt-in (settings.ENABLE_EVIDENCE_GATE): thresholds are cosine values and
+      depend on the encoder
+    """
+
+    def __init__(self, vector_store, min_relevance: float = 0.15, min_sufficiency: float = 0.25):
+        self.vector_store = vector_store
+        self.min_relevance = float(min_relevance)
+        self.min_sufficiency = float(min_sufficiency)
+
+    def available(self) -> bool:
+        return hasattr(self.vector_store, "encode_query") and hasattr(self.vector_store, "encoder")
+
+    def grade(self, query: str, docs: List[DocChunk]) -> Optional[List[float]]:
+        if not docs or not self.available():
+            return None
+
+        q = self.vector_store.encode_query(query)[0]
+        vecs = None
+        if hasattr(self.vector_store, "vectors_for"):
+            vecs = self.vector_store.vectors_for([d.id for d in docs])
+        if vecs is None:
+            vecs = np.asarray(self.vector_store.encoder.encode([d.text for d in docs]), dtype="float32")
+            vecs = vecs / (np.linalg.norm(vecs, axis=1, keepdims=True) + 1e-12)
+        return [float(s) for s in vecs @ q]
+
+    def filter(self, query: str, docs: List[DocChunk]) -> Tuple[List[DocChunk], bool]:
+        """
+        Returns (relevant docs, sufficient). Without a usable encoder, docs pass through.
+        """
+        with span("self_rag_grade"):
+            scores = self.grade(query, docs)
+        if scores is None:
+            return docs, bool(docs)
+
+        exact = [lexical_match(query, d.text) for d in docs]
+        kept = [d for d, s, x in zip(docs, scores, exact) if x or s >= self.min_relevance]
+        incr("self_rag_dropped_chunks", len(docs) - len(kept))
+        sufficient = bool(kept) and (any(exact) or max(scores) >= self.min_sufficiency)
+        if not sufficient:
+            incr("self_rag_short_circuit")
+        return kept, sufficient
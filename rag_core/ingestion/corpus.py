@@ -0,0 +1,199 @@
+# rag_core/ingestion/corpus.py
+from __future__ import annotations
+
+import glob
+import json
+import os
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from rag_core.ingestion.pdf_loader import load_pdf_pages, load_pdfs
+from rag_core.ingestion.chunkers import chunk_text
+from rag_core.profiling import profile_stage
+
+
+def resolve_pdf_paths(pdf_dir_or_paths: Union[str, List[str]]) -> List[str]:
+    """
+    Accept a folder OR a list of pdf paths; return sorted pdf paths.
+    """
+    if isinstance(pdf_dir_or_paths, list):
+        pdf_paths = sorted([p for p in pdf_dir_or_paths if str(p).lower().endswith(".pdf")])
+        if not pdf_paths:
+            raise RuntimeError("No PDF paths provided.")
+        return pdf_paths
+
+    pdf_dir = str(pdf_dir_or_paths)
+    pdf_paths = sorted(glob.glob(os.path.join(pdf_dir, "*.pdf")))
+    if not pdf_paths:
+        raise RuntimeError(f"No PDFs found in: {pdf_dir}")
+    return pdf_paths
+
+
+def load_tags(pdf_paths: List[str]) -> Dict[str, List[str]]:
+    """
+    Optional tags.json next to the PDFs: {"file.pdf": ["hr", "2024"], ...}
+    """
+    tags: Dict[str, List[str]] = {}
+    for folder in sorted({os.path.dirname(os.path.abspath(p)) for p in pdf_paths}):
+        path = os.path.join(folder, "tags.json")
+        if not os.path.exists(path):
+            continue
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for name, vals in (data or {}).items():
+                tags[str(name)] = [str(v) for v in (vals or [])]
+        except Exception:
+            continue
+    return tags
+
+
+def uploaded_at(path: str) -> str:
+    try:
+        return datetime.fromtimestamp(os.path.getmtime(path)).isoformat(timespec="seconds")
+    except OSError:
+        return ""
+
+
+def build_chunk_records(
+    pdf_paths: List[str],
+    chunk_size: int = 800,
+    overlap: int = 200,
+    tags: Optional[Dict[str, List[str]]] = None,
+    parent_size: int = 0,
+) -> List[dict]:
+    """
+    Extract + chunk PDFs into index records:
+    {id, source, chunk_index, text, uploaded_at, tags}
+
+    Both stores build from the same records so chunk ids line up for hybrid merging.
+    parent_size > 0 switches to parent-child records (see iter_parent_child_records).
+    """
+    return list(iter_chunk_records(pdf_paths, chunk_size=chunk_size, overlap=overlap, tags=tags, parent_size=parent_size))
+
+
+def parent_windows(pages: List[str], size: int) -> List[Tuple[int, int, str]]:
+    """
+    Group consecutive pages into windows of up to `size` chars -> (first page, last page, text).
+    Pages are 1-based; a page longer than `size` is split on its own.
+    """
+    out: List[Tuple[int, int, str]] = []
+    cur: List[str] = []
+    first = last = 0
+    for no, text in enumerate(pages, start=1):
+        text = (text or "").strip()
+        if not text:
+            continue
+        if cur and sum(len(t) + 2 for t in cur) + len(text) > size:
+            out.append((first, last, "\n\n".join(cur)))
+            cur = []
+        if len(text) > size:
+            out.extend((no, no, piece) for piece in chunk_text(text, size=size, overlap=0))
+            continue
+        if not cur:
+            first = no
+        cur.append(text)
+        last = no
+    if cur:
+        out.append((first, last, "\n\n".join(cur)))
+    return out
+
+
+def iter_chunk_records(
+    pdf_paths: List[str],
+    chunk_size: int = 800,
+    overlap: int = 200,
+    tags: Optional[Dict[str, List[str]]] = None,
+    parent_size: int = 0,
+) -> Iterator[dict]:
+    """
+    Generator form of build_chunk_records: one PDF in memory at a time.
+    """
+    if tags is None:
+        tags = load_tags(pdf_paths)
+    if parent_size > 0:
+        yield from iter_parent_child_records(pdf_paths, parent_size, chunk_size=chunk_size, overlap=overlap, tags=tags)
+        return
+
+    for path in pdf_paths:
+        source = os.path.basename(path)
+        src_uploaded = uploaded_at(path)
+        src_tags = list(tags.get(source, []))
+        with profile_stage("load_pdfs"):
+            full_text = load_pdfs(path)
+
+        # make sure loader output is string
+        if isinstance(full_text, list):
+            full_text = "\n".join([str(x) for x in full_text])
+        full_text = (full_text or "").strip()
+
+        if not full_text:
+            # keep going; callers error if nothing extracted overall
+            continue
+
+        with profile_stage("chunk_text"):
+            chunks = chunk_text(full_text, size=chunk_size, overlap=overlap)
+        for i, ch in enumerate(chunks):
+            ch = (ch or "").strip()
+            if not ch:
+                continue
+            yield {
+                "id": f"{source}::chunk_{i}",
+                "source": source,
+                "chunk_index": i,
+                "text": ch,
+                "uploaded_at": src_uploaded,
+                "tags": src_tags,
+            }
+
+
+def iter_parent_child_records(
+    pdf_paths: List[str],
+    parent_size: int,
+    chunk_size: int = 300,
+    overlap: int = 40,
+    tags: Optional[Dict[str, List[str]]] = None,
+) -> Iterator[dict]:
+    """
+    Small-to-big records: per PDF, page windows of up to parent_size chars become
+    parent records {kind: "parent", id, source, chunk_index, page_start, page_end, text},
+    each followed by its child chunks (never crossing a parent), which carry parent_id.
+    Stores index only the children; parents go to retrieval/parents.ParentStore.
+    """
+    if tags is None:
+        tags = load_tags(pdf_paths)
+
+    for path in pdf_paths:
+        source = os.path.basename(path)
+        src_uploaded = uploaded_at(path)
+        src_tags = list(tags.get(source, []))
+        with profile_stage("load_pdfs"):
+            pages = load_pdf_pages(path)
+
+        i = 0
+        with profile_stage("chunk_text"):
+            for p, (page_start, page_end, text) in enumerate(parent_windows(pages, parent_size)):
+                parent_id = f"{source}::parent_{p}"
+                yield {
+                    "kind": "parent",
+                    "id": parent_id,
+                    "source": source,
+                    "chunk_index": p,
+                    "page_start": page_start,
+                    "page_end": page_end,
+                    "text": text,
+                }
+                for ch in chunk_text(text, size=chunk_size, overlap=overlap):
+                    ch = (ch or "").strip()
+                    if not ch:
+                        continue
+                    yield {
+                        "id": f"{source}::chunk_{i}",
+                        "source": source,
+                        "chunk_index": i,
+                        "text": ch,
+                        "parent_id": parent_id,
+                        "uploaded_at": src_uploaded,
+                        "tags": src_tags,
+                    }
+                    i += 1
@@ -0,0 +1,174 @@
+# rag_core/ingestion/dedup.py
+"""
+Near-duplicate chunk detection (MinHash + LSH banding).
+
+Repeated headers, footers, disclaimers and near-identical revisions collapse
+into one indexed record that lists every source location it was seen at.
+
+Threshold (settings.DEDUP_THRESHOLD, default 0.9) is estimated Jaccard over
+3-word shingles. One changed word removes up to 3 shingles, so at 0.9:
+- a one-word revision of a ~100-word chunk (CHUNK_SIZE=800) collapses (J ~0.94)
+- a one-word change in a ~50-word chunk does not (J ~0.88), nor does a short
+  passage that differs in one fact (a dose, a date)
+Only the first text of a group is indexed, so a lower threshold trades index
+size for answers that can lose the wording (or the number) of later revisions.
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+_WORD_RE = re.compile(r"\w+")
+_MASK32 = np.uint64(0xFFFFFFFF)
+
+
+def _normalize(text: str) -> List[str]:
+    return _WORD_RE.findall((text or "").lower())
+
+
+def _shingles(words: List[str], k: int) -> List[int]:
+    if not words:
+        return []
+    if len(words) <= k:
+        return [zlib.crc32(" ".join(words).encode("utf-8"))]
+    return list({zlib.crc32(" ".join(words[i : i + k]).encode("utf-8")) for i in range(len(words) - k + 1)})
+
+
+def location_of(record: dict) -> dict:
+    """
+    Where a chunk was seen, with its source's metadata (filters need it for
+    files whose chunks were all collapsed into another file).
+    """
+    return {
+        "source": record.get("source", ""),
+        "chunk_index": int(record.get("chunk_index", 0)),
+        "uploaded_at": record.get("uploaded_at", ""),
+        "tags": list(record.get("tags", [])),
+    }
+
+
+class MinHashDeduper:
+    """
+    Incremental near-duplicate detector.
+    - add(key, text) returns the key of an earlier near-duplicate, or None if new
+    - similarity is estimated Jaccard over word shingles
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.9,
+        num_perm: int = 64,
+        bands: int = 16,
+        shingle_size: int = 3,
+        seed: int = 1,
+    ):
+        if num_perm % bands != 0:
+            raise ValueError("num_perm must be divisible by bands")
+
+        self.threshold = float(threshold)
+        self.num_perm = int(num_perm)
+        self.bands = int(bands)
+        self.rows = self.num_perm // self.bands
+        self.shingle_size = int(shingle_size)
+
+        # multiply-shift hash family: h(x) = ((a*x + b) mod 2^64) >> 32
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 2**63, size=self.num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2**63, size=self.num_perm, dtype=np.uint64)
+
+        self._exact: Dict[str, str] = {}
+        self._buckets: List[Dict[bytes, List[str]]] = [dict() for _ in range(self.bands)]
+        self._sigs: Dict[str, np.ndarray] = {}
+
+    def signature(self, text: str) -> np.ndarray:
+        sh = _shingles(_normalize(text), self.shingle_size)
+        if not sh:
+            return np.full(self.num_perm, np.iinfo(np.uint32).max, dtype=np.uint32)
+
+        x = np.array(sh, dtype=np.uint64).reshape(-1, 1)
+        with np.errstate(over="ignore"):
+            hv = ((self._a * x + self._b) >> np.uint64(32)) & _MASK32
+        return hv.min(axis=0).astype(np.uint32)
+
+    def add(self, key: str, text: str) -> Optional[str]:
+        exact = hashlib.sha1(" ".join(_normalize(text)).encode("utf-8")).hexdigest()
+        if exact in self._exact:
+            return self._exact[exact]
+
+        sig = self.signature(text)
+        band_keys = [sig[i * self.rows : (i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+        best_key, best_sim = None, 0.0
+        seen = set()
+        for band, bk in zip(self._buckets, band_keys):
+            for cand in band.get(bk, []):
+                if cand in seen:
+                    continue
+                seen.add(cand)
+                sim = float(np.mean(self._sigs[cand] == sig))
+                if sim > best_sim:
+                    best_key, best_sim = cand, sim
+
+        if best_key is not None and best_sim >= self.threshold:
+            return best_key
+
+        self._exact[exact] = key
+        self._sigs[key] = sig
+        for band, bk in zip(self._buckets, band_keys):
+            band.setdefault(bk, []).append(key)
+        return None
+
+
+def dedup_records(records: List[dict], threshold: float = 0.9, **kwargs) -> List[dict]:
+    """
+    Collapse near-duplicate chunk records.
+    Input: [{id, source, chunk_index, text}, ...]
+    Output: first occurrence of each group, with "locations" listing every
+    {source, chunk_index} in the group (itself included).
+    """
+    deduper = MinHashDeduper(threshold=threshold, **kwargs)
+    kept: Dict[str, dict] = {}
+    order: List[str] = []
+
+    for r in records:
+        canon = deduper.add(r["id"], r.get("text", ""))
+        if canon is None:
+            kept[r["id"]] = {**r, "locations": [location_of(r)]}
+            order.append(r["id"])
+        else:
+            kept[canon]["locations"].append(location_of(r))
+
+    return [kept[k] for k in order]
+
+
+def dedup_stream(
+    records: Iterable[dict],
+    threshold: float = 0.9,
+    **kwargs,
+) -> Tuple[Iterator[dict], Dict[str, List[dict]]]:
+    """
+    Streaming variant of dedup_records for builds that write records as they go.
+    Returns (canonical records, locations). A canonical record is yielded on
+    first sight with only its own location; groups that later gain duplicates
+    get their full location list in `locations` (filled while iterating), which
+    callers persist as a sidecar (see retrieval/locations.py).
+    """
+    deduper = MinHashDeduper(threshold=threshold, **kwargs)
+    locations: Dict[str, List[dict]] = {}
+    first: Dict[str, dict] = {}
+
+    def _gen() -> Iterator[dict]:
+        for r in records:
+            canon = deduper.add(r["id"], r.get("text", ""))
+            if canon is None:
+                first[r["id"]] = location_of(r)
+                yield {**r, "locations": [location_of(r)]}
+            else:
+                locations.setdefault(canon, [first[canon]]).append(location_of(r))
+
+    return _gen(), locations
+
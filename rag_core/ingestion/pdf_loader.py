@@ -2,9 +2,11 @@
 from __future__ import annotations
 
 import os
-from typing import Optional
+from typing import Dict, List, Optional
 
-import pdfplumber
+from rag_core.config import settings
+
+OCR_RESOLUTION = 200  # dpi of rendered pages (part of the text cache key)
 
 
 def load_pdfs(pdf_path: str, ocr: bool = True, max_pages: Optional[int] = None) -> str:
@@ -13,34 +15,62 @@ def load_pdfs(pdf_path: str, ocr: bool = True, max_pages: Optional[int] = None)
     - Works for normal text PDFs via pdfplumber
     - If text is empty and ocr=True, tries OCR (requires pytesseract + installed Tesseract)
 Using directly will help you debug quickly.
+    """
+    return "\n\n".join(t for t in load_pdf_pages(pdf_path, ocr=ocr, max_pages=max_pages) if t).strip()
+
+
+def load_pdf_pages(
+    pdf_path: str,
+    ocr: bool = True,
+    max_pages: Optional[int] = None,
+    use_cache: Optional[bool] = None,
+) -> List[str]:
+    """
+    Per-page text (list index = page number - 1; pages without text are "").
+    Same extraction + OCR fallback as load_pdfs(); served from the on-disk
+    text cache (ingestion/text_cache.py) unless settings.TEXT_CACHE is off.
+    """
+    if use_cache is None:
+        use_cache = getattr(settings, "TEXT_CACHE", True)
+    if use_cache:
+        from rag_core.ingestion.text_cache import cached_pages
+
+        pages = cached_pages(pdf_path, ocr=ocr, max_pages=max_pages)
+    else:
+        pages = extract_pages(pdf_path, ocr=ocr, max_pages=max_pages)
+    return [p["text"] for p in pages]
+
+
+def extract_pages(pdf_path: str, ocr: bool = True, max_pages: Optional[int] = None) -> List[Dict[str, str]]:
+    """
+    Uncached extraction -> [{text, method}] per page, method: text | ocr | empty.
+    OCR only runs when no page has a text layer; [] when nothing was extracted.
     """
     if not pdf_path or not os.path.exists(pdf_path):
-        return ""
+        return []
+
+    import pdfplumber  # deferred: query-only processes never load it
 
-    texts = []
+    texts: List[str] = []
 
     try:
         with pdfplumber.open(pdf_path) as pdf:
             pages = pdf.pages if max_pages is None else pdf.pages[:max_pages]
             for p in pages:
                 t = p.extract_text() or ""
-                t = t.strip()
-                if t:
-                    texts.append(t)
+                texts.append(t.strip())
 
     except Exception:
         # if pdfplumber fails unexpectedly
         texts = []
 
-    extracted = "\n\n".join(texts).strip()
-
     # ✅ If we got text, return it
-    if extracted:
-        return extracted
+    if any(texts):
+        return [{"text": t, "method": "text" if t else "empty"} for t in texts]
 
     # ✅ Fallback: OCR (only if enabled)
     if not ocr:
-        return ""
+        return []
 
     # OCR is optional: only runs if pytesseract is installed
     try:
@@ -48,21 +78,21 @@ Using directly will help you debug quickly.
         from PIL import Image
     except Exception:
         # pytesseract / PIL not installed
-        return ""
+        return []
 
-    ocr_texts = []
+    ocr_texts: List[str] = []
     try:
         with pdfplumber.open(pdf_path) as pdf:
             pages = pdf.pages if max_pages is None else pdf.pages[:max_pages]
             for p in pages:
                 # render page -> image
-                im = p.to_image(resolution=200).original
+                im = p.to_image(resolution=OCR_RESOLUTION).original
                 # pytesseract OCR
                 ocr_t = pytesseract.image_to_string(im) or ""
-                ocr_t = ocr_t.strip()
-                if ocr_t:
-                    ocr_texts.append(ocr_t)
+                ocr_texts.append(ocr_t.strip())
     except Exception:
         ocr_texts = []
 
-    return "\n\n".join(ocr_texts).strip()
+    if not any(ocr_texts):
+        return []
+    return [{"text": t, "method": "ocr" if t else "empty"} for t in ocr_texts]
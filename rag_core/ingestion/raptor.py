@@ -1,17 +1,279 @@
 # rag_core/ingestion/raptor.py
 """
-Minimal RAPTOR-style placeholder.
-Real RAPTOR builds summary trees. For now we provide a safe interface so you can extend later.
+RAPTOR-style hierarchical summary index.
+
+Per document: cluster chunk embeddings (vectorized k-means), summarize each
+cluster (LLM with bounded concurrency, or an extractive offline fallback),
+embed the summaries and recurse until one node is left or max_levels is hit.
+Summary nodes are persisted next to the other indexes and searched as an
+extra retrieval leg; broad questions and explore mode can use a few
+summaries instead of dozens of leaf chunks.
 """
+from __future__ import annotations
+
+import json
+import math
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from rag_core.prompts import RAPTOR_SUMMARY_PROMPT
+from rag_core.retrieval.filters import MetadataFilter, SourceTable
+from rag_core.schemas import DocChunk
+
+_SENT_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+
 
-from typing import List, Dict
+def _normalize(x: np.ndarray) -> np.ndarray:
+    return x / (np.linalg.norm(x, axis=1, keepdims=True) + 1e-12)
 
-def raptor_summaries(docs: List[Dict]) -> List[Dict]:
+
+def kmeans(x: np.ndarray, k: int, iters: int = 25, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Spherical k-means (cosine) with k-means++ init. Returns (labels, centroids).
+    """
+    n = len(x)
+    k = max(1, min(int(k), n))
+    rng = np.random.default_rng(seed)
+
+    centroids = [x[rng.integers(n)]]
+    for _ in range(1, k):
+        sims = np.max(x @ np.stack(centroids).T, axis=1)
+        d = np.clip(1.0 - sims, 0.0, None) ** 2
+        p = d / d.sum() if d.sum() > 0 else np.full(n, 1.0 / n)
+        centroids.append(x[rng.choice(n, p=p)])
+    c = np.stack(centroids)
+
+    labels = np.zeros(n, dtype="int64")
+    for it in range(iters):
+        new = np.argmax(x @ c.T, axis=1)
+        if it and np.array_equal(new, labels):
+            break
+        labels = new
+        for j in range(k):
+            members = x[labels == j]
+            if len(members):
+                c[j] = members.mean(axis=0)
+        c = _normalize(c)
+    return labels, c
+
+
+def raptor_summaries(docs: List[Dict], max_sentences: int = 5) -> List[Dict]:
     """
     Input: [{"source":..., "text":...}, ...]
-    Output: same structure, optionally with "summary" key.
+    Output: same structure with an extractive "summary" key.
+    """
+    return [{**d, "summary": extractive_summary([d.get("text", "")], max_sentences=max_sentences)} for d in docs]
+
+
+def extractive_summary(texts: List[str], max_sentences: int = 5, max_chars: int = 1200) -> str:
+    """
+    Offline fallback: keep the sentences with the highest term overlap with the cluster.
     """
-    out = []
-    for d in docs:
-        out.append({**d, "summary": ""})
-    return out
+    sents: List[str] = []
+    for t in texts:
+        sents.extend(s.strip() for s in _SENT_RE.split(t or "") if len(s.strip()) > 20)
+    if not sents:
+        return " ".join(t.strip() for t in texts)[:max_chars]
+
+    tf: Dict[str, int] = {}
+    toks = []
+    for s in sents:
+        words = re.findall(r"\w+", s.lower())
+        toks.append(words)
+        for w in set(words):
+            tf[w] = tf.get(w, 0) + 1
+
+    scored = [(sum(tf[w] for w in set(words)) / math.sqrt(len(words) + 1), i) for i, words in enumerate(toks)]
+    top = sorted(i for _, i in sorted(scored, reverse=True)[:max_sentences])
+
+    out, total = [], 0
+    seen = set()
+    for i in top:
+        s = sents[i]
+        if s.lower() in seen or total + len(s) > max_chars:
+            continue
+        seen.add(s.lower())
+        out.append(s)
+        total += len(s) + 1
+    return " ".join(out)
+
+
+def llm_summarizer(llm, max_chars: int = 12000) -> Callable[[List[str]], str]:
+    def _summarize(texts: List[str]) -> str:
+        joined = "\n\n".join(t.strip() for t in texts)[:max_chars]
+        out = (llm(RAPTOR_SUMMARY_PROMPT.format(text=joined)) or "").strip()
+        return out or extractive_summary(texts)
+
+    return _summarize
+
+
+class RaptorIndex:
+    """
+    Summary tree over chunk records.
+    - build(records, encoder, vectors=None, summarize=None) builds + persists
+    - search(query_vec or query, k, filters) returns summary nodes as DocChunk(method="raptor")
+    - top_nodes(sources) returns the highest-level summaries per document
+    """
+
+    def __init__(
+        self,
+        index_dir: str = os.path.join("data", "indexes"),
+        tree_name: str = "raptor_tree.json",
+        vectors_name: str = "raptor_vectors.npy",
+    ):
+        self.index_dir = index_dir
+        os.makedirs(self.index_dir, exist_ok=True)
+        self.tree_path = os.path.join(self.index_dir, tree_name)
+        self.vectors_path = os.path.join(self.index_dir, vectors_name)
+
+        self.nodes: List[dict] = []  # {id, source, level, node_index, children, text}
+        self.vectors: Optional[np.ndarray] = None  # parallel to nodes, normalized
+        self._try_load()
+
+    def _try_load(self) -> None:
+        if os.path.exists(self.tree_path) and os.path.exists(self.vectors_path):
+            try:
+                with open(self.tree_path, "r", encoding="utf-8") as f:
+                    self.nodes = json.load(f)
+                self.vectors = np.load(self.vectors_path)
+            except Exception:
+                self.nodes = []
+                self.vectors = None
+
+    def build(
+        self,
+        records: List[dict],
+        encoder,
+        vectors: Optional[np.ndarray] = None,
+        summarize: Optional[Callable[[List[str]], str]] = None,
+        branching: int = 6,
+        max_levels: int = 3,
+        max_workers: int = 4,
+    ) -> None:
+        """
+        records: leaf chunks {id, source, chunk_index, text}
+        vectors: optional leaf vectors parallel to records (skips re-encoding)
+        summarize: texts -> summary; defaults to extractive_summary (offline)
+        """
+        summarize = summarize or extractive_summary
+        if vectors is None:
+            vectors = np.asarray(encoder.encode([r["text"] for r in records]), dtype="float32")
+        vectors = _normalize(np.asarray(vectors, dtype="float32"))
+
+        by_source: Dict[str, List[int]] = {}
+        for i, r in enumerate(records):
+            by_source.setdefault(r["source"], []).append(i)
+
+        nodes: List[dict] = []
+        node_vecs: List[np.ndarray] = []
+
+        with ThreadPoolExecutor(max_workers=max(1, int(max_workers))) as pool:
+            for source, rows in by_source.items():
+                level_ids = [records[i]["id"] for i in rows]
+                src_attrs = {"uploaded_at": records[rows[0]].get("uploaded_at", ""), "tags": records[rows[0]].get("tags", [])}
+                level_texts = [records[i]["text"] for i in rows]
+                level_vecs = vectors[rows]
+                node_index = 0
+
+                for level in range(1, int(max_levels) + 1):
+                    if len(level_ids) <= 1:
+                        break
+                    k = max(1, math.ceil(len(level_ids) / float(branching)))
+                    labels, _ = kmeans(level_vecs, k)
+                    clusters = [np.flatnonzero(labels == j) for j in range(k)]
+                    clusters = [c for c in clusters if len(c)]
+
+                    # bounded-concurrency summarization of this level's clusters
+                    summaries = list(pool.map(lambda c: summarize([level_texts[i] for i in c]), clusters))
+                    sum_vecs = _normalize(np.asarray(encoder.encode(summaries), dtype="float32"))
+
+                    next_ids = []
+                    for c, text in zip(clusters, summaries):
+                        nid = f"{source}::raptor_{node_index}"
+                        nodes.append(
+                            {
+                                "id": nid,
+                                "source": source,
+                                "level": level,
+                                "node_index": node_index,
+                                "children": [level_ids[i] for i in c],
+                                "text": text,
+                                **src_attrs,
+                            }
+                        )
+                        next_ids.append(nid)
+                        node_index += 1
+                    node_vecs.append(sum_vecs)
+
+                    level_ids, level_texts, level_vecs = next_ids, summaries, sum_vecs
+
+        self.nodes = nodes
+        self.vectors = np.vstack(node_vecs).astype("float32") if node_vecs else np.zeros((0, vectors.shape[1]), "float32")
+
+        with open(self.tree_path, "w", encoding="utf-8") as f:
+            json.dump(self.nodes, f, ensure_ascii=False, indent=2)
+        np.save(self.vectors_path, self.vectors)
+
+    def _doc(self, i: int, score: float) -> DocChunk:
+        n = self.nodes[i]
+        return DocChunk(
+            id=n["id"],
+            source=n["source"],
+            chunk_index=int(n["node_index"]),
+            text=n["text"],
+            score=float(score),
+            method="raptor",
+        )
+
+    def _allowed(self, filters: Optional[MetadataFilter], sources: Optional[SourceTable] = None) -> np.ndarray:
+        """
+        Node mask for a filter (sources, tags, upload dates). `sources` is the leaf
+        stores' table; without it the source metadata saved on the nodes is used.
+        """
+        if filters is None or filters.is_empty():
+            return np.ones(len(self.nodes), dtype=bool)
+        table = sources if sources is not None else SourceTable(self.nodes)
+        keep = set(table.matching_sources(filters))
+        return np.array([n["source"] in keep for n in self.nodes], dtype=bool)
+
+    def search(
+        self,
+        q_emb: np.ndarray,
+        k: int = 3,
+        filters: Optional[MetadataFilter] = None,
+        sources: Optional[SourceTable] = None,
+    ) -> List[DocChunk]:
+        """
+        q_emb: normalized query vector ([dim] or [1, dim]) from the same encoder.
+        """
+        if not self.nodes or self.vectors is None:
+            return []
+        scores = self.vectors @ np.asarray(q_emb, dtype="float32").reshape(-1)
+        scores = np.where(self._allowed(filters, sources), scores, -np.inf)
+        top = np.argsort(-scores)[:k]
+        return [self._doc(int(i), scores[i]) for i in top if np.isfinite(scores[i])]
+
+    def top_nodes(
+        self,
+        filters: Optional[MetadataFilter] = None,
+        per_source: int = 3,
+        sources: Optional[SourceTable] = None,
+    ) -> List[DocChunk]:
+        """
+        Highest-level summaries of each (matching) document.
+        """
+        allowed = self._allowed(filters, sources)
+        by_source: Dict[str, List[int]] = {}
+        for i, n in enumerate(self.nodes):
+            if allowed[i]:
+                by_source.setdefault(n["source"], []).append(i)
+
+        out: List[DocChunk] = []
+        for rows in by_source.values():
+            rows = sorted(rows, key=lambda i: (-self.nodes[i]["level"], self.nodes[i]["node_index"]))
+            out.extend(self._doc(i, 1.0) for i in rows[:per_source])
+        return out
@@ -0,0 +1,115 @@
+# rag_core/ingestion/streaming.py
+"""
+Helpers for bounded-memory index builds.
+
+- batched(records)   : groups a record stream into batches capped by row count
+                       and text bytes (settings.INGEST_BATCH_SIZE / INGEST_MEMORY_MB)
+- JsonArrayWriter    : writes a JSON array item by item; the file stays readable
+                       by a plain json.load()
+- NpyAppender        : appends float32 rows to a .npy file, header patched on close
+"""
+from __future__ import annotations
+
+import json
+import os
+from typing import IO, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from rag_core.config import settings
+
+
+def memory_budget_bytes() -> int:
+    return int(float(getattr(settings, "INGEST_MEMORY_MB", 512)) * 1024 * 1024)
+
+
+def batched(
+    records: Iterable[dict],
+    max_rows: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+) -> Iterator[List[dict]]:
+    """
+    Yield lists of records; a batch closes at max_rows or once its text reaches
+    max_bytes (default: a quarter of the ingest memory budget, the rest is left
+    for encoder activations and the index being built).
+    """
+    max_rows = int(max_rows or getattr(settings, "INGEST_BATCH_SIZE", 256))
+    max_bytes = int(max_bytes or memory_budget_bytes() // 4)
+
+    batch: List[dict] = []
+    size = 0
+    for r in records:
+        batch.append(r)
+        size += len(r.get("text", "")) * 2
+        if len(batch) >= max_rows or size >= max_bytes:
+            yield batch
+            batch, size = [], 0
+    if batch:
+        yield batch
+
+
+class JsonArrayWriter:
+    """
+    with JsonArrayWriter(f) as w: w.write(item) ...  ->  [item, item, ...]
+    """
+
+    def __init__(self, f: IO[str], indent: Optional[int] = 2):
+        self.f = f
+        self.indent = indent
+        self.count = 0
+
+    def __enter__(self) -> "JsonArrayWriter":
+        self.f.write("[")
+        return self
+
+    def write(self, item) -> None:
+        self.f.write(",\n" if self.count else "\n")
+        self.f.write(json.dumps(item, ensure_ascii=False, indent=self.indent))
+        self.count += 1
+
+    def __exit__(self, *exc) -> None:
+        self.f.write("\n]" if self.count else "]")
+
+
+class NpyAppender:
+    """
+    Streams float32 rows of a fixed width into a .npy file (written to <path>.part,
+    moved into place by close()).
+    """
+
+    HEADER_LEN = 128  # fixed so the real shape can be patched in at the end
+
+    def __init__(self, path: str, dim: int):
+        self.path = path
+        self.dim = int(dim)
+        self.rows = 0
+        self._f = open(path + ".part", "wb")
+        self._f.write(self._header(0))
+
+    def _header(self, rows: int) -> bytes:
+        d = {"descr": "<f4", "fortran_order": False, "shape": (rows, self.dim)}
+        body = repr(d).encode("latin1")
+        pad = self.HEADER_LEN - 10 - len(body) - 1
+        return b"\x93NUMPY\x01\x00" + np.uint16(self.HEADER_LEN - 10).tobytes() + body + b" " * pad + b"\n"
+
+    def append(self, rows: np.ndarray) -> None:
+        rows = np.ascontiguousarray(rows, dtype="<f4")
+        if rows.ndim != 2 or rows.shape[1] != self.dim:
+            raise ValueError(f"expected rows of width {self.dim}, got {rows.shape}")
+        self._f.write(rows.tobytes())
+        self.rows += len(rows)
+
+    def close(self) -> None:
+        self._f.seek(0)
+        self._f.write(self._header(self.rows))
+        self._f.close()
+        os.replace(self.path + ".part", self.path)
+
+    def abort(self) -> None:
+        """
+        Drop the partial file (no-op after close()).
+        """
+        if not self._f.closed:
+            self._f.close()
+        if os.path.exists(self.path + ".part"):
+            os.remove(self.path + ".part")
@@ -0,0 +1,140 @@
+# rag_core/ingestion/text_cache.py
+"""
+On-disk cache of extracted PDF page text (settings.TEXT_CACHE_DIR).
+
+- keyed by the file's sha256 + the extractor settings (OCR on/off, page
+  limit, OCR resolution, pdfplumber / pytesseract versions), so renamed or
+  re-uploaded copies hit and a changed extractor misses
+- each page records how it was extracted: text | ocr | empty
+- re-chunking (CHUNK_SIZE, CHUNK_OVERLAP, parent-child) never re-runs
+  pdfplumber or Tesseract for unchanged files
+- extractions without any text are not cached (they may be transient failures)
+- a text-layer extraction also serves no-OCR and first-N-pages requests
+  (the app's preview) as long as no page needed OCR
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from importlib import metadata
+from typing import Dict, List, Optional, Tuple
+
+from rag_core.config import settings
+from rag_core.tracing import incr
+
+_digests: Dict[Tuple[str, int, int], str] = {}  # (abspath, size, mtime_ns) -> sha256
+_lock = threading.Lock()
+
+
+def file_sha256(path: str) -> str:
+    st = os.stat(path)
+    memo = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _lock:
+        if memo in _digests:
+            return _digests[memo]
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    with _lock:
+        _digests[memo] = h.hexdigest()
+    return _digests[memo]
+
+
+def _version(dist: str) -> str:
+    try:
+        return metadata.version(dist)
+    except metadata.PackageNotFoundError:
+        return ""
+
+
+def extractor_key(ocr: bool, max_pages: Optional[int]) -> str:
+    from rag_core.ingestion.pdf_loader import OCR_RESOLUTION
+
+    cfg = {
+        "v": 1,
+        "ocr": bool(ocr),
+        "max_pages": max_pages,
+        "pdfplumber": _version("pdfplumber"),
+    }
+    if ocr:
+        # an install of pytesseract turns a cached empty result into real OCR
+        cfg.update({"pytesseract": _version("pytesseract"), "resolution": OCR_RESOLUTION})
+    return hashlib.sha1(json.dumps(cfg, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+
+class TextCache:
+    """
+    <root>/<sha256>.<extractor key>.json -> {source, sha256, ocr, max_pages, created, pages: [{text, method}]}
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or getattr(settings, "TEXT_CACHE_DIR", os.path.join("data", "cache", "text"))
+
+    def path(self, digest: str, ocr: bool, max_pages: Optional[int]) -> str:
+        return os.path.join(self.root, f"{digest}.{extractor_key(ocr, max_pages)}.json")
+
+    def get(self, digest: str, ocr: bool, max_pages: Optional[int]) -> Optional[List[dict]]:
+        path = self.path(digest, ocr, max_pages)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)["pages"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, digest: str, ocr: bool, max_pages: Optional[int], pages: List[dict], source: str = "") -> None:
+        os.makedirs(self.root, exist_ok=True)
+        path = self.path(digest, ocr, max_pages)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        entry = {"source": source, "sha256": digest, "ocr": bool(ocr), "max_pages": max_pages, "created": time.time(), "pages": pages}
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def lookup(self, digest: str, ocr: bool, max_pages: Optional[int]) -> Optional[List[dict]]:
+        """
+        Exact entry, else a text-layer entry of the same file that gives the same result.
+        """
+        pages = self.get(digest, ocr, max_pages)
+        if pages is not None:
+            return pages
+        fallbacks = [(o, None) for o in (ocr, not ocr)] + ([(not ocr, max_pages)] if max_pages is not None else [])
+        for o, mp in fallbacks:
+            if (o, mp) == (ocr, max_pages):
+                continue
+            pages = self.get(digest, o, mp)
+            if pages is None:
+                continue
+            pages = pages[:max_pages] if max_pages is not None else pages
+            # pure text-layer pages do not depend on the OCR flag or on later pages
+            if any(p["text"] for p in pages) and all(p["method"] != "ocr" for p in pages):
+                return pages
+        return None
+
+
+def cached_pages(pdf_path: str, ocr: bool = True, max_pages: Optional[int] = None, cache: Optional[TextCache] = None) -> List[dict]:
+    """
+    [{text, method}] per page, extracted at most once per file content + extractor settings.
+    """
+    from rag_core.ingestion.pdf_loader import extract_pages
+
+    if not pdf_path or not os.path.exists(pdf_path):
+        return []
+    cache = cache or TextCache()
+    digest = file_sha256(pdf_path)
+
+    pages = cache.lookup(digest, ocr, max_pages)
+    if pages is not None:
+        incr("text_cache_hit")
+        return pages
+
+    incr("text_cache_miss")
+    pages = extract_pages(pdf_path, ocr=ocr, max_pages=max_pages)
+    if any(p["text"] for p in pages):
+        # empty results are never stored: extract_pages() also returns [] on transient
+        # pdfplumber errors or a missing tesseract binary
+        cache.put(digest, ocr, max_pages, pages, source=os.path.basename(pdf_path))
+    return pages
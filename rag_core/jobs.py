@@ -0,0 +1,453 @@
+# rag_core/jobs.py
+"""
+Background indexing jobs: a durable on-disk queue + a local worker process.
+
+Layout (settings.JOBS_DIR):
+  <id>.json        job state (rewritten atomically)
+  <id>.claim       created exclusively by whoever takes the job (worker or cancel)
+  <id>.cancel      cancellation marker, checked by the worker between files
+  chunks/          per-file chunk records (checkpoint, keyed by file size/mtime + chunk params)
+  worker.json      pid + heartbeat of the running worker
+
+- JobQueue.submit("build" | "update", pdf_paths) -> job id; the UI polls get(id)
+- "build" re-extracts every file; "update" reuses checkpointed files that did not change
+- a running job whose worker died (stale heartbeat) is requeued and resumes:
+  files it already finished are read back from chunks/
+- start a worker with: python -m rag_core.jobs worker
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from rag_core.config import settings
+from rag_core.ingestion.corpus import build_chunk_records, load_tags
+from rag_core.logger import get_logger
+from rag_core.retrieval.parents import default_parent_size
+
+log = get_logger("rag.jobs")
+
+ACTIVE = ("queued", "running")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _write_json(path: str, data: dict) -> None:
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def _read_json(path: str) -> Optional[dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _pid_alive(pid: int) -> bool:
+    if not isinstance(pid, int) or pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+class JobQueue:
+    def __init__(self, root: Optional[str] = None, stale_seconds: Optional[float] = None):
+        self.root = root or getattr(settings, "JOBS_DIR", os.path.join("data", "jobs"))
+        self.stale_seconds = float(stale_seconds or getattr(settings, "JOB_STALE_SECONDS", 30))
+        self.chunk_dir = os.path.join(self.root, "chunks")
+        os.makedirs(self.chunk_dir, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _path(self, job_id: str, ext: str = "json") -> str:
+        return os.path.join(self.root, f"{job_id}.{ext}")
+
+    # ---- UI side ----
+    def submit(self, kind: str, pdf_paths: List[str], **params) -> str:
+        if kind not in ("build", "update"):
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+        now = time.time()
+        _write_json(
+            self._path(job_id),
+            {
+                "id": job_id,
+                "kind": kind,
+                "status": "queued",
+                "pdf_paths": [os.path.abspath(p) for p in pdf_paths],
+                "params": params,
+                "created_at": now,
+                "started_at": None,
+                "finished_at": None,
+                "heartbeat": now,
+                "attempts": 0,
+                "progress": {"phase": "queued", "files_done": [], "files_total": len(pdf_paths), "current": "", "eta_s": None},
+                "error": "",
+            },
+        )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        return _read_json(self._path(job_id))
+
+    def list(self, limit: int = 20) -> List[dict]:
+        names = sorted((n for n in os.listdir(self.root) if n.endswith(".json") and n != "worker.json"), reverse=True)
+        jobs = [self.get(n[: -len(".json")]) for n in names[:limit]]
+        return [j for j in jobs if j]
+
+    def cancel(self, job_id: str) -> None:
+        """
+        Queued jobs are cancelled right away; running ones stop at the next file boundary.
+        """
+        with open(self._path(job_id, "cancel"), "w", encoding="utf-8") as f:
+            f.write(str(time.time()))
+        if self._try_claim(job_id):
+            self.update(job_id, status="cancelled", finished_at=time.time())
+
+    def cancel_requested(self, job_id: str) -> bool:
+        return os.path.exists(self._path(job_id, "cancel"))
+
+    # ---- worker side ----
+    def update(self, job_id: str, **fields) -> dict:
+        with self._lock:
+            job = self.get(job_id) or {}
+            job.update(fields)
+            job["heartbeat"] = time.time()
+            _write_json(self._path(job_id), job)
+            return job
+
+    def _try_claim(self, job_id: str) -> bool:
+        try:
+            fd = os.open(self._path(job_id, "claim"), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        os.write(fd, str(os.getpid()).encode("utf-8"))
+        os.close(fd)
+        return True
+
+    def claim(self, job_id: Optional[str] = None) -> Optional[dict]:
+        """
+        Oldest queued job (or job_id), marked running for this process (or None).
+        """
+        jobs = [self.get(job_id)] if job_id else sorted(self.list(limit=1000), key=lambda j: j["created_at"])
+        for job in jobs:
+            if job and job["status"] == "queued" and self._try_claim(job["id"]):
+                return self.update(
+                    job["id"],
+                    status="running",
+                    started_at=job.get("started_at") or time.time(),
+                    attempts=int(job.get("attempts", 0)) + 1,
+                    worker_pid=os.getpid(),
+                )
+        return None
+
+    def requeue_stale(self) -> List[str]:
+        """
+        Running jobs without a recent heartbeat go back to the queue (crash recovery).
+        """
+        requeued = []
+        now = time.time()
+        for job in self.list(limit=1000):
+            if job["status"] != "running" or now - float(job.get("heartbeat") or 0) < self.stale_seconds:
+                continue
+            if _pid_alive(job.get("worker_pid", -1)) and job.get("worker_pid") != os.getpid():
+                continue
+            try:
+                os.remove(self._path(job["id"], "claim"))
+            except OSError:
+                pass
+            self.update(job["id"], status="queued")
+            requeued.append(job["id"])
+            log.warning("requeued stale job %s", job["id"])
+        return requeued
+
+    def beat(self) -> None:
+        _write_json(os.path.join(self.root, "worker.json"), {"pid": os.getpid(), "heartbeat": time.time()})
+
+    def worker_alive(self) -> bool:
+        w = _read_json(os.path.join(self.root, "worker.json"))
+        if not w or time.time() - float(w.get("heartbeat", 0)) > self.stale_seconds:
+            return False
+        return _pid_alive(w.get("pid", -1))
+
+    # ---- per-file checkpoint ----
+    def chunk_path(self, pdf_path: str, chunk_size: int, overlap: int, parent_size: int = 0) -> str:
+        try:
+            st = os.stat(pdf_path)
+            stamp = f"{st.st_size}:{st.st_mtime_ns}"
+        except OSError:
+            stamp = "missing"
+        key = f"{os.path.abspath(pdf_path)}|{stamp}|{chunk_size}|{overlap}"
+        if parent_size:
+            key += f"|parents:{parent_size}"
+        return os.path.join(self.chunk_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".json")
+
+
+def ensure_worker(queue: Optional[JobQueue] = None) -> bool:
+    """
+    Start a detached worker process unless one is alive. Returns True if one was started.
+    """
+    queue = queue or JobQueue()
+    if queue.worker_alive():
+        return False
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (root, env.get("PYTHONPATH", "")) if p)
+    with open(os.path.join(queue.root, "worker.log"), "ab") as logf:
+        subprocess.Popen(
+            [sys.executable, "-m", "rag_core.jobs", "worker", "--jobs-dir", os.path.abspath(queue.root)],
+            cwd=os.getcwd(),
+            env=env,
+            stdout=logf,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+    queue.beat()  # placeholder beat; the worker overwrites it with its own pid
+    return True
+
+
+def raptor_summarizer():
+    """
+    LLM summaries when RAPTOR_USE_LLM is set and an API key is available, else None (extractive).
+    """
+    if not getattr(settings, "RAPTOR_USE_LLM", False):
+        return None
+    from rag_core.ingestion.raptor import llm_summarizer
+    from rag_core.llm import build_llm
+
+    llm, err = build_llm()
+    if llm is None:
+        log.warning("RAPTOR_USE_LLM is set but %s Falling back to extractive summaries.", err)
+        return None
+    return llm_summarizer(llm)
+
+
+def build_indexes(records: Callable[[], Iterable[dict]], index_dir: str, encoder=None) -> int:
+    """
+    Streaming vector/BM25 (+ RAPTOR) build; sharded when INDEX_SHARDS > 1.
+    records() returns a fresh record stream (it is read once per store and shard).
+    Returns the number of indexed chunks (after dedup).
+    """
+    from rag_core.retrieval.bm25_store import BM25Store
+    from rag_core.retrieval.encoders import default_encoder
+    from rag_core.retrieval.parents import ParentStore
+    from rag_core.retrieval.sharded import shard_dir, shard_of
+    from rag_core.retrieval.vector_store import VectorStore
+
+    encoder = encoder or default_encoder()
+    n_shards = int(getattr(settings, "INDEX_SHARDS", 1))
+    dedup = getattr(settings, "ENABLE_DEDUP", True)
+    raptor = getattr(settings, "ENABLE_RAPTOR", False) and n_shards == 1
+
+    total = 0
+    for shard in range(n_shards):
+        d = shard_dir(index_dir, shard) if n_shards > 1 else index_dir
+
+        def _part() -> Iterator[dict]:
+            return (r for r in records() if n_shards == 1 or shard_of(r["source"], n_shards) == shard)
+
+        if next(_part(), None) is None:
+            # every source of this shard is gone: drop its old files so they are not searched
+            VectorStore(index_dir=d, encoder=encoder).clear()
+            BM25Store(index_dir=d).clear()
+            ParentStore(d).build_from_records([])
+            continue
+        vs = VectorStore(index_dir=d, encoder=encoder)
+        vs.build_from_records(_part(), dedup=dedup, load=raptor)
+        bm = BM25Store(index_dir=d)
+        bm.build_from_records(_part(), dedup=dedup, load=False)
+        ParentStore(d).build_from_records(_part())  # no-op (stale files removed) without parent records
+        total += vs.index.ntotal
+
+        if raptor:
+            from rag_core.ingestion.raptor import RaptorIndex
+
+            RaptorIndex(index_dir=d).build(
+                vs.meta,
+                encoder=encoder,
+                vectors=vs.vectors_for([m["id"] for m in vs.meta]),
+                summarize=raptor_summarizer(),
+                max_workers=int(getattr(settings, "RAPTOR_MAX_WORKERS", 4)),
+            )
+    return total
+
+
+def chunk_params(params: Optional[dict] = None) -> Tuple[int, int, int]:
+    """
+    (chunk_size, overlap, parent_size) from job params, else settings.
+    With parent-child on, the indexed chunks are the small children.
+    """
+    params = params or {}
+    parent_size = int(params.get("parent_size", default_parent_size()))
+    if parent_size:
+        chunk_size = int(params.get("chunk_size", getattr(settings, "CHILD_CHUNK_SIZE", 300)))
+        overlap = int(params.get("overlap", getattr(settings, "CHILD_CHUNK_OVERLAP", 40)))
+    else:
+        chunk_size = int(params.get("chunk_size", getattr(settings, "CHUNK_SIZE", 800)))
+        overlap = int(params.get("overlap", getattr(settings, "CHUNK_OVERLAP", 200)))
+    return chunk_size, overlap, parent_size
+
+
+def index_pdfs(pdf_dir_or_paths: Union[str, List[str]], index_dir: Optional[str] = None, encoder=None, **params) -> int:
+    """
+    Synchronous build (profiling CLI, scripts): same stores, shards and parent
+    spans as a job, without the queue or checkpoints. params as in chunk_params().
+    """
+    from rag_core.ingestion.corpus import iter_chunk_records, resolve_pdf_paths
+
+    paths = resolve_pdf_paths(pdf_dir_or_paths)
+    chunk_size, overlap, parent_size = chunk_params(params)
+    index_dir = index_dir or getattr(settings, "INDEX_ROOT", os.path.join("data", "indexes"))
+    tags = load_tags(paths)
+
+    def _records() -> Iterator[dict]:
+        return iter_chunk_records(paths, chunk_size=chunk_size, overlap=overlap, tags=tags, parent_size=parent_size)
+
+    if next(_records(), None) is None:
+        raise RuntimeError("No extractable text chunks were created.")
+    return build_indexes(_records, index_dir, encoder=encoder)
+
+
+def run_job(queue: JobQueue, job: dict, encoder=None) -> dict:
+    job_id = job["id"]
+    params = job.get("params") or {}
+    chunk_size, overlap, parent_size = chunk_params(params)
+    index_dir = params.get("index_dir") or getattr(settings, "INDEX_ROOT", os.path.join("data", "indexes"))
+
+    paths = list(job["pdf_paths"])
+    done = list((job.get("progress") or {}).get("files_done", []))
+    tags = load_tags(paths)
+    checkpoints: List[str] = []
+    spent, extracted = 0.0, 0
+
+    try:
+        for i, path in enumerate(paths):
+            if queue.cancel_requested(job_id):
+                raise JobCancelled()
+            queue.update(
+                job_id,
+                progress={"phase": "extract", "files_done": done, "files_total": len(paths), "current": os.path.basename(path),
+                          "eta_s": round(spent / extracted * (len(paths) - i), 1) if extracted else None},
+            )
+
+            ckpt = queue.chunk_path(path, chunk_size, overlap, parent_size)
+            reuse = (path in done or job["kind"] == "update") and os.path.exists(ckpt)
+            if not reuse:
+                t0 = time.perf_counter()
+                extra = {"parent_size": parent_size} if parent_size else {}
+                _write_json(ckpt, {"records": build_chunk_records([path], chunk_size=chunk_size, overlap=overlap, tags=tags, **extra)})
+                spent += time.perf_counter() - t0
+                extracted += 1
+
+            checkpoints.append(ckpt)
+            if path not in done:
+                done.append(path)
+
+        if queue.cancel_requested(job_id):
+            raise JobCancelled()
+        queue.update(job_id, progress={"phase": "index", "files_done": done, "files_total": len(paths), "current": "", "eta_s": None})
+
+        def _records() -> Iterator[dict]:
+            # one checkpoint (= one PDF) in memory at a time
+            for ckpt in checkpoints:
+                yield from (_read_json(ckpt) or {}).get("records", [])
+
+        if next(_records(), None) is None:
+            raise RuntimeError("No extractable text chunks were created.")
+        n_chunks = build_indexes(_records, index_dir, encoder=encoder)
+
+        return queue.update(
+            job_id,
+            status="done",
+            finished_at=time.time(),
+            result={"chunks": n_chunks, "index_dir": index_dir},
+            progress={"phase": "done", "files_done": done, "files_total": len(paths), "current": "", "eta_s": 0},
+        )
+    except JobCancelled:
+        log.info("job %s cancelled", job_id)
+        return queue.update(job_id, status="cancelled", finished_at=time.time())
+    except Exception as e:
+        log.exception("job %s failed", job_id)
+        return queue.update(job_id, status="failed", finished_at=time.time(), error=str(e))
+
+
+def worker(queue: JobQueue, poll: float = 1.0, once: bool = False, encoder=None) -> None:
+    """
+    Claim and run jobs one at a time; a heartbeat thread keeps claimed jobs fresh.
+    """
+    current: Dict[str, Optional[str]] = {"job": None}
+    stop = threading.Event()
+
+    def _beat():
+        while not stop.wait(max(1.0, queue.stale_seconds / 5)):
+            queue.beat()
+            if current["job"]:
+                queue.update(current["job"])
+
+    threading.Thread(target=_beat, name="job-heartbeat", daemon=True).start()
+    try:
+        while True:
+            queue.beat()
+            queue.requeue_stale()
+            job = queue.claim()
+            if job is None:
+                if once:
+                    return
+                time.sleep(poll)
+                continue
+            current["job"] = job["id"]
+            log.info("running job %s (%s, %d files)", job["id"], job["kind"], len(job["pdf_paths"]))
+            run_job(queue, job, encoder=encoder)
+            current["job"] = None
+    finally:
+        stop.set()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Indexing job queue.")
+    ap.add_argument("--jobs-dir", default=None)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    w = sub.add_parser("worker", help="run queued jobs")
+    w.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    w.add_argument("--poll", type=float, default=1.0)
+    s = sub.add_parser("submit", help="queue a build/update job")
+    s.add_argument("kind", choices=["build", "update"])
+    s.add_argument("--namespace", default="default")
+    s.add_argument("--pdf-dir", default=None, help="default: the namespace's PDF folder")
+    sub.add_parser("status", help="list recent jobs")
+    c = sub.add_parser("cancel", help="cancel a job")
+    c.add_argument("job_id")
+    args = ap.parse_args()
+
+    q = JobQueue(args.jobs_dir)
+    if args.cmd == "worker":
+        worker(q, poll=args.poll, once=args.once)
+    elif args.cmd == "submit":
+        from rag_core.ingestion.corpus import resolve_pdf_paths
+        from rag_core.namespaces import namespace_dir, raw_dir
+
+        pdf_paths = resolve_pdf_paths(args.pdf_dir or raw_dir(args.namespace))
+        print(q.submit(args.kind, pdf_paths, index_dir=namespace_dir(args.namespace)))
+    elif args.cmd == "status":
+        for j in q.list():
+            p = j.get("progress") or {}
+            print(f"{j['id']}  {j['status']:<9}  {len(p.get('files_done', []))}/{p.get('files_total', 0)}  {j.get('error', '')}")
+    else:
+        q.cancel(args.job_id)
@@ -0,0 +1,180 @@
+# rag_core/llm.py
+"""
+LLM client shared by the app, the CLI and the indexing worker.
+
+build_llm() returns (llm, error): llm is a callable prompt -> text, or None
+with a human-readable error when no API key is configured. Unless LLM_CACHE
+is "off", the callable is wrapped in CachedLLM (rag_core/llm_cache.py);
+LLM_CACHE=replay works without an API key.
+LLM_BACKEND=stub returns StubLLM instead: an offline stand-in with a
+configurable latency distribution, token streaming rate and error injection
+(load tests, CI).
+"""
+from __future__ import annotations
+
+import math
+import os
+import random
+import re
+import threading
+import time
+from typing import Callable, Iterator, Optional, Tuple
+
+from rag_core.config import settings
+from rag_core.tracing import incr
+
+SYSTEM_PROMPT = "You are a strict grounded QA assistant. Use ONLY provided context."
+
+_LABEL_RE = re.compile(r"\[[^\[\]\n|]+ \| (?:chunk|summary|section) [0-9]+(?:-[0-9]+)?\]")
+
+
+class StubLLMError(RuntimeError):
+    pass
+
+
+class StubLLM:
+    """
+    Simulated LLM: prompt -> grounded-looking answer citing the prompt's first chunk labels.
+    - time to first token ~ latency distribution: fixed | uniform | exponential | lognormal
+      (median latency_ms; jitter = spread: uniform +-jitter*median, lognormal sigma)
+    - then output_tokens streamed at tokens_per_s (0 = instant)
+    - error_rate: fraction of calls that raise StubLLMError (after the latency)
+    - max_concurrency: provider-side limit; extra calls wait (0 = unlimited)
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 800.0,
+        jitter: float = 0.5,
+        distribution: str = "lognormal",
+        tokens_per_s: float = 60.0,
+        output_tokens: int = 80,
+        error_rate: float = 0.0,
+        max_concurrency: int = 0,
+        seed: Optional[int] = None,
+    ):
+        if distribution not in ("fixed", "uniform", "exponential", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {distribution}")
+        self.latency_ms = float(latency_ms)
+        self.jitter = float(jitter)
+        self.distribution = distribution
+        self.tokens_per_s = float(tokens_per_s)
+        self.output_tokens = int(output_tokens)
+        self.error_rate = float(error_rate)
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency > 0 else None
+
+    @classmethod
+    def from_settings(cls) -> "StubLLM":
+        return cls(
+            latency_ms=getattr(settings, "STUB_LLM_LATENCY_MS", 800.0),
+            jitter=getattr(settings, "STUB_LLM_JITTER", 0.5),
+            distribution=getattr(settings, "STUB_LLM_DISTRIBUTION", "lognormal"),
+            tokens_per_s=getattr(settings, "STUB_LLM_TOKENS_PER_S", 60.0),
+            output_tokens=getattr(settings, "STUB_LLM_OUTPUT_TOKENS", 80),
+            error_rate=getattr(settings, "STUB_LLM_ERROR_RATE", 0.0),
+            max_concurrency=getattr(settings, "STUB_LLM_MAX_CONCURRENCY", 0),
+        )
+
+    def sample_latency(self) -> float:
+        """
+        Seconds until the first token.
+        """
+        base = self.latency_ms / 1000.0
+        with self._rng_lock:
+            if self.distribution == "uniform":
+                return max(0.0, base * (1.0 + self._rng.uniform(-self.jitter, self.jitter)))
+            if self.distribution == "exponential":
+                return self._rng.expovariate(1.0 / base) if base > 0 else 0.0
+            if self.distribution == "lognormal":
+                return base * math.exp(self._rng.gauss(0.0, self.jitter)) if base > 0 else 0.0
+            return base
+
+    def _fails(self) -> bool:
+        with self._rng_lock:
+            return self._rng.random() < self.error_rate
+
+    def _answer(self, prompt: str) -> str:
+        prompt = prompt or ""
+        context = prompt[prompt.find("CONTEXT:"):] if "CONTEXT:" in prompt else prompt  # skip the prompt's example label
+        labels = list(dict.fromkeys(_LABEL_RE.findall(context)))[:2]
+        if not labels:
+            return "Not available in documents."
+        words = ["simulated"] * max(1, self.output_tokens - len(labels))
+        return " ".join(words) + " " + " ".join(labels)
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        if self._slots is not None:
+            self._slots.acquire()
+        try:
+            time.sleep(self.sample_latency())
+            if self._fails():
+                incr("llm_errors")
+                raise StubLLMError("simulated LLM failure")
+            tokens = self._answer(prompt).split(" ")
+            delay = 1.0 / self.tokens_per_s if self.tokens_per_s > 0 else 0.0
+            incr("llm_calls")
+            incr("llm_prompt_tokens", len(prompt or "") // 4)
+            incr("llm_completion_tokens", len(tokens))
+            for i, tok in enumerate(tokens):
+                if delay:
+                    time.sleep(delay)
+                yield tok if i == 0 else " " + tok
+        finally:
+            if self._slots is not None:
+                self._slots.release()
+
+    def __call__(self, prompt: str) -> str:
+        return "".join(self.stream(prompt))
+
+
+def build_llm(
+    api_key: Optional[str] = None,
+    model: Optional[str] = None,
+    temperature: Optional[float] = None,
+    cache: Optional[str] = None,
+) -> Tuple[Optional[Callable[[str], str]], Optional[str]]:
+    """
+    cache: LLM_CACHE mode override (off | readwrite | record | replay).
+    """
+    cache = (cache or getattr(settings, "LLM_CACHE", "readwrite")).strip().lower()
+    stub = getattr(settings, "LLM_BACKEND", "openai") == "stub"
+    model = model or ("stub" if stub else getattr(settings, "OPENAI_MODEL", "gpt-4o-mini"))
+    temperature = float(temperature if temperature is not None else getattr(settings, "OPENAI_TEMPERATURE", 0.2))
+
+    llm, err = (StubLLM.from_settings(), None) if stub else _openai_llm(api_key, model, temperature)
+    if cache == "off" or (llm is None and cache != "replay"):
+        return llm, err
+
+    from rag_core.llm_cache import CachedLLM
+
+    return CachedLLM(llm, model=model, temperature=temperature, system=SYSTEM_PROMPT, mode=cache), None
+
+
+def _openai_llm(api_key: Optional[str], model: str, temperature: float):
+    api_key = (api_key or os.getenv("OPENAI_API_KEY", "")).strip()
+    if not api_key:
+        return None, "OPENAI_API_KEY missing. Set it in .env or Streamlit secrets."
+
+    from openai import OpenAI  # deferred: only processes that generate need it
+
+    client = OpenAI(api_key=api_key)
+
+    def _llm(prompt: str) -> str:
+        resp = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt},
+            ],
+            temperature=temperature,
+        )
+        usage = getattr(resp, "usage", None)
+        if usage is not None:
+            incr("llm_prompt_tokens", getattr(usage, "prompt_tokens", 0) or 0)
+            incr("llm_completion_tokens", getattr(usage, "completion_tokens", 0) or 0)
+        incr("llm_calls")
+        return resp.choices[0].message.content or ""
+
+    return _llm, None
@@ -0,0 +1,185 @@
+# rag_core/llm_cache.py
+"""
+Prompt-level LLM response cache (SQLite) with record/replay.
+
+Key = sha256(model, temperature, system prompt, prompt). Modes:
+- off       : pass-through
+- readwrite : serve fresh hits, otherwise call the LLM and store the completion
+- record    : always call the LLM and (over)write the stored completion
+- replay    : serve stored completions only (TTL ignored); a miss raises
+              ReplayMiss and never touches the network -> deterministic evals/tests
+
+Entries older than ttl_s are not served in readwrite mode; the file is kept
+under max_mb by evicting least recently used entries (expired ones first).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Optional
+
+from rag_core.config import settings
+from rag_core.logger import get_logger
+from rag_core.tracing import incr
+
+log = get_logger("rag.llm_cache")
+
+MODES = ("off", "readwrite", "record", "replay")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS completions (
+    key        TEXT PRIMARY KEY,
+    model      TEXT NOT NULL,
+    temperature REAL NOT NULL,
+    response   TEXT NOT NULL,
+    size       INTEGER NOT NULL,
+    created    REAL NOT NULL,
+    last_used  REAL NOT NULL,
+    hits       INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS completions_last_used ON completions (last_used);
+"""
+
+
+class ReplayMiss(RuntimeError):
+    pass
+
+
+def cache_key(model: str, temperature: float, prompt: str, system: str = "") -> str:
+    payload = json.dumps([model, round(float(temperature), 4), system, prompt], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CachedLLM:
+    """
+    Drop-in llm callable: CachedLLM(llm, model=..., temperature=...)(prompt) -> text.
+    Counters: hits / misses / stores (also exported via tracing: llm_cache_hit / llm_cache_miss).
+    """
+
+    def __init__(
+        self,
+        llm: Optional[Callable[[str], str]],
+        model: str,
+        temperature: float = 0.0,
+        system: str = "",
+        path: Optional[str] = None,
+        mode: Optional[str] = None,
+        ttl_s: Optional[float] = None,
+        max_mb: Optional[float] = None,
+    ):
+        self.llm = llm
+        self.model = model
+        self.temperature = float(temperature)
+        self.system = system
+        self.path = path or getattr(settings, "LLM_CACHE_PATH", os.path.join("data", "cache", "llm_cache.sqlite"))
+        self.mode = (mode or getattr(settings, "LLM_CACHE", "readwrite")).strip().lower()
+        if self.mode not in MODES:
+            raise ValueError(f"Unknown LLM cache mode: {self.mode} (expected one of {', '.join(MODES)})")
+        if llm is None and self.mode != "replay":
+            raise ValueError("CachedLLM needs an llm unless mode='replay'")
+        self.ttl_s = float(ttl_s if ttl_s is not None else getattr(settings, "LLM_CACHE_TTL_S", 7 * 86400))
+        self.max_bytes = int(float(max_mb if max_mb is not None else getattr(settings, "LLM_CACHE_MAX_MB", 256)) * 1e6)
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._bytes: Optional[int] = None
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(_SCHEMA)
+            self._db = db
+        return self._db
+
+    def key(self, prompt: str) -> str:
+        return cache_key(self.model, self.temperature, prompt, self.system)
+
+    def get(self, prompt: str, ignore_ttl: bool = False) -> Optional[str]:
+        key = self.key(prompt)
+        now = time.time()
+        with self._lock:
+            db = self._conn()
+            row = db.execute("SELECT response, created FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is None or (not ignore_ttl and self.ttl_s > 0 and now - row[1] > self.ttl_s):
+                return None
+            db.execute("UPDATE completions SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key))
+        return row[0]
+
+    def put(self, prompt: str, response: str) -> None:
+        key = self.key(prompt)
+        now = time.time()
+        size = len(response.encode("utf-8")) + 200  # + key, columns and index overhead
+        with self._lock:
+            db = self._conn()
+            db.execute(
+                "INSERT OR REPLACE INTO completions (key, model, temperature, response, size, created, last_used, hits) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+                (key, self.model, self.temperature, response, size, now, now),
+            )
+            self.stores += 1
+            if self._bytes is not None:
+                self._bytes += size  # upper bound (replaced rows); recounted before evicting
+            self._evict(db)
+
+    def _evict(self, db: sqlite3.Connection) -> None:
+        if self._bytes is None:
+            self._bytes = int(db.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0])
+        if self._bytes <= self.max_bytes:
+            return
+        self._bytes = int(db.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0])
+        if self._bytes <= self.max_bytes:
+            return
+        if self.ttl_s > 0:
+            db.execute("DELETE FROM completions WHERE created < ?", (time.time() - self.ttl_s,))
+        target = int(self.max_bytes * 0.9)
+        total = int(db.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0])
+        doomed = []
+        for key, size in db.execute("SELECT key, size FROM completions ORDER BY last_used"):
+            if total <= target:
+                break
+            doomed.append((key,))
+            total -= size
+        db.executemany("DELETE FROM completions WHERE key = ?", doomed)
+        self._bytes = total
+        log.info("llm cache evicted down to %.1f MB", total / 1e6)
+
+    def __call__(self, prompt: str) -> str:
+        if self.mode == "off":
+            return self.llm(prompt)
+
+        if self.mode in ("readwrite", "replay"):
+            hit = self.get(prompt, ignore_ttl=(self.mode == "replay"))
+            if hit is not None:
+                self.hits += 1
+                incr("llm_cache_hit")
+                return hit
+            self.misses += 1
+            incr("llm_cache_miss")
+            if self.mode == "replay":
+                raise ReplayMiss(f"no recorded completion for prompt {self.key(prompt)[:12]}")
+
+        response = self.llm(prompt)
+        if response:
+            self.put(prompt, response)
+        return response
+
+    def stats(self) -> dict:
+        with self._lock:
+            n, size = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions").fetchone()
+        return {"mode": self.mode, "entries": n, "mb": round(size / 1e6, 3), "hits": self.hits, "misses": self.misses, "stores": self.stores}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
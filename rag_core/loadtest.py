@@ -0,0 +1,320 @@
+# rag_core/loadtest.py
+"""
+Open-loop load generator for capacity planning (fully offline by default).
+
+Requests arrive at a target QPS (Poisson or constant spacing) no matter how
+fast earlier ones finish, and are served by at most max_inflight workers, so
+overload shows up as queueing instead of silently lowering the arrival rate.
+
+- PipelineTarget : Pipeline.answer() in-process (per-stage spans via tracing)
+- HttpTarget     : POST {"query": ...} to an API server; stages are read from
+                   the response's "debug" breakdown when it has one
+- offline setup  : synthetic corpus + HashingEncoder + StubLLM (LLM_BACKEND=stub
+                   knobs: STUB_LLM_LATENCY_MS, _TOKENS_PER_S, _ERROR_RATE, ...)
+
+Report per QPS step: achieved throughput, latency and queue-wait percentiles,
+error rate, and per stage: p50/p95, busy time, occupancy (avg concurrent
+requests inside the stage) and utilization (occupancy / max_inflight).
+
+    python -m rag_core.loadtest --qps 2,5,10 --duration 20 --max-inflight 16
+    python -m rag_core.loadtest --namespace team-a --queries data/eval_questions/queries_only.txt
+"""
+from __future__ import annotations
+
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from rag_core.logger import get_logger
+
+log = get_logger("rag.loadtest")
+
+_TOPICS = [
+    ("leave", "annual leave sick leave parental leave approval carry over days"),
+    ("remote", "remote work hybrid schedule vpn equipment manager approval eligibility"),
+    ("ethics", "conflict of interest gifts bribery disciplinary action reporting"),
+    ("safety", "fire drill evacuation first aid incident reporting hazards"),
+    ("diabetes", "gestational diabetes screening glucose pregnancy insulin monitoring"),
+    ("payroll", "salary payment schedule overtime deductions expense reimbursement"),
+]
+
+
+def synthetic_corpus(n_docs: int = 20, chunks_per_doc: int = 10, seed: int = 0) -> List[dict]:
+    """
+    Deterministic policy-like chunk records (no PDFs needed).
+    """
+    rng = random.Random(seed)
+    records = []
+    for d in range(n_docs):
+        topic, vocab = _TOPICS[d % len(_TOPICS)]
+        words = vocab.split()
+        source = f"{topic}_policy_{d:03d}.pdf"
+        for c in range(chunks_per_doc):
+            text = " ".join(rng.choice(words) for _ in range(60)) + f". Section {c} of the {topic} policy."
+            records.append({"id": f"{source}::chunk_{c}", "source": source, "chunk_index": c, "text": text})
+    return records
+
+
+def synthetic_queries(n: int = 200, seed: int = 1) -> List[str]:
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        topic, vocab = rng.choice(_TOPICS)
+        out.append(f"What does the {topic} policy say about " + " ".join(rng.sample(vocab.split(), 3)) + "?")
+    return out
+
+
+def offline_pipeline(index_dir: Optional[str] = None, records: Optional[List[dict]] = None, llm=None):
+    """
+    Pipeline over a synthetic corpus with HashingEncoder and StubLLM (no network, no models).
+    """
+    from rag_core.llm import StubLLM
+    from rag_core.pipeline import Pipeline
+    from rag_core.retrieval.bm25_store import BM25Store
+    from rag_core.retrieval.encoders import HashingEncoder
+    from rag_core.retrieval.vector_store import VectorStore
+
+    index_dir = index_dir or tempfile.mkdtemp(prefix="rag-loadtest-")
+    records = records if records is not None else synthetic_corpus()
+    vs = VectorStore(index_dir=index_dir, encoder=HashingEncoder())
+    vs.build_from_records(records)
+    bm = BM25Store(index_dir=index_dir)
+    bm.build_from_records(records)
+    return Pipeline(vs, bm, llm if llm is not None else StubLLM.from_settings())
+
+
+class PipelineTarget:
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+
+    def __call__(self, query: str) -> Dict[str, float]:
+        return self.pipeline.answer(query).debug.get("stages_ms", {})
+
+
+class HttpTarget:
+    def __init__(self, url: str, timeout: float = 60.0):
+        self.url = url
+        self.timeout = float(timeout)
+
+    def __call__(self, query: str) -> Dict[str, float]:
+        import urllib.request
+
+        req = urllib.request.Request(
+            self.url,
+            data=json.dumps({"query": query}).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            body = json.loads(resp.read().decode("utf-8") or "{}")
+        return ((body.get("debug") or {}).get("stages_ms")) or {}
+
+
+def _pcts(values: List[float]) -> dict:
+    if not values:
+        return {"p50": None, "p90": None, "p95": None, "p99": None, "max": None, "mean": None}
+    a = np.asarray(values, dtype="float64")
+    p50, p90, p95, p99 = np.percentile(a, [50, 90, 95, 99])
+    return {
+        "p50": round(float(p50), 3),
+        "p90": round(float(p90), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "max": round(float(a.max()), 3),
+        "mean": round(float(a.mean()), 3),
+    }
+
+
+def run_load(
+    target: Callable[[str], Dict[str, float]],
+    queries: List[str],
+    qps: float,
+    duration_s: float = 10.0,
+    max_inflight: int = 16,
+    arrival: str = "poisson",
+    seed: int = 0,
+) -> dict:
+    """
+    One open-loop step at a fixed arrival rate. Blocks until every request has finished.
+    """
+    if not queries:
+        raise ValueError("run_load needs at least one query")
+    rng = random.Random(seed)
+    results: List[dict] = []
+    lock = threading.Lock()
+    state = {"waiting": 0, "max_waiting": 0, "inflight": 0, "max_inflight": 0}
+
+    def _one(query: str, scheduled: float) -> None:
+        start = time.perf_counter()
+        with lock:
+            state["waiting"] -= 1
+            state["inflight"] += 1
+            state["max_inflight"] = max(state["max_inflight"], state["inflight"])
+        error, stages = "", {}
+        try:
+            stages = target(query) or {}
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        end = time.perf_counter()
+        with lock:
+            state["inflight"] -= 1
+            results.append(
+                {"queue_ms": (start - scheduled) * 1000, "latency_ms": (end - scheduled) * 1000, "service_ms": (end - start) * 1000,
+                 "end": end, "error": error, "stages": stages}
+            )
+
+    pool = ThreadPoolExecutor(max_workers=max(1, int(max_inflight)), thread_name_prefix="load")
+    t0 = time.perf_counter()
+    offset, sent = 0.0, 0
+    try:
+        while offset < duration_s:
+            next_at = t0 + offset
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            with lock:
+                state["waiting"] += 1
+                state["max_waiting"] = max(state["max_waiting"], state["waiting"])
+            pool.submit(_one, queries[sent % len(queries)], next_at)
+            sent += 1
+            offset = offset + rng.expovariate(qps) if arrival == "poisson" else sent / qps
+    finally:
+        pool.shutdown(wait=True)
+
+    offered = sent / duration_s if duration_s > 0 else 0.0  # actual arrivals (Poisson varies around qps)
+    wall = max(r["end"] for r in results) - t0 if results else duration_s
+    ok = [r for r in results if not r["error"]]
+
+    stage_ms: Dict[str, List[float]] = {}
+    for r in ok:
+        for name, ms in r["stages"].items():
+            stage_ms.setdefault(name, []).append(float(ms))
+    stages = {}
+    for name, vals in sorted(stage_ms.items()):
+        busy = sum(vals) / 1000.0
+        occupancy = busy / wall if wall > 0 else 0.0
+        stages[name] = {
+            "count": len(vals),
+            "p50_ms": round(float(np.percentile(vals, 50)), 3),
+            "p95_ms": round(float(np.percentile(vals, 95)), 3),
+            "busy_s": round(busy, 3),
+            "occupancy": round(occupancy, 3),
+            "utilization": round(occupancy / max(1, int(max_inflight)), 3),
+        }
+
+    latency = _pcts([r["latency_ms"] for r in ok])
+    queue = _pcts([r["queue_ms"] for r in results])
+    achieved = len(results) / wall if wall > 0 else 0.0
+    return {
+        "target_qps": qps,
+        "offered_qps": round(offered, 3),
+        "achieved_qps": round(achieved, 3),
+        "duration_s": round(wall, 3),
+        "max_inflight": int(max_inflight),
+        "arrival": arrival,
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "error_rate": round((len(results) - len(ok)) / max(1, len(results)), 4),
+        "latency_ms": latency,
+        "service_ms": _pcts([r["service_ms"] for r in ok]),
+        "queue_wait_ms": queue,
+        "max_queue_depth": state["max_waiting"],
+        "peak_inflight": state["max_inflight"],
+        # saturated: requests wait longer for a worker than they take to serve,
+        # or completions fall behind arrivals
+        "saturated": bool(
+            achieved < 0.9 * offered
+            or (queue["p95"] is not None and latency["p50"] is not None and queue["p95"] > latency["p50"])
+        ),
+        "bottleneck": max(stages, key=lambda s: stages[s]["occupancy"]) if stages else None,
+        "stages": stages,
+    }
+
+
+def run_steps(target, queries: List[str], qps_steps: List[float], **kwargs) -> List[dict]:
+    """
+    Capacity curve: one run_load() per QPS step (stops early once a step saturates badly).
+    """
+    reports = []
+    for qps in qps_steps:
+        rep = run_load(target, queries, qps, **kwargs)
+        reports.append(rep)
+        log.info(
+            "qps %.1f -> %.1f achieved, p95 %.0f ms, queue p95 %.0f ms, bottleneck %s",
+            qps, rep["achieved_qps"], rep["latency_ms"]["p95"] or 0, rep["queue_wait_ms"]["p95"] or 0, rep["bottleneck"],
+        )
+        if rep["achieved_qps"] < 0.5 * qps:
+            break
+    return reports
+
+
+def _load_target(args) -> Tuple[Callable[[str], Dict[str, float]], List[str]]:
+    queries: List[str] = []
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    if args.url:
+        return HttpTarget(args.url), queries or synthetic_queries()
+
+    from rag_core.llm import StubLLM, build_llm
+
+    if args.llm == "stub":
+        llm = StubLLM.from_settings()
+    else:
+        # no LLM_CACHE: repeated load-test queries must reach the model, not the cache
+        llm, err = build_llm(cache="off")
+        if llm is None:
+            raise SystemExit(err)
+
+    if args.namespace:
+        from rag_core.namespaces import open_namespace
+        from rag_core.pipeline import Pipeline
+
+        ns = open_namespace(args.namespace)
+        if not ns.ready:
+            raise SystemExit(f"namespace {args.namespace!r} has no index")
+        return PipelineTarget(Pipeline(ns.vector_store, ns.bm25_store, llm, raptor_index=ns.raptor_index)), queries or synthetic_queries()
+
+    records = synthetic_corpus(n_docs=args.synthetic_docs, chunks_per_doc=10)
+    return PipelineTarget(offline_pipeline(records=records, llm=llm)), queries or synthetic_queries()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Open-loop load test of the RAG pipeline.")
+    ap.add_argument("--qps", default="1,2,5,10", help="comma-separated arrival rates (one step each)")
+    ap.add_argument("--duration", type=float, default=20.0, help="seconds of arrivals per step")
+    ap.add_argument("--max-inflight", type=int, default=16, help="concurrent requests served")
+    ap.add_argument("--arrival", choices=["poisson", "constant"], default="poisson")
+    ap.add_argument("--queries", default="", help="one query per line (default: synthetic)")
+    ap.add_argument("--namespace", default="", help="use a built namespace instead of the synthetic corpus")
+    ap.add_argument("--synthetic-docs", type=int, default=20)
+    ap.add_argument("--url", default="", help="load an API server instead of the in-process pipeline")
+    ap.add_argument("--llm", choices=["stub", "configured"], default="stub", help="configured = LLM_BACKEND / OpenAI")
+    ap.add_argument("--out", default="", help="append step reports as JSONL")
+    args = ap.parse_args()
+
+    target, queries = _load_target(args)
+    steps = [float(x) for x in args.qps.split(",") if x.strip()]
+    reports = run_steps(target, queries, steps, duration_s=args.duration, max_inflight=args.max_inflight, arrival=args.arrival)
+
+    for r in reports:
+        print(
+            f"qps {r['target_qps']:>6.1f} -> {r['achieved_qps']:>6.1f}  "
+            f"p50 {r['latency_ms']['p50'] or 0:>8.1f}  p95 {r['latency_ms']['p95'] or 0:>8.1f}  p99 {r['latency_ms']['p99'] or 0:>8.1f} ms  "
+            f"queue p95 {r['queue_wait_ms']['p95'] or 0:>8.1f} ms  err {r['error_rate']:.2%}  "
+            f"{'SATURATED' if r['saturated'] else 'ok':<9}  bottleneck {r['bottleneck']}"
+        )
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "a", encoding="utf-8") as f:
+            for r in reports:
+                f.write(json.dumps({"ts": time.time(), **r}) + "\n")
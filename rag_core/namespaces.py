@@ -0,0 +1,295 @@
+# rag_core/namespaces.py
+"""
+Named index namespaces (one PDF set + one index set per team) and a
+process-wide LRU pool of loaded namespaces.
+
+Layout:
+  default namespace : settings.INDEX_ROOT            + settings.RAW_PDF_DIR   (the old single-tenant paths)
+  other namespaces  : settings.INDEX_ROOT/ns/<name>  + settings.RAW_PDF_DIR/<name>
+
+- IndexPool.get(name) loads a namespace on first use and shares it across sessions
+- loaded namespaces are charged by their on-disk index size; least recently used
+  ones are evicted once the total exceeds settings.INDEX_POOL_MB
+- all namespaces share one query encoder
+- IndexPool.invalidate(name) drops a namespace after a rebuild (reloaded on next get);
+  namespaces that had no index yet are re-read on every get until one appears
+- rebuilds from another process (rag-index, a job worker) are noticed by get():
+  a namespace whose index files changed on disk since it was loaded is reloaded
+"""
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterator, List, Optional
+
+from rag_core.config import settings
+from rag_core.logger import get_logger
+from rag_core.tracing import incr
+
+log = get_logger("rag.namespaces")
+
+DEFAULT_NAMESPACE = "default"
+_NAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+
+
+def validate_namespace(name: str) -> str:
+    name = (name or "").strip()
+    if not _NAME_RE.match(name) or name in ("ns", ".", ".."):
+        raise ValueError(f"Invalid namespace name: {name!r} (letters, digits, '_', '-', '.'; max 64)")
+    return name
+
+
+def index_root() -> str:
+    return getattr(settings, "INDEX_ROOT", os.path.join("data", "indexes"))
+
+
+def namespace_dir(name: str, root: Optional[str] = None) -> str:
+    root = root or index_root()
+    name = validate_namespace(name)
+    return root if name == DEFAULT_NAMESPACE else os.path.join(root, "ns", name)
+
+
+def raw_dir(name: str) -> str:
+    base = getattr(settings, "RAW_PDF_DIR", os.path.join("data", "raw_pdfs"))
+    name = validate_namespace(name)
+    return base if name == DEFAULT_NAMESPACE else os.path.join(base, name)
+
+
+def list_namespaces(root: Optional[str] = None) -> List[str]:
+    ns_root = os.path.join(root or index_root(), "ns")
+    names = sorted(n for n in os.listdir(ns_root) if _NAME_RE.match(n)) if os.path.isdir(ns_root) else []
+    return [DEFAULT_NAMESPACE] + [n for n in names if n != DEFAULT_NAMESPACE]
+
+
+def namespace_exists(name: str, root: Optional[str] = None) -> bool:
+    """
+    The default namespace always exists; others once their index dir was created
+    (by an upload or a build).
+    """
+    name = validate_namespace(name)
+    return name == DEFAULT_NAMESPACE or os.path.isdir(namespace_dir(name, root))
+
+
+def _index_files(index_dir: str) -> Iterator[str]:
+    """
+    A namespace's index files: shards included, other namespaces, caches and
+    unfinished (.tmp / .part) files not.
+    """
+    for dirpath, dirnames, filenames in os.walk(index_dir):
+        if dirpath == index_dir:
+            dirnames[:] = [d for d in dirnames if d != "ns"]
+        for f in filenames:
+            if f.endswith((".tmp", ".part")) or f == "explore_cache.json":
+                continue
+            yield os.path.join(dirpath, f)
+
+
+def index_bytes(index_dir: str) -> int:
+    """
+    On-disk size of a namespace's index files.
+    """
+    total = 0
+    for path in _index_files(index_dir):
+        if path.endswith(".locations.json"):
+            continue
+        try:
+            total += os.path.getsize(path)
+        except OSError:
+            pass
+    return total
+
+
+def index_version(index_dir: str) -> int:
+    """
+    Newest mtime (ns) of a namespace's index files; changes whenever a build replaces one.
+    """
+    newest = 0
+    for path in _index_files(index_dir):
+        try:
+            newest = max(newest, os.stat(path).st_mtime_ns)
+        except OSError:
+            pass
+    return newest
+
+
+class Namespace:
+    """
+    Loaded stores of one namespace.
+    """
+
+    def __init__(self, name: str, index_dir: str, vector_store, bm25_store, raptor_index=None):
+        self.name = name
+        self.index_dir = index_dir
+        self.vector_store = vector_store
+        self.bm25_store = bm25_store
+        self.raptor_index = raptor_index
+        self.nbytes = index_bytes(index_dir)
+        self.version = index_version(index_dir)
+        self.loaded_at = time.time()
+
+    @property
+    def ready(self) -> bool:
+        return bool(self.vector_store.meta) and bool(self.bm25_store.meta)
+
+    def current(self) -> bool:
+        """
+        False once the index files on disk were rebuilt after this load.
+        """
+        return index_version(self.index_dir) == self.version
+
+
+def open_namespace(name: str, encoder=None, root: Optional[str] = None) -> Namespace:
+    """
+    Load a namespace's stores from disk (sharded when INDEX_SHARDS > 1).
+    """
+    from rag_core.retrieval.bm25_store import BM25Store
+    from rag_core.retrieval.vector_store import VectorStore
+
+    index_dir = namespace_dir(name, root)
+    n_shards = int(getattr(settings, "INDEX_SHARDS", 1))
+    if n_shards > 1:
+        from rag_core.retrieval.sharded import open_sharded
+
+        vector_store = open_sharded(lambda d: VectorStore(index_dir=d, encoder=encoder), index_dir, n_shards)
+        bm25_store = open_sharded(lambda d: BM25Store(index_dir=d), index_dir, n_shards)
+    else:
+        vector_store = VectorStore(index_dir=index_dir, encoder=encoder)
+        bm25_store = BM25Store(index_dir=index_dir)
+
+    raptor_index = None
+    if getattr(settings, "ENABLE_RAPTOR", False):
+        from rag_core.ingestion.raptor import RaptorIndex
+
+        raptor_index = RaptorIndex(index_dir=index_dir)
+    return Namespace(name, index_dir, vector_store, bm25_store, raptor_index)
+
+
+class IndexPool:
+    """
+    LRU cache of loaded namespaces under a memory budget.
+    - get(name) -> Namespace (loads on miss; concurrent misses for one name load once;
+      reloads a namespace whose files were rebuilt on disk since it was loaded)
+    - the namespace just requested is never evicted, even if it alone exceeds the budget
+    - eviction / invalidate() only drop the pool's reference: sessions that still hold
+      the stores keep searching them, memory is reclaimed once the last one lets go
+    """
+
+    def __init__(
+        self,
+        budget_mb: Optional[float] = None,
+        encoder=None,
+        loader: Optional[Callable[..., Namespace]] = None,
+        root: Optional[str] = None,
+    ):
+        self.budget_bytes = int(float(budget_mb if budget_mb is not None else getattr(settings, "INDEX_POOL_MB", 2048)) * 1e6)
+        self.root = root
+        self._encoder = encoder
+        self._loader = loader or open_namespace
+        self._loaded: "OrderedDict[str, Namespace]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading: Dict[str, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def encoder(self):
+        if self._encoder is None:
+            from rag_core.retrieval.encoders import default_encoder
+
+            self._encoder = default_encoder()
+        return self._encoder
+
+    def _hit(self, name: str) -> Optional[Namespace]:
+        with self._lock:
+            ns = self._loaded.get(name)
+        if ns is None or not ns.ready:
+            return None
+        if not ns.current():  # stat() outside the pool lock
+            incr("index_pool_stale")
+            log.info("namespace %s changed on disk; reloading", name)
+            return None
+        with self._lock:
+            if self._loaded.get(name) is not ns:
+                return None
+            self._loaded.move_to_end(name)
+            self.hits += 1
+        incr("index_pool_hit")
+        return ns
+
+    def get(self, name: str) -> Namespace:
+        name = validate_namespace(name)
+        ns = self._hit(name)
+        if ns is not None:
+            return ns
+        with self._lock:
+            load_lock = self._loading.setdefault(name, threading.Lock())
+
+        with load_lock:
+            ns = self._hit(name)
+            if ns is not None:
+                return ns
+
+            t0 = time.perf_counter()
+            ns = self._loader(name, encoder=self.encoder, root=self.root)
+            log.info("loaded namespace %s (%.1f MB) in %.2fs", name, ns.nbytes / 1e6, time.perf_counter() - t0)
+
+            with self._lock:
+                self.misses += 1
+                incr("index_pool_miss")
+                self._loaded.pop(name, None)
+                self._loaded[name] = ns
+                self._evict(keep=name)
+                self._loading.pop(name, None)
+        return ns
+
+    def _evict(self, keep: str) -> None:
+        while self.used_bytes() > self.budget_bytes and len(self._loaded) > 1:
+            name = next(iter(self._loaded))
+            if name == keep:
+                self._loaded.move_to_end(name)
+                continue
+            del self._loaded[name]
+            self.evictions += 1
+            incr("index_pool_eviction")
+            log.info("evicted namespace %s", name)
+
+    def used_bytes(self) -> int:
+        return sum(ns.nbytes for ns in self._loaded.values())
+
+    def invalidate(self, name: str) -> None:
+        with self._lock:
+            self._loaded.pop(validate_namespace(name), None)
+
+    def loaded(self) -> List[str]:
+        with self._lock:
+            return list(self._loaded)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "loaded": list(self._loaded),
+                "used_mb": round(self.used_bytes() / 1e6, 2),
+                "budget_mb": round(self.budget_bytes / 1e6, 2),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+_pool: Optional[IndexPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> IndexPool:
+    """
+    The process-wide pool (shared by every Streamlit session in this process).
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = IndexPool()
+        return _pool
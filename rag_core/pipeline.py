@@ -1,67 +1,264 @@
 # rag_core/pipeline.py
 from __future__ import annotations
 
-from typing import List, Tuple, Dict, Any
+import itertools
+import os
+from typing import List, Tuple, Dict, Any, Optional
 
 from rag_core.config import settings
-from rag_core.schemas import DocChunk
+from rag_core.schemas import DocChunk, RAGResult
+from rag_core.tracing import Trace, incr, span, trace
 
-from rag_core.retrieval.hybrid import hybrid_retrieve
+from rag_core.retrieval.filters import MetadataFilter
+from rag_core.retrieval.hybrid import HybridRetriever
+from rag_core.retrieval.parents import ParentStore, expand_parents, parent_stores
+from rag_core.retrieval.router import QueryRouter
 from rag_core.reranking.llm_reranker import LLMReranker
 from rag_core.generation.answer import generate_answer
-from rag_core.generation.explore import explore_document
+from rag_core.generation.crag import crag_run
+from rag_core.generation.self_rag import EvidenceGrader
+from rag_core.generation.explore import ExploreCache, explore_document
+
+# generic probes for explore mode (run per document, batched)
+PROBE_QUERIES = [
+    "summary key points",
+    "risk factors recommendations",
+    "pregnancy complications outcomes",
+    "screening diagnosis monitoring",
+    "treatment guidance management",
+]
+
+
+def _early_exit(route: Optional[dict]) -> bool:
+    return bool(route and route.get("early_exit"))
 
 
 class Pipeline:
-    def __init__(self, vector_store, bm25_store, llm):
+    def __init__(self, vector_store, bm25_store, llm, raptor_index=None):
         self.vector_store = vector_store
         self.bm25_store = bm25_store
         self.llm = llm
+        self.raptor_index = raptor_index  # optional RaptorIndex (summary leg)
         self.reranker = LLMReranker(llm)
+        self.grader = EvidenceGrader(
+            vector_store,
+            min_relevance=getattr(settings, "SELF_RAG_MIN_RELEVANCE", 0.15),
+            min_sufficiency=getattr(settings, "SELF_RAG_MIN_SUFFICIENCY", 0.25),
+        )
+        self.last_trace: Optional[Trace] = None
+        self.last_crag: Optional[dict] = None  # escalation log of the last CRAG run
+        self._explore_cache: Optional[ExploreCache] = None
+        self._parents: Optional[List[ParentStore]] = None
+        self.last_route: Optional[dict] = None  # router decision of the last retrieve_only()
+        self.last_routes: List[Optional[dict]] = []  # router decisions of the last retrieve_batch()
 
-    def retrieve_only(self, query: str) -> List[DocChunk]:
-        top_k = getattr(settings, "TOP_K", 5)
-
-        docs = hybrid_retrieve(
-            query=query,
+    def retriever(self) -> HybridRetriever:
+        return HybridRetriever(
             vector_store=self.vector_store,
             bm25_store=self.bm25_store,
-            top_k=top_k,
             alpha=getattr(settings, "ALPHA", 0.55),
+            mmr_lambda=getattr(settings, "MMR_LAMBDA", 0.7) if getattr(settings, "ENABLE_MMR", False) else None,
+            router=QueryRouter() if getattr(settings, "ENABLE_ROUTER", False) else None,
         )
 
+    def _candidate_k(self, top_k: int) -> int:
+        # the reranker gets a larger hybrid pool to choose from
         if getattr(settings, "ENABLE_RERANK", False):
-            docs = self.reranker.rerank(query=query, docs=docs, top_k=top_k)
+            return max(top_k, int(getattr(settings, "RERANK_POOL", 20)))
+        return top_k
 
+    def retrieve_only(self, query: str, filters: Optional[MetadataFilter] = None) -> List[DocChunk]:
+        docs, self.last_route = self._retrieve(query, filters=filters)
         return docs
 
-    def run(self, query: str) -> Tuple[str, List[str], List[DocChunk]]:
-        docs = self.retrieve_only(query)
+    def _retrieve(self, query: str, filters: Optional[MetadataFilter] = None) -> Tuple[List[DocChunk], Optional[dict]]:
+        top_k = getattr(settings, "TOP_K", 5)
+
+        retriever = self.retriever()
+        docs = retriever.retrieve(query=query, top_k=self._candidate_k(top_k), filters=filters)
+        route = retriever.last_route
+        docs = self.rerank(query, docs)
+
+        if _early_exit(route):
+            return docs, route  # decisive lexical hit: no summary leg (it would embed the query)
+        return docs + self.retrieve_summaries(query, filters=filters), route
+
+    def rerank(self, query: str, docs: List[DocChunk]) -> List[DocChunk]:
+        """
+        LLM rerank of the leaf candidates down to TOP_K (RAPTOR summaries kept); no-op unless ENABLE_RERANK.
+        """
+        if not getattr(settings, "ENABLE_RERANK", False):
+            return docs
+        leaves = [d for d in docs if d.method != "raptor"]
+        summaries = [d for d in docs if d.method == "raptor"]
+        return self.reranker.rerank(query=query, docs=leaves, top_k=getattr(settings, "TOP_K", 5)) + summaries
+
+    def retrieve_batch(
+        self,
+        queries: List[str],
+        filters: Optional[MetadataFilter] = None,
+        rerank: bool = True,
+    ) -> List[List[DocChunk]]:
+        """
+        retrieve_only() for many queries; each index leg is searched once per batch.
+        rerank=False returns the candidate pools; callers then run rerank() per query
+        (e.g. on their own bounded pool, like the batch CLI).
+        """
+        top_k = getattr(settings, "TOP_K", 5)
+        retriever = self.retriever()
+        with span("retrieve_batch"):
+            batches = retriever.retrieve_batch(list(queries), top_k=self._candidate_k(top_k), filters=filters)
+        routes = retriever.last_routes or [None] * len(batches)
+
+        out = []
+        for query, docs, route in zip(queries, batches, routes):
+            if rerank:
+                docs = self.rerank(query, docs)
+            out.append(docs if _early_exit(route) else docs + self.retrieve_summaries(query, filters=filters))
+        self.last_routes = routes
+        return out
+
+    def _raptor_ready(self) -> bool:
+        return (
+            getattr(settings, "ENABLE_RAPTOR", False)
+            and self.raptor_index is not None
+            and bool(self.raptor_index.nodes)
+            and hasattr(self.vector_store, "encode_query")
+        )
+
+    def retrieve_summaries(self, query: str, filters: Optional[MetadataFilter] = None) -> List[DocChunk]:
+        """
+        RAPTOR leg: a few summary nodes for broad questions (empty when disabled).
+        """
+        if not self._raptor_ready():
+            return []
+        with span("raptor_search"):
+            q_emb = self.vector_store.encode_query(query)
+            return self.raptor_index.search(
+                q_emb, k=getattr(settings, "RAPTOR_TOP_K", 2), filters=filters, sources=getattr(self.bm25_store, "sources", None)
+            )
+
+    def run(self, query: str, filters: Optional[MetadataFilter] = None) -> Tuple[str, List[str], List[DocChunk]]:
+        with trace("run") as tr:
+            if getattr(settings, "ENABLE_CRAG", False):
+                answer, citations, docs = crag_run(self, query, filters=filters)
+            else:
+                docs, self.last_route = self._retrieve(query, filters=filters)
+                answer, citations, docs = self.generate(query, docs, route=self.last_route)
+        self.last_trace = tr
+        return answer, citations, docs
+
+    def expand(self, docs: List[DocChunk]) -> List[DocChunk]:
+        """
+        Small-to-big: replace child chunks with their parent spans (read lazily, final docs only).
+        """
+        if not any(d.parent_id for d in docs):
+            return docs
+        if self._parents is None:
+            self._parents = parent_stores(self.vector_store)
+        with span("parent_fetch"):
+            return expand_parents(docs, self._parents)
+
+    def generate(
+        self,
+        query: str,
+        docs: List[DocChunk],
+        route: Optional[dict] = None,
+    ) -> Tuple[str, List[str], List[DocChunk]]:
+        """
+        Self-RAG gate + one answer generation. Returns (answer, citations, docs sent).
+        Grading runs on the matched child chunks; parents are fetched afterwards.
+        A router early exit (decisive BM25 hit) skips grading: no query embedding at all.
+        """
+        if getattr(settings, "ENABLE_EVIDENCE_GATE", False) and not _early_exit(route):
+            docs, sufficient = self.grader.filter(query, docs)
+            if not sufficient:
+                return "Not available in documents.", [], docs
+        docs = self.expand(docs)
         answer, citations = generate_answer(self.llm, query, docs)
         return answer, citations, docs
 
-    def explore(self) -> Dict[str, Any]:
-        probe_queries = [
-            "summary key points",
-            "risk factors recommendations",
-            "pregnancy complications outcomes",
-            "screening diagnosis monitoring",
-            "treatment guidance management",
-        ]
+    def answer(self, query: str, filters: Optional[MetadataFilter] = None) -> RAGResult:
+        """
+        Same as run(), packaged as RAGResult with the per-stage timing breakdown in debug.
+        """
+        with trace("answer") as tr:
+            answer, citations, docs = self.run(query, filters=filters)
+        return RAGResult(query=query, answer=answer, citations=citations, docs=docs, debug=tr.breakdown())
+
+    def explore_cache(self) -> ExploreCache:
+        if self._explore_cache is None:
+            index_dir = getattr(self.vector_store, "index_dir", os.path.join("data", "indexes"))
+            self._explore_cache = ExploreCache(index_dir)
+        return self._explore_cache
 
+    def explore(self, filters: Optional[MetadataFilter] = None) -> Dict[str, Any]:
+        """
+        Snapshot of the matching documents.
+        Served from the explore cache until one of them is re-ingested.
+        """
+        table = self.bm25_store.sources
+        scope = table.matching_sources(filters)
+        key, version = ExploreCache.key_for(scope), table.version(scope)
+
+        use_cache = bool(scope) and getattr(settings, "EXPLORE_CACHE", True)
+        if use_cache:
+            hit = self.explore_cache().get(key, version)
+            if hit is not None:
+                incr("explore_cache_hit")
+                return hit
+            incr("explore_cache_miss")
+
+        with trace("explore"):
+            result = explore_document(self.llm, self._explore_docs(scope))
+        if use_cache and (result["topics"] or result["questions"]):
+            self.explore_cache().put(key, version, result)
+        return result
+
+    def warm_explore(self) -> int:
+        """
+        Precompute per-document snapshots (e.g. right after an index build).
+        Returns how many were computed.
+        """
+        table = self.bm25_store.sources
+        cache = self.explore_cache()
+        todo = [s for s in table.sources if cache.get(ExploreCache.key_for([s]), table.version([s])) is None]
+        for src in todo:
+            self.explore(MetadataFilter(sources=[src]))
+        return len(todo)
+
+    def _explore_docs(self, scope: List[str], max_leaves: int = 18) -> List[DocChunk]:
+        """
+        Probe chunks per source (one batched, source-filtered search each),
+        interleaved so every document in scope is represented.
+        """
         gathered: List[DocChunk] = []
-        seen = set()
-
-        for q in probe_queries:
-            docs = self.retrieve_only(q)
-            for d in docs:
-                key = (
-                    getattr(d, "source", ""),
-                    getattr(d, "chunk_index", getattr(d, "chunk_id", "")),
-                )
-                if key not in seen:
-                    seen.add(key)
-                    gathered.append(d)
-
-        gathered = gathered[:18]
-        return explore_document(self.llm, gathered)
+
+        # summaries stand in for most of the leaf chunks
+        if self._raptor_ready():
+            gathered.extend(
+                self.raptor_index.top_nodes(filters=MetadataFilter(sources=scope), sources=getattr(self.bm25_store, "sources", None))
+            )
+            max_leaves = 8
+
+        per_source: List[List[DocChunk]] = []
+        top_k = max(2, max_leaves // max(1, len(scope)))
+        retriever = self.retriever()
+        for src in scope:
+            with span("explore_probe"):
+                batches = retriever.retrieve_batch(PROBE_QUERIES, top_k=top_k, filters=MetadataFilter(sources=[src]))
+            seen = set()
+            docs = []
+            for d in itertools.chain.from_iterable(batches):
+                if d.id not in seen:
+                    seen.add(d.id)
+                    docs.append(d)
+            per_source.append(docs)
+
+        leaves: List[DocChunk] = []
+        seen_ids = set()
+        for d in itertools.chain.from_iterable(itertools.zip_longest(*per_source)):
+            if d is not None and d.id not in seen_ids:
+                seen_ids.add(d.id)
+                leaves.append(d)
+        return gathered + leaves[:max_leaves]
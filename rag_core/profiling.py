@@ -0,0 +1,232 @@
+# rag_core/profiling.py
+"""
+Opt-in profiling for index builds and query batches.
+
+Enable with RAG_PROFILE=1 (or run `python -m rag_core.profiling ...`).
+The outermost profile_stage() starts a session that runs:
+- cProfile on the calling thread          -> <name>-<ts>.pstats / .txt
+- a stack sampler over all threads        -> <name>-<ts>.folded (flamegraph.pl / speedscope)
+- tracemalloc                             -> peak memory
+Nested profile_stage() calls (from any thread) are recorded as sub-stages
+with wall time, CPU time and peak traced memory above the stage's starting
+point -> <name>-<ts>.json
+When profiling is off, profile_stage() is a no-op.
+"""
+from __future__ import annotations
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from rag_core.config import settings
+from rag_core.logger import get_logger
+
+log = get_logger("rag.profile")
+
+_lock = threading.Lock()
+_active: Optional["ProfileSession"] = None
+_forced = False
+
+
+def profiling_enabled() -> bool:
+    return _forced or bool(getattr(settings, "PROFILE", False))
+
+
+def enable_profiling(on: bool = True) -> None:
+    global _forced
+    _forced = bool(on)
+
+
+class _Sampler(threading.Thread):
+    """
+    Samples every thread's Python stack at a fixed interval into folded stacks.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval
+        self.stacks: Dict[str, int] = {}
+        self._stop_evt = threading.Event()
+
+    def run(self) -> None:
+        me = threading.get_ident()
+        names = {}
+        while not self._stop_evt.wait(self.interval):
+            for t in threading.enumerate():
+                names[t.ident] = t.name
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                parts = []
+                while frame is not None:
+                    code = frame.f_code
+                    parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                parts.append(names.get(tid, str(tid)))
+                key = ";".join(reversed(parts))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def stop(self) -> None:
+        self._stop_evt.set()
+        self.join()
+
+
+class ProfileSession:
+    def __init__(self, name: str, out_dir: str):
+        self.name = name
+        self.out_dir = out_dir
+        self.stages: Dict[str, dict] = {}
+        self._stage_lock = threading.Lock()
+        self._profiler = cProfile.Profile()
+        self._sampler = _Sampler(interval=float(getattr(settings, "PROFILE_SAMPLE_INTERVAL", 0.005)))
+        self._own_tracemalloc = False
+        self._peak = 0
+
+    def note_peak(self, peak_bytes: int) -> None:
+        with self._stage_lock:
+            self._peak = max(self._peak, peak_bytes)
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._own_tracemalloc = True
+        tracemalloc.reset_peak()
+        self._wall0 = time.perf_counter()
+        self._cpu0 = time.process_time()
+        self._sampler.start()
+        self._profiler.enable()
+
+    def record(self, stage: str, wall: float, cpu: float, peak_bytes: int) -> None:
+        with self._stage_lock:
+            st = self.stages.setdefault(stage, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "peak_mb": 0.0})
+            st["calls"] += 1
+            st["wall_s"] += wall
+            st["cpu_s"] += cpu
+            st["peak_mb"] = max(st["peak_mb"], peak_bytes / 1e6)
+
+    def stop(self) -> dict:
+        self._profiler.disable()
+        self._sampler.stop()
+        peak = max(tracemalloc.get_traced_memory()[1], self._peak)
+        if self._own_tracemalloc:
+            tracemalloc.stop()
+
+        os.makedirs(self.out_dir, exist_ok=True)
+        base = os.path.join(self.out_dir, f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}")
+
+        self._profiler.dump_stats(base + ".pstats")
+        buf = io.StringIO()
+        pstats.Stats(self._profiler, stream=buf).sort_stats("cumulative").print_stats(40)
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(buf.getvalue())
+
+        with open(base + ".folded", "w", encoding="utf-8") as f:
+            for stack, n in sorted(self._sampler.stacks.items()):
+                f.write(f"{stack} {n}\n")
+
+        report = {
+            "name": self.name,
+            "wall_s": round(time.perf_counter() - self._wall0, 4),
+            "cpu_s": round(time.process_time() - self._cpu0, 4),
+            "peak_mb": round(peak / 1e6, 3),
+            "stages": {
+                k: {**v, "wall_s": round(v["wall_s"], 4), "cpu_s": round(v["cpu_s"], 4), "peak_mb": round(v["peak_mb"], 3)}
+                for k, v in self.stages.items()
+            },
+            "files": {"pstats": base + ".pstats", "top": base + ".txt", "folded": base + ".folded"},
+        }
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+        log.info("profile %s: %.2fs wall, %.1f MB peak -> %s.json", self.name, report["wall_s"], report["peak_mb"], base)
+        return report
+
+
+@contextmanager
+def profile_stage(name: str) -> Iterator[None]:
+    global _active
+    if not profiling_enabled():
+        yield
+        return
+
+    with _lock:
+        root = _active is None
+        if root:
+            _active = ProfileSession(name, getattr(settings, "PROFILE_DIR", os.path.join("data", "profiles")))
+        session = _active
+
+    if root:
+        session.start()
+        try:
+            yield
+        finally:
+            with _lock:
+                _active = None
+            session.stop()
+        return
+
+    # peak is reset per stage; a finished inner stage hands its absolute peak to the outer one
+    stack = _stage_stack()
+    frame = {"peak": 0}
+    stack.append(frame)
+    wall0, cpu0 = time.perf_counter(), time.thread_time()
+    mem0, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    try:
+        yield
+    finally:
+        stack.pop()
+        peak = max(tracemalloc.get_traced_memory()[1], frame["peak"])
+        if stack:
+            stack[-1]["peak"] = max(stack[-1]["peak"], peak)
+        session.note_peak(peak)
+        session.record(name, time.perf_counter() - wall0, time.thread_time() - cpu0, max(0, peak - mem0))
+
+
+_local = threading.local()
+
+
+def _stage_stack() -> list:
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Profile an index build or a batch of queries.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="profile VectorStore + BM25Store builds")
+    b.add_argument("--pdf-dir", default=getattr(settings, "RAW_PDF_DIR", "data/raw_pdfs"))
+    q = sub.add_parser("query", help="profile retrieval over a file of queries (one per line)")
+    q.add_argument("--queries", default=os.path.join("data", "eval_questions", "queries_only.txt"))
+    args = ap.parse_args()
+
+    enable_profiling(True)
+    from rag_core.retrieval.bm25_store import BM25Store
+    from rag_core.retrieval.vector_store import VectorStore
+
+    if args.cmd == "build":
+        from rag_core.jobs import index_pdfs
+
+        with profile_stage("index_build"):
+            index_pdfs(args.pdf_dir)
+    else:
+        from rag_core.pipeline import Pipeline
+
+        with open(args.queries, "r", encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+        pipe = Pipeline(VectorStore(), BM25Store(), llm=None)
+        with profile_stage("query_batch"):
+            for qq in queries:
+                with profile_stage("retrieve"):
+                    pipe.retrieve_only(qq)
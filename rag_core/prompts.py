@@ -12,7 +12,9 @@ Rules:
 - If the document truly does not contain related information, reply exactly:
   Not available in documents.
 - Keep answers concise and factual.
-- Cite sources inline like: [diabetes of woman.pdf | chunk 94]
+- Cite sources inline by copying a context label exactly, e.g.
+  [diabetes of woman.pdf | chunk 94], [diabetes of woman.pdf | chunk 94-96],
+  [diabetes of woman.pdf | section 3] or [diabetes of woman.pdf | summary 2]
 - If you provide bullets, put at least one citation in every bullet.
 
 CONTEXT:
@@ -32,24 +34,35 @@ Goal:
 - Extract 6-10 key topics
 - Generate 10-15 highly answerable questions that can be answered using ONLY the given excerpts.
 - Questions must be specific, not generic.
-- Each question MUST reference at least one chunk id that contains the answer.
+- Each question MUST reference at least one excerpt label that contains the answer,
+  copied exactly as shown in the excerpts (e.g. "[source | chunk 47]",
+  "[source | chunk 47-49]", "[source | section 3]", "[source | summary 2]").
 
 Output STRICT JSON ONLY with this schema:
-{
+{{
   "snapshot": "string",
   "topics": ["t1","t2",...],
   "questions": [
-    {
+    {{
       "q": "question text",
-      "support": ["source|chunk 47", "source|chunk 198"]
-    }
+      "support": ["[source | chunk 47]", "[source | chunk 198-199]"]
+    }}
   ]
-}
+}}
 
 EXCERPTS:
 {context}
 """
 
+RAPTOR_SUMMARY_PROMPT = """Summarize the following document excerpts in 4-6 factual sentences.
+Keep specific terms, numbers, names and recommendations. Do not add information.
+
+EXCERPTS:
+{text}
+
+SUMMARY:
+"""
+
 QUERY_EXPANSION_PROMPT = """Generate {n} alternative search queries for the user question.
 Keep them short and varied. One per line. No numbering.
 
@@ -58,7 +71,7 @@ Question:
 """
 
 RERANK_PROMPT = """You are ranking passages for relevance to a question.
-Return ONLY the top {top_k} passage indices as comma-separated numbers (e.g., "2,0,3").
+Return ONLY the numbers of the top {top_k} passages (the N in [PN]), best first, comma-separated (e.g., "3,1,2").
 
 Question:
 {query}
@@ -1,89 +1,167 @@
 # rag_core/reranking/llm_reranker.py
+"""
+Listwise LLM reranking.
+
+Small pools (<= window) are ranked with a single prompt. Larger pools run a
+tournament: candidates are split into overlapping windows, the windows are
+ranked concurrently (bounded pool), the best few of every window advance,
+and rounds repeat until one window is left; that window gives the final
+order. Passages are trimmed to their most query-relevant sentences first,
+so prompts stay short regardless of chunk size.
+"""
 from __future__ import annotations
 
 import json
-from typing import List
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 
+from rag_core.config import settings
 from rag_core.prompts import RERANK_PROMPT
+from rag_core.retrieval.analyzers import STOPWORDS
 from rag_core.schemas import DocChunk
+from rag_core.tracing import bind, span
+
+_SENT_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+_WORD_RE = re.compile(r"\w+")
+
+
+def trim_passage(text: str, query: str, max_sentences: int = 3, max_chars: int = 600) -> str:
+    """
+    Keep the sentences sharing the most query terms (original order), capped at max_chars.
+    """
+    text = (text or "").strip()
+    if len(text) <= max_chars:
+        return text
+    sents = [s.strip() for s in _SENT_RE.split(text) if s.strip()]
+    q_terms = {w for w in _WORD_RE.findall(query.lower()) if w not in STOPWORDS}
+    scored = sorted(
+        range(len(sents)),
+        key=lambda i: (-len(q_terms & set(_WORD_RE.findall(sents[i].lower()))), i),
+    )
+    keep = sorted(scored[: max(1, int(max_sentences))])
+    out = " … ".join(sents[i] for i in keep)
+    return out[:max_chars]
+
+
+def parse_ranking(raw: str, n: int) -> List[int]:
+    """
+    LLM output -> 0-based indices (best first, deduplicated, in range).
+    Accepts {"ranking":[2,1,...]} or "2,1,3" with 1-based passage numbers.
+    """
+    raw = (raw or "").strip()
+    ranking = None
+    try:
+        obj = json.loads(raw)
+        ranking = obj.get("ranking") if isinstance(obj, dict) else obj
+    except Exception:
+        ranking = None
+    if not isinstance(ranking, list):
+        ranking = [int(p) for p in re.findall(r"\d+", raw)]
+
+    seen = set()
+    out = []
+    for idx in ranking:
+        if isinstance(idx, int) and 0 <= idx - 1 < n and idx - 1 not in seen:
+            seen.add(idx - 1)
+            out.append(idx - 1)
+    return out
+
+
+def windows(n: int, size: int, stride: int) -> List[range]:
+    """
+    Overlapping [start, start+size) windows covering range(n); the last one ends at n.
+    """
+    if n <= size:
+        return [range(n)]
+    out = [range(s, s + size) for s in range(0, n - size, stride)]
+    out.append(range(n - size, n))
+    return out
 
 
 class LLMReranker:
     """
-    LLM-based reranker expecting JSON:
-    {"ranking":[1,2,3,...]}  (1-based indices referring to P1..Pn)
+    LLM-based listwise reranker; passages are numbered [P1]..[Pn], the LLM
+    returns the best passage numbers ("3,1,2" or {"ranking":[3,1,2]}).
+    - window / stride: tournament window size and step (overlap = window - stride)
+    - max_workers: concurrent window prompts
+    - max_sentences: passage trimming (0 = send the first 1200 chars as before)
     """
 
-    def __init__(self, llm):
+    def __init__(
+        self,
+        llm,
+        window: Optional[int] = None,
+        stride: Optional[int] = None,
+        max_workers: Optional[int] = None,
+        max_sentences: Optional[int] = None,
+    ):
         self.llm = llm
+        self.window = max(2, int(window or getattr(settings, "RERANK_WINDOW", 20)))
+        self.stride = max(1, min(self.window, int(stride or getattr(settings, "RERANK_STRIDE", 15))))
+        self.max_workers = max(1, int(max_workers or getattr(settings, "RERANK_WORKERS", 4)))
+        self.max_sentences = int(max_sentences if max_sentences is not None else getattr(settings, "RERANK_SENTENCES", 3))
+        self.last_rounds = 0  # tournament rounds of the last rerank() (debug)
 
     def rerank(self, query: str, docs: List[DocChunk], top_k: int = 5) -> List[DocChunk]:
+        with span("rerank"):
+            return self._rerank(query, docs, top_k=top_k)
+
+    def _passage(self, query: str, d: DocChunk) -> str:
+        text = (getattr(d, "text", "") or "").strip()
+        if self.max_sentences <= 0:
+            return text[:1200]
+        return trim_passage(text, query, max_sentences=self.max_sentences)
+
+    def _rank_window(self, query: str, passages: List[str], keep: int) -> List[int]:
+        """
+        One listwise prompt -> local indices, best first; unranked ones follow in input order.
+        """
+        blocks = "\n\n".join(f"[P{i}]\n{p}" for i, p in enumerate(passages, start=1))
+        prompt = RERANK_PROMPT.format(query=query, passages=blocks, top_k=keep)
+        try:
+            with span("rerank_window"):
+                ranked = parse_ranking(self.llm(prompt), len(passages))
+        except Exception:
+            ranked = []
+        ranked_set = set(ranked)
+        return ranked + [i for i in range(len(passages)) if i not in ranked_set]
+
+    def _rerank(self, query: str, docs: List[DocChunk], top_k: int = 5) -> List[DocChunk]:
         if not docs:
             return []
 
         top_k = max(1, min(int(top_k), len(docs)))
-
-        blocks = []
-        for i, d in enumerate(docs, start=1):
-            text = (getattr(d, "text", "") or "").strip()
-            blocks.append(f"[P{i}]\n{text[:1200]}")
-
-        passages = "\n\n".join(blocks)
-        prompt = RERANK_PROMPT.format(query=query, passages=passages)
-        raw = (self.llm(prompt) or "").strip()
-
-        ranking = None
-        try:
-            obj = json.loads(raw)
-            ranking = obj.get("ranking", None)
-            if not isinstance(ranking, list):
-                ranking = None
-        except Exception:
-            ranking = None
-
-        # fallback parse "1,2,3"
-        if not ranking:
-            cleaned = raw.replace("\n", ",").replace(" ", "")
-            parts = [p for p in cleaned.split(",") if p]
-            parsed = []
-            for p in parts:
-                if p.isdigit():
-                    parsed.append(int(p))
-            ranking = parsed if parsed else None
-
-        if not ranking:
-            # fallback original order
-            out = []
-            for d in docs[:top_k]:
-                d2 = d.model_copy() if hasattr(d, "model_copy") else d
-                try:
-                    d2.method = "rerank"
-                except Exception:
-                    pass
-                out.append(d2)
-            return out
-
-        # normalize 1-based -> 0-based, dedupe
-        seen = set()
-        norm = []
-        for idx in ranking:
-            if not isinstance(idx, int):
-                continue
-            j = idx - 1
-            if 0 <= j < len(docs) and j not in seen:
-                norm.append(j)
-                seen.add(j)
-
-        if not norm:
-            norm = list(range(len(docs)))
+        passages = [self._passage(query, d) for d in docs]
+
+        # tournament: rank overlapping windows concurrently, best of each advance
+        cand = list(range(len(docs)))
+        advance = max(top_k, self.window - self.stride, self.window // 4)
+        rounds = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="rerank") as pool:
+            while len(cand) > self.window:
+                rounds += 1
+                wins = windows(len(cand), self.window, self.stride)
+                futures = [
+                    pool.submit(bind(self._rank_window), query, [passages[cand[j]] for j in w], advance) for w in wins
+                ]
+                best: Dict[int, tuple] = {}  # doc -> (best rank in any window, first position)
+                for w, fut in zip(wins, futures):
+                    for rank, local in enumerate(fut.result()[:advance]):
+                        doc = cand[w[local]]
+                        best[doc] = min(best.get(doc, (rank, w[local])), (rank, w[local]))
+                nxt = sorted(best, key=lambda doc: best[doc])
+                if len(nxt) >= len(cand):  # no progress (tiny stride); fall back to a plain cut
+                    nxt = nxt[: self.window]
+                cand = nxt
+
+        rounds += 1
+        order = self._rank_window(query, [passages[i] for i in cand], top_k)
+        self.last_rounds = rounds
 
         out: List[DocChunk] = []
-        for j in norm[:top_k]:
-            d2 = docs[j].model_copy() if hasattr(docs[j], "model_copy") else docs[j]
-            try:
-                d2.method = "rerank"
-            except Exception:
-                pass
+        for local in order[:top_k]:
+            d2 = docs[cand[local]].model_copy()
+            d2.method = "rerank"
             out.append(d2)
-
         return out
@@ -0,0 +1,175 @@
+# rag_core/retrieval/analyzers.py
+"""
+Text analyzers for the BM25 index.
+
+Analyzer pipeline (configurable, persisted with the index):
+1) compiled Unicode word tokenizer (keeps non-ASCII letters and digits)
+2) casefold + accent folding (NFKD, combining marks dropped)
+3) stopword removal (English list; extendable)
+4) light English suffix stemmer (ASCII words only, so other languages pass through)
+5) optional word n-grams ("blood_glucose")
+
+Per-token normalization is memoized, and terms are interned to integer ids
+by Vocabulary so postings store ints instead of strings.
+"""
+from __future__ import annotations
+
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional
+
+from rag_core.config import settings
+
+_WORD_RE = re.compile(r"[^\W_]+", re.UNICODE)
+_LEGACY_RE = re.compile(r"[a-z0-9]+")
+_ASCII_WORD_RE = re.compile(r"[a-z]+")
+
+STOPWORDS = frozenset(
+    """
+    a about above after again against all am an and any are as at be because been before being below between both
+    but by can could did do does doing down during each few for from further had has have having he her here hers
+    herself him himself his how i if in into is it its itself just me more most my myself no nor not now of off on
+    once only or other our ours ourselves out over own same she should so some such than that the their theirs them
+    themselves then there these they this those through to too under until up very was we were what when where
+    which while who whom why will with would you your yours yourself yourselves
+    """.split()
+)
+
+
+def fold(text: str) -> str:
+    """
+    Casefold + strip accents: "Éclampsie" -> "eclampsie".
+    """
+    text = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def light_stem(word: str) -> str:
+    """
+    Conservative English suffix stripping (plural, -ing, -ed, -ly).
+    """
+    if len(word) <= 3 or not _ASCII_WORD_RE.fullmatch(word):
+        return word
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith(("sses", "shes", "ches", "xes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        word = word[:-1]
+    for suf in ("ingly", "edly", "ing", "ed", "ly"):
+        if word.endswith(suf) and len(word) - len(suf) >= 3:
+            stem = word[: -len(suf)]
+            if len(stem) > 2 and stem[-1] == stem[-2] and stem[-1] not in "lsz":
+                stem = stem[:-1]  # "planned" -> "plan"
+            return stem
+    return word
+
+
+class Analyzer:
+    """
+    text -> list of index terms.
+    - Analyzer.legacy() reproduces the old "[a-z0-9]+" tokenizer (old index files)
+    - config() / Analyzer.from_config() persist the settings next to the index
+    """
+
+    def __init__(
+        self,
+        fold_unicode: bool = True,
+        stopwords: bool = True,
+        stemmer: Optional[str] = "light",
+        ngrams: int = 1,
+        extra_stopwords: Iterable[str] = (),
+        legacy: bool = False,
+    ):
+        self.fold_unicode = bool(fold_unicode)
+        self.stopwords = bool(stopwords)
+        self.stemmer = stemmer if stemmer not in ("", "none") else None
+        self.ngrams = max(1, int(ngrams))
+        self.extra_stopwords = sorted({fold(w) for w in extra_stopwords})
+        self.legacy = bool(legacy)
+
+        self._stop = (STOPWORDS | frozenset(self.extra_stopwords)) if self.stopwords else frozenset()
+        self._terms: Dict[str, Optional[str]] = {}  # token -> term (None = dropped)
+
+    @classmethod
+    def legacy_analyzer(cls) -> "Analyzer":
+        return cls(fold_unicode=False, stopwords=False, stemmer=None, legacy=True)
+
+    @classmethod
+    def from_config(cls, cfg: dict) -> "Analyzer":
+        return cls(**cfg)
+
+    def config(self) -> dict:
+        return {
+            "fold_unicode": self.fold_unicode,
+            "stopwords": self.stopwords,
+            "stemmer": self.stemmer,
+            "ngrams": self.ngrams,
+            "extra_stopwords": self.extra_stopwords,
+            "legacy": self.legacy,
+        }
+
+    def _term(self, token: str) -> Optional[str]:
+        term = self._terms.get(token, "")
+        if term != "":
+            return term
+
+        t = fold(token) if self.fold_unicode else token.lower()
+        if t in self._stop:
+            term = None
+        elif self.stemmer == "light":
+            term = light_stem(t)
+        else:
+            term = t
+        if len(self._terms) < 500_000:
+            self._terms[token] = term
+        return term
+
+    def __call__(self, text: str) -> List[str]:
+        if self.legacy:
+            return _LEGACY_RE.findall((text or "").lower())
+
+        terms = [t for t in map(self._term, _WORD_RE.findall(text or "")) if t]
+        if self.ngrams > 1:
+            grams = []
+            for n in range(2, self.ngrams + 1):
+                grams.extend("_".join(terms[i : i + n]) for i in range(len(terms) - n + 1))
+            terms.extend(grams)
+        return terms
+
+
+def default_analyzer() -> Analyzer:
+    """
+    Analyzer configured from settings (BM25_STOPWORDS / BM25_STEMMER / BM25_NGRAMS).
+    """
+    return Analyzer(
+        stopwords=getattr(settings, "BM25_STOPWORDS", True),
+        stemmer=getattr(settings, "BM25_STEMMER", "light"),
+        ngrams=getattr(settings, "BM25_NGRAMS", 1),
+    )
+
+
+class Vocabulary:
+    """
+    Term <-> integer id, each term stored once.
+    """
+
+    def __init__(self, terms: Iterable[str] = ()):
+        self.terms: List[str] = []
+        self._ids: Dict[str, int] = {}
+        for t in terms:
+            self.add(t)
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def add(self, term: str) -> int:
+        tid = self._ids.get(term)
+        if tid is None:
+            tid = len(self.terms)
+            self._ids[term] = tid
+            self.terms.append(term)
+        return tid
+
+    def get(self, term: str) -> Optional[int]:
+        return self._ids.get(term)
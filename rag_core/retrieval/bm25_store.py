@@ -2,22 +2,92 @@
 from __future__ import annotations
 
 import os
-import glob
 import json
-import re
-from typing import List, Optional
+from typing import Iterable, List, Optional, Union
 
-from rank_bm25 import BM25Okapi
+import numpy as np
 
-from rag_core.ingestion.pdf_loader import load_pdfs
-from rag_core.ingestion.chunkers import chunk_text
+from rag_core.config import settings
+from rag_core.profiling import profile_stage
+from rag_core.retrieval.analyzers import Analyzer, Vocabulary, default_analyzer
+from rag_core.retrieval.filters import MetadataFilter, SourceTable
+from rag_core.retrieval.locations import apply_locations, locations_path, save_locations
+from rag_core.retrieval.parents import default_parent_size, is_parent
 from rag_core.schemas import DocChunk
+from rag_core.tracing import span
 
+FORMAT_VERSION = 2
 
-def _tokenize(text: str) -> List[str]:
-    text = (text or "").lower()
-    # simple tokenizer
-    return re.findall(r"[a-z0-9]+", text)
+
+class BM25Postings:
+    """
+    Okapi BM25 over term-major postings (CSR: term_ptr -> docs/tfs).
+    Same formula and defaults as rank_bm25.BM25Okapi: idf = ln((N - df + .5) / (df + .5)),
+    negative idf floored to epsilon * mean idf. The tf/length part of each
+    posting is precomputed, so scoring is one vectorized add per query term.
+    """
+
+    def __init__(
+        self,
+        term_ptr: np.ndarray,
+        docs: np.ndarray,
+        tfs: np.ndarray,
+        doc_len: np.ndarray,
+        k1: float = 1.5,
+        b: float = 0.75,
+        epsilon: float = 0.25,
+    ):
+        self.term_ptr = np.asarray(term_ptr, dtype="int64")
+        self.docs = np.asarray(docs, dtype="int32")
+        self.tfs = np.asarray(tfs, dtype="uint16")
+        self.doc_len = np.asarray(doc_len, dtype="int32")
+        self.n_docs = int(len(self.doc_len))
+
+        df = np.diff(self.term_ptr).astype("float64")
+        idf = np.log(self.n_docs - df + 0.5) - np.log(df + 0.5)
+        if len(idf):
+            idf[idf < 0] = epsilon * idf.mean()
+        self.idf = idf.astype("float32")
+
+        avgdl = float(self.doc_len.mean()) if self.n_docs else 1.0
+        tf = self.tfs.astype("float32")
+        dl = self.doc_len[self.docs].astype("float32")
+        self.weights = tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / max(avgdl, 1e-9)))
+
+    @classmethod
+    def from_doc_terms(cls, doc_terms: List[np.ndarray], doc_tfs: List[np.ndarray], doc_len: List[int], n_terms: int) -> "BM25Postings":
+        """
+        doc-major input (unique term ids + counts per doc) -> term-major postings.
+        """
+        terms = np.concatenate(doc_terms) if doc_terms else np.zeros(0, dtype="int32")
+        tfs = np.concatenate(doc_tfs) if doc_tfs else np.zeros(0, dtype="uint16")
+        docs = np.repeat(np.arange(len(doc_terms), dtype="int32"), [len(t) for t in doc_terms])
+
+        order = np.argsort(terms, kind="stable")
+        term_ptr = np.zeros(n_terms + 1, dtype="int64")
+        np.cumsum(np.bincount(terms, minlength=n_terms), out=term_ptr[1:])
+        return cls(term_ptr, docs[order], tfs[order], np.asarray(doc_len, dtype="int32"))
+
+    def scores(self, term_ids: List[int]) -> np.ndarray:
+        out = np.zeros(self.n_docs, dtype="float32")
+        for t in term_ids:
+            lo, hi = self.term_ptr[t], self.term_ptr[t + 1]
+            out[self.docs[lo:hi]] += self.idf[t] * self.weights[lo:hi]
+        return out
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            np.savez(f, term_ptr=self.term_ptr, docs=self.docs, tfs=self.tfs, doc_len=self.doc_len)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Postings":
+        with np.load(path) as z:
+            return cls(z["term_ptr"], z["docs"], z["tfs"], z["doc_len"])
+
+
+def _doc_postings(term_ids: List[int]):
+    ids, counts = np.unique(np.asarray(term_ids, dtype="int32"), return_counts=True)
+    return ids, counts.astype("uint16")
 
 
 class BM25Store:
@@ -25,90 +95,183 @@ class BM25Store:
     BM25 index over chunks.
     - build(pdf_dir) builds corpus
     - search(query, k) returns DocChunk list
+    - search(..., filters=MetadataFilter) only ranks rows of matching sources
+    - text goes through a pluggable Analyzer (see retrieval/analyzers.py);
+      terms are interned to ids and postings live in <meta>.npz
+    - indexes written by the old token-list format still load
     """
 
     def __init__(
         self,
         index_dir: str = os.path.join("data", "indexes"),
         meta_name: str = "bm25_meta.json",
+        analyzer: Optional[Analyzer] = None,
     ):
         self.index_dir = index_dir
         os.makedirs(self.index_dir, exist_ok=True)
 
         self.meta_path = os.path.join(self.index_dir, meta_name)
+        self.postings_path = os.path.splitext(self.meta_path)[0] + ".npz"
 
-        self.bm25: Optional[BM25Okapi] = None
-        self.meta: List[dict] = []        # parallel to corpus: {id, source, chunk_index, text}
-        self.corpus_tokens: List[List[str]] = []
+        self.analyzer = analyzer or default_analyzer()
+        self.vocab = Vocabulary()
+        self.bm25: Optional[BM25Postings] = None
+        self.meta: List[dict] = []        # parallel to postings docs: {id, source, chunk_index, text}
+        self.sources = SourceTable([])  # per-source row ids for filtering
 
         # optional load
         self._try_load()
 
     def _try_load(self) -> None:
-        # BM25 model cannot be perfectly restored without corpus tokens
-        # so we store meta + tokens, rebuild bm25 on load
         if os.path.exists(self.meta_path):
             try:
                 with open(self.meta_path, "r", encoding="utf-8") as f:
                     payload = json.load(f)
-                self.meta = payload.get("meta", [])
-                self.corpus_tokens = payload.get("corpus_tokens", [])
-                if self.meta and self.corpus_tokens:
-                    self.bm25 = BM25Okapi(self.corpus_tokens)
+                self.meta = apply_locations(payload.get("meta", []), self.meta_path)
+
+                if "corpus_tokens" in payload:
+                    # old format: raw token lists from the "[a-z0-9]+" tokenizer
+                    self.analyzer = Analyzer.legacy_analyzer()
+                    self.vocab = Vocabulary()
+                    doc_terms, doc_tfs, doc_len = [], [], []
+                    for toks in payload["corpus_tokens"]:
+                        ids, tfs = _doc_postings([self.vocab.add(t) for t in toks])
+                        doc_terms.append(ids)
+                        doc_tfs.append(tfs)
+                        doc_len.append(len(toks))
+                    self.bm25 = BM25Postings.from_doc_terms(doc_terms, doc_tfs, doc_len, len(self.vocab))
+                else:
+                    self.analyzer = Analyzer.from_config(payload.get("analyzer") or {})
+                    self.vocab = Vocabulary(payload.get("vocab", []))
+                    self.bm25 = BM25Postings.load(self.postings_path)
+                if not self.meta or self.bm25.n_docs != len(self.meta):
+                    raise ValueError("BM25 postings do not match meta")
             except Exception:
                 self.bm25 = None
                 self.meta = []
-                self.corpus_tokens = []
-
-    def build(self, pdf_dir: str, chunk_size: int = 800, overlap: int = 200) -> None:
-        pdf_paths = sorted(glob.glob(os.path.join(pdf_dir, "*.pdf")))
-        if not pdf_paths:
-            raise RuntimeError(f"No PDFs found in: {pdf_dir}")
-
-        meta: List[dict] = []
-        corpus_tokens: List[List[str]] = []
-
-        for path in pdf_paths:
-            source = os.path.basename(path)
-            full_text = load_pdfs(path)
-            chunks = chunk_text(full_text, size=chunk_size, overlap=overlap)
-
-            for i, ch in enumerate(chunks):
-                cid = f"{source}::chunk_{i}"
-                meta.append(
-                    {
-                        "id": cid,
-                        "source": source,
-                        "chunk_index": i,
-                        "text": ch,
-                    }
-                )
-                corpus_tokens.append(_tokenize(ch))
-
-        self.meta = meta
-        self.corpus_tokens = corpus_tokens
-        self.bm25 = BM25Okapi(self.corpus_tokens)
-
-        # persist
-        with open(self.meta_path, "w", encoding="utf-8") as f:
-            json.dump(
-                {"meta": self.meta, "corpus_tokens": self.corpus_tokens},
-                f,
-                ensure_ascii=False,
-                indent=2,
-            )
+                self.vocab = Vocabulary()
+        self.sources = SourceTable(self.meta)
+
+    def clear(self) -> None:
+        """
+        Remove this store's index files (e.g. a shard whose sources were all deleted).
+        """
+        for path in (self.meta_path, self.postings_path, locations_path(self.meta_path)):
+            if os.path.exists(path):
+                os.remove(path)
+        self.bm25 = None
+        self.meta = []
+        self.vocab = Vocabulary()
+        self.sources = SourceTable([])
+
+    def build(
+        self,
+        pdf_dir: Union[str, List[str]],
+        chunk_size: int = 800,
+        overlap: int = 200,
+        dedup: Optional[bool] = None,
+        parent_size: Optional[int] = None,
+    ) -> None:
+        """
+        parent_size=None follows settings.ENABLE_PARENT_CHILD / PARENT_CHUNK_SIZE;
+        with parents, chunk_size/overlap size the children. Parent spans are not
+        written here: jobs.index_pdfs builds both stores + ParentStore in one go.
+        """
+        from rag_core.ingestion.corpus import iter_chunk_records, resolve_pdf_paths
+
+        with profile_stage("bm25_build"):
+            pdf_paths = resolve_pdf_paths(pdf_dir)
+            if parent_size is None:
+                parent_size = default_parent_size()
+            records = iter_chunk_records(pdf_paths, chunk_size=chunk_size, overlap=overlap, parent_size=parent_size)
+            self.build_from_records(records, dedup=dedup)
+
+    def build_from_records(self, records: Iterable[dict], dedup: Optional[bool] = False, load: bool = True) -> None:
+        """
+        Streaming build: meta is written as records arrive; only the (int) postings
+        are kept in memory. New builds use the configured analyzer.
+        dedup=None follows settings.ENABLE_DEDUP; load=False skips the reload.
+        """
+        from rag_core.ingestion.dedup import dedup_stream
+        from rag_core.ingestion.streaming import JsonArrayWriter, batched
 
-    def search(self, query: str, k: int = 5) -> List[DocChunk]:
+        records = (r for r in records if not is_parent(r))  # parent spans go to ParentStore
+        if dedup is None:
+            dedup = getattr(settings, "ENABLE_DEDUP", True)
+        locations: dict = {}
+        if dedup:
+            records, locations = dedup_stream(records, threshold=getattr(settings, "DEDUP_THRESHOLD", 0.9))
+
+        if self.analyzer.legacy:
+            self.analyzer = default_analyzer()
+        vocab = Vocabulary()
+        doc_terms: List[np.ndarray] = []
+        doc_tfs: List[np.ndarray] = []
+        doc_len: List[int] = []
+
+        tmp_meta = self.meta_path + ".part"
+        try:
+            with open(tmp_meta, "w", encoding="utf-8") as f:
+                f.write(f'{{"format": {FORMAT_VERSION}, "analyzer": {json.dumps(self.analyzer.config())}, "meta": ')
+                with JsonArrayWriter(f) as meta_out:
+                    for batch in batched(records):
+                        with profile_stage("tokenize"):
+                            for r in batch:
+                                terms = self.analyzer(r["text"])
+                                ids, tfs = _doc_postings([vocab.add(t) for t in terms])
+                                doc_terms.append(ids)
+                                doc_tfs.append(tfs)
+                                doc_len.append(len(terms))
+                        with profile_stage("index_write"):
+                            for r in batch:
+                                meta_out.write(r)
+                if not meta_out.count:
+                    raise RuntimeError("BM25Store.build(): No extractable text chunks were created.")
+
+                # persist: vocabulary once, postings as arrays
+                with profile_stage("index_write"):
+                    f.write(', "vocab": ')
+                    json.dump(vocab.terms, f, ensure_ascii=False)
+                    f.write("}")
+                    postings = BM25Postings.from_doc_terms(doc_terms, doc_tfs, doc_len, len(vocab))
+                    postings.save(self.postings_path)
+            os.replace(tmp_meta, self.meta_path)
+            save_locations(self.meta_path, locations)
+        finally:
+            if os.path.exists(tmp_meta):
+                os.remove(tmp_meta)
+
+        self.bm25 = None
+        self.meta = []
+        self.vocab = Vocabulary()
+        if load:
+            self._try_load()
+        else:
+            self.sources = SourceTable([])
+
+    def query_terms(self, query: str) -> List[int]:
+        ids = (self.vocab.get(t) for t in self.analyzer(query))
+        return [t for t in ids if t is not None]
+
+    def search(self, query: str, k: int = 5, filters: Optional[MetadataFilter] = None) -> List[DocChunk]:
         if self.bm25 is None or not self.meta:
             raise RuntimeError("BM25 index not built. Click Build/Refresh Index first.")
 
-        q_tokens = _tokenize(query)
-        scores = self.bm25.get_scores(q_tokens)  # array floats
-        # get top-k indices
-        top_idxs = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:k]
+        with span("bm25_score"):
+            scores = self.bm25.scores(self.query_terms(query))
+            allowed = self.sources.allowed_ids(filters)
+            if allowed is not None:
+                # only rows of matching sources are ranked
+                mask = np.zeros(len(scores), dtype=bool)
+                mask[allowed] = True
+                scores = np.where(mask, scores, -np.inf)
+
+            # get top-k rows (stable: ties keep index order)
+            top = np.argsort(-scores, kind="stable")[:k]
+            top = [int(i) for i in top if np.isfinite(scores[i])]
 
         results: List[DocChunk] = []
-        for ix in top_idxs:
+        for ix in top:
             m = self.meta[ix]
             results.append(
                 DocChunk(
@@ -118,6 +281,8 @@ class BM25Store:
                     text=m["text"],
                     score=float(scores[ix]),
                     method="bm25",
+                    locations=m.get("locations", []),
+                    parent_id=m.get("parent_id", ""),
                 )
             )
         return results
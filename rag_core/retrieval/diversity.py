@@ -0,0 +1,49 @@
+# rag_core/retrieval/diversity.py
+from __future__ import annotations
+
+import re
+from typing import List, Set
+
+from rag_core.schemas import DocChunk
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def _terms(text: str) -> Set[str]:
+    return set(_WORD_RE.findall((text or "").lower()))
+
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def mmr_select(docs: List[DocChunk], top_k: int = 5, lambda_: float = 0.7) -> List[DocChunk]:
+    """
+    Maximal Marginal Relevance over already-scored docs:
+    pick = argmax  lambda * rel(d) - (1 - lambda) * max_sim(d, picked)
+    rel is the doc score min-max normalized; sim is term-set Jaccard.
+    """
+    if len(docs) <= 1 or top_k <= 0:
+        return docs[:top_k]
+
+    scores = [float(d.score) for d in docs]
+    lo, hi = min(scores), max(scores)
+    span = hi - lo
+    rel = [1.0 if span < 1e-9 else (s - lo) / span for s in scores]
+    terms = [_terms(d.text) for d in docs]
+
+    picked: List[int] = []
+    remaining = list(range(len(docs)))
+    while remaining and len(picked) < top_k:
+        best, best_val = remaining[0], float("-inf")
+        for i in remaining:
+            max_sim = max((_jaccard(terms[i], terms[j]) for j in picked), default=0.0)
+            val = lambda_ * rel[i] - (1.0 - lambda_) * max_sim
+            if val > best_val:
+                best, best_val = i, val
+        picked.append(best)
+        remaining.remove(best)
+
+    return [docs[i] for i in picked]
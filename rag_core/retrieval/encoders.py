@@ -0,0 +1,292 @@
+# rag_core/retrieval/encoders.py
+"""
+Pluggable text encoders for VectorStore.
+
+Backends:
+- sentence-transformers : reference PyTorch model (full precision)
+- onnx                  : ONNX Runtime export of the same model
+- onnx-int8             : ONNX Runtime with int8 dynamic-quantized weights
+- hashing               : dependency-free feature hashing (offline / tests)
+
+All encoders expose encode(texts, batch_size) -> float32 array [n, dim].
+"""
+from __future__ import annotations
+
+import os
+import re
+import threading
+import zlib
+from typing import List, Optional
+
+import numpy as np
+
+BACKENDS = ("sentence-transformers", "onnx", "onnx-int8", "hashing")
+
+
+class SentenceTransformerEncoder:
+    """
+    Reference encoder. Model is loaded on first encode().
+    """
+
+    backend = "sentence-transformers"
+
+    def __init__(self, model_name: str, threads: int = 0):
+        self.model_name = model_name
+        self.threads = int(threads or 0)
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import SentenceTransformer
+
+                if self.threads > 0:
+                    import torch
+
+                    torch.set_num_threads(self.threads)
+                self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        embs = self.model.encode(list(texts), batch_size=batch_size, show_progress_bar=False)
+        return np.asarray(embs, dtype="float32")
+
+
+def export_onnx(model_name: str, out_dir: str, quantize: bool = False) -> str:
+    """
+    Export the transformer behind a SentenceTransformer model to ONNX
+    (and optionally int8 dynamic quantization). Returns the .onnx path.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    fp32_path = os.path.join(out_dir, "model.onnx")
+    int8_path = os.path.join(out_dir, "model.int8.onnx")
+
+    if not os.path.exists(fp32_path):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModel.from_pretrained(model_name).eval()
+        tokenizer.save_pretrained(out_dir)
+
+        sample = tokenizer(["export sample"], return_tensors="pt")
+        names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+        dynamic = {n: {0: "batch", 1: "seq"} for n in names}
+        dynamic["last_hidden_state"] = {0: "batch", 1: "seq"}
+
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                tuple(sample[n] for n in names),
+                fp32_path,
+                input_names=names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic,
+                opset_version=14,
+            )
+
+    if not quantize:
+        return fp32_path
+
+    if not os.path.exists(int8_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    return int8_path
+
+
+class OnnxEncoder:
+    """
+    ONNX Runtime encoder with mean pooling (matches all-MiniLM style models).
+    - exports the model on first use if onnx_dir has no model yet
+    - threads sets intra-op parallelism (0 = runtime default)
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        onnx_dir: str = os.path.join("data", "models", "onnx"),
+        quantize: bool = True,
+        threads: int = 0,
+        max_length: int = 256,
+    ):
+        self.model_name = model_name
+        self.onnx_dir = os.path.join(onnx_dir, model_name.replace("/", "__"))
+        self.quantize = bool(quantize)
+        self.threads = int(threads or 0)
+        self.max_length = int(max_length)
+        self._session = None
+        self._tokenizer = None
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self) -> str:
+        return "onnx-int8" if self.quantize else "onnx"
+
+    def _load(self) -> None:
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        path = export_onnx(self.model_name, self.onnx_dir, quantize=self.quantize)
+
+        opts = ort.SessionOptions()
+        if self.threads > 0:
+            opts.intra_op_num_threads = self.threads
+            opts.inter_op_num_threads = 1
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self._session = ort.InferenceSession(path, sess_options=opts, providers=["CPUExecutionProvider"])
+        self._tokenizer = AutoTokenizer.from_pretrained(self.onnx_dir)
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        with self._lock:
+            if self._session is None:
+                self._load()
+
+        input_names = {i.name for i in self._session.get_inputs()}
+        out: List[np.ndarray] = []
+        texts = list(texts)
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start : start + batch_size]
+            enc = self._tokenizer(
+                batch,
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np",
+            )
+            feeds = {k: v.astype("int64") for k, v in enc.items() if k in input_names}
+            hidden = self._session.run(None, feeds)[0]
+
+            mask = enc["attention_mask"][..., None].astype("float32")
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            out.append(pooled.astype("float32"))
+
+        if not out:
+            return np.zeros((0, 0), dtype="float32")
+        return np.vstack(out)
+
+
+class HashingEncoder:
+    """
+    Feature-hashing bag of words + bigrams. No model download, deterministic.
+    Not semantic; meant for offline runs, load tests and unit tests.
+    """
+
+    _WORD_RE = re.compile(r"\w+")
+    backend = "hashing"
+
+    def __init__(self, dim: int = 384):
+        self.dim = int(dim)
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        embs = np.zeros((len(texts), self.dim), dtype="float32")
+        for row, text in enumerate(texts):
+            words = self._WORD_RE.findall((text or "").lower())
+            feats = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+            for f in feats:
+                h = zlib.crc32(f.encode("utf-8"))
+                embs[row, h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+        return embs
+
+
+def build_encoder(
+    backend: str = "sentence-transformers",
+    model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+    threads: int = 0,
+    onnx_dir: Optional[str] = None,
+):
+    backend = (backend or "sentence-transformers").strip().lower()
+    if backend == "sentence-transformers":
+        return SentenceTransformerEncoder(model_name, threads=threads)
+    if backend in ("onnx", "onnx-int8"):
+        kwargs = {"onnx_dir": onnx_dir} if onnx_dir else {}
+        return OnnxEncoder(model_name, quantize=(backend == "onnx-int8"), threads=threads, **kwargs)
+    if backend == "hashing":
+        return HashingEncoder()
+    raise ValueError(f"Unknown embedding backend: {backend!r} (expected one of {BACKENDS})")
+
+
+def encoder_info(encoder) -> dict:
+    """
+    Identity stored next to a vector index: {backend, model, dim}.
+    dim is None for encoders that only know it after loading their model.
+    """
+    dim = getattr(encoder, "dim", None)
+    return {
+        "backend": getattr(encoder, "backend", type(encoder).__name__),
+        "model": getattr(encoder, "model_name", ""),
+        "dim": int(dim) if dim is not None else None,
+    }
+
+
+def default_encoder(model_name: str = "sentence-transformers/all-MiniLM-L6-v2", backend: Optional[str] = None):
+    """
+    Encoder configured from settings (EMBED_BACKEND / EMBED_THREADS / EMBED_ONNX_DIR).
+    """
+    from rag_core.config import settings
+
+    return build_encoder(
+        backend or getattr(settings, "EMBED_BACKEND", "sentence-transformers"),
+        model_name,
+        threads=getattr(settings, "EMBED_THREADS", 0),
+        onnx_dir=getattr(settings, "EMBED_ONNX_DIR", None),
+    )
+
+
+def encoder_parity(reference, candidate, texts: List[str], batch_size: int = 32) -> dict:
+    """
+    Cosine drift of candidate embeddings vs reference embeddings on the same texts.
+    """
+    a = np.asarray(reference.encode(texts, batch_size=batch_size), dtype="float32")
+    b = np.asarray(candidate.encode(texts, batch_size=batch_size), dtype="float32")
+    if a.shape != b.shape:
+        raise ValueError(f"Embedding shapes differ: {a.shape} vs {b.shape}")
+
+    a = a / (np.linalg.norm(a, axis=1, keepdims=True) + 1e-12)
+    b = b / (np.linalg.norm(b, axis=1, keepdims=True) + 1e-12)
+    cos = (a * b).sum(axis=1)
+
+    return {
+        "n": int(len(texts)),
+        "mean_cosine": float(cos.mean()) if len(cos) else 1.0,
+        "min_cosine": float(cos.min()) if len(cos) else 1.0,
+        "max_drift": float(1.0 - cos.min()) if len(cos) else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import time
+
+    ap = argparse.ArgumentParser(description="Compare an embedding backend against the reference model.")
+    ap.add_argument("--backend", default="onnx-int8", choices=BACKENDS)
+    ap.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    ap.add_argument("--threads", type=int, default=0)
+    ap.add_argument("--texts", default=os.path.join("data", "eval_questions", "queries_only.txt"))
+    args = ap.parse_args()
+
+    sample: List[str] = []
+    if os.path.exists(args.texts):
+        with open(args.texts, "r", encoding="utf-8") as f:
+            sample = [line.strip() for line in f if line.strip()]
+    if not sample:
+        sample = ["What is the notice period?", "How many days of paid leave do employees get?"]
+
+    ref = build_encoder("sentence-transformers", args.model, threads=args.threads)
+    cand = build_encoder(args.backend, args.model, threads=args.threads)
+
+    timings = {}
+    for name, enc in (("reference", ref), ("candidate", cand)):
+        enc.encode(sample[:1])  # warm-up / lazy load
+        t0 = time.perf_counter()
+        enc.encode(sample)
+        timings[f"{name}_encode_s"] = round(time.perf_counter() - t0, 4)
+
+    report = encoder_parity(ref, cand, sample)
+    report.update(timings)
+    report["backend"] = args.backend
+    print(json.dumps(report, indent=2))
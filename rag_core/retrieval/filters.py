@@ -0,0 +1,119 @@
+# rag_core/retrieval/filters.py
+"""
+Metadata filters applied inside the indexes.
+
+Chunks of one source are contiguous in both stores, so a filter resolves to
+a small set of row ids per source (SourceTable) which the stores then use
+to restrict the search itself (FAISS IDSelector, masked BM25 scoring)
+instead of over-fetching and filtering afterwards.
+"""
+from __future__ import annotations
+
+import hashlib
+from typing import Dict, List, Optional
+
+import numpy as np
+from pydantic import BaseModel
+
+
+class MetadataFilter(BaseModel):
+    sources: Optional[List[str]] = None  # any-of, by file name
+    uploaded_after: Optional[str] = None  # ISO date, inclusive
+    uploaded_before: Optional[str] = None  # ISO date, inclusive
+    tags: Optional[List[str]] = None  # any-of
+
+    def is_empty(self) -> bool:
+        return not (self.sources or self.uploaded_after or self.uploaded_before or self.tags)
+
+    def matches_source(self, source: str, uploaded_at: str = "", tags: Optional[List[str]] = None) -> bool:
+        if self.sources and source not in self.sources:
+            return False
+        day = (uploaded_at or "")[:10]
+        if self.uploaded_after and (not day or day < self.uploaded_after[:10]):
+            return False
+        if self.uploaded_before and (not day or day > self.uploaded_before[:10]):
+            return False
+        if self.tags and not (set(self.tags) & set(tags or [])):
+            return False
+        return True
+
+
+class SourceTable:
+    """
+    Per-source row ids + source-level metadata, derived once from store meta.
+    Deduplicated rows are listed under every source in their "locations".
+    """
+
+    def __init__(self, meta: List[dict]):
+        rows: Dict[str, List[int]] = {}
+        self.attrs: Dict[str, dict] = {}
+
+        for i, m in enumerate(meta):
+            src = m.get("source", "")
+            if src not in self.attrs:
+                self.attrs[src] = {"uploaded_at": m.get("uploaded_at", ""), "tags": m.get("tags", [])}
+
+            srcs = {src}
+            for loc in m.get("locations") or []:
+                s = loc.get("source", "")
+                srcs.add(s)
+                if s not in self.attrs and ("uploaded_at" in loc or "tags" in loc):
+                    # a source may only appear as a location of another file's rows
+                    self.attrs[s] = {"uploaded_at": loc.get("uploaded_at", ""), "tags": loc.get("tags", [])}
+            for s in srcs:
+                rows.setdefault(s, []).append(i)
+
+        self.rows: Dict[str, np.ndarray] = {s: np.array(ids, dtype="int64") for s, ids in rows.items()}
+
+    @property
+    def sources(self) -> List[str]:
+        return sorted(self.rows)
+
+    @property
+    def tags(self) -> List[str]:
+        return sorted({t for a in self.attrs.values() for t in a.get("tags", [])})
+
+    def matching_sources(self, flt: Optional[MetadataFilter]) -> List[str]:
+        if flt is None or flt.is_empty():
+            return self.sources
+        out = []
+        for src in self.sources:
+            a = self.attrs.get(src, {})
+            if flt.matches_source(src, a.get("uploaded_at", ""), a.get("tags", [])):
+                out.append(src)
+        return out
+
+    def version(self, sources: Optional[List[str]] = None) -> str:
+        """
+        Short fingerprint of the given sources' content (upload time + chunk count);
+        changes whenever one of them is re-ingested.
+        """
+        h = hashlib.sha1()
+        for src in sorted(self.rows if sources is None else sources):
+            a = self.attrs.get(src, {})
+            h.update(f"{src}\t{a.get('uploaded_at', '')}\t{len(self.rows.get(src, []))}\n".encode("utf-8"))
+        return h.hexdigest()[:16]
+
+    def allowed_ids(self, flt: Optional[MetadataFilter]) -> Optional[np.ndarray]:
+        """
+        None means "no restriction"; otherwise a sorted, unique int64 id array.
+        """
+        if flt is None or flt.is_empty():
+            return None
+
+        picked = [self.rows[src] for src in self.matching_sources(flt)]
+
+        if not picked:
+            return np.zeros(0, dtype="int64")
+        return np.unique(np.concatenate(picked))
+
+
+def id_selector(ids: np.ndarray):
+    """
+    FAISS selector for a sorted id array (range selector when contiguous).
+    """
+    import faiss
+
+    if len(ids) and int(ids[-1]) - int(ids[0]) + 1 == len(ids):
+        return faiss.IDSelectorRange(int(ids[0]), int(ids[-1]) + 1)
+    return faiss.IDSelectorBatch(np.ascontiguousarray(ids, dtype="int64"))
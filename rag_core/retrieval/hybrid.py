@@ -1,8 +1,11 @@
 # rag_core/retrieval/hybrid.py
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import numpy as np
 
 from rag_core.schemas import DocChunk
+from rag_core.retrieval.diversity import mmr_select
+from rag_core.retrieval.filters import MetadataFilter
+from rag_core.tracing import span
 
 
 def _minmax_norm(vals: List[float]) -> List[float]:
@@ -15,15 +18,106 @@ def _minmax_norm(vals: List[float]) -> List[float]:
 
 
 class HybridRetriever:
-    def __init__(self, vector_store, bm25_store, alpha: float = 0.55):
+    """
+    Vector + BM25 legs fused by a min-max normalized weighted sum.
+    With a router (retrieval/router.py) the BM25 leg runs first and the vector
+    leg is shrunk or skipped per query; the decision is kept on last_route.
+    """
+
+    def __init__(self, vector_store, bm25_store, alpha: float = 0.55, mmr_lambda: Optional[float] = None, router=None):
         self.vector_store = vector_store
         self.bm25_store = bm25_store
         self.alpha = float(alpha)
+        self.mmr_lambda = mmr_lambda  # None = no diversity filter
+        self.router = router  # optional QueryRouter
+        self.last_route: Optional[dict] = None
+        self.last_routes: List[Optional[dict]] = []  # per query of the last retrieve_batch()
+
+    def retrieve(
+        self,
+        query: str,
+        top_k: int = 5,
+        pool_mult: int = 4,
+        filters: Optional[MetadataFilter] = None,
+    ) -> List[DocChunk]:
+        fused, _, _ = self.retrieve_legs(query, top_k=top_k, pool_mult=pool_mult, filters=filters)
+        return fused
+
+    def retrieve_legs(
+        self,
+        query: str,
+        top_k: int = 5,
+        pool_mult: int = 4,
+        filters: Optional[MetadataFilter] = None,
+    ) -> Tuple[List[DocChunk], List[DocChunk], List[DocChunk]]:
+        """
+        Returns (fused, vector_leg, bm25_leg) so callers can judge leg agreement.
+        """
+        # filters are pushed into each index (only passed when set)
+        extra = {"filters": filters} if filters is not None and not filters.is_empty() else {}
+        if self.router is None:
+            v_docs = self.vector_store.search(query, k=top_k * pool_mult, **extra)
+            b_docs = self.bm25_store.search(query, k=top_k * pool_mult, **extra)
+            alpha = None
+        else:
+            b_docs = self.bm25_store.search(query, k=top_k * pool_mult, **extra)
+            route = self.last_route = self.router.route(query, b_docs, top_k, pool_mult)
+            v_docs = self.vector_store.search(query, k=route["vector_k"], **extra) if route["vector_k"] else []
+            alpha = route["alpha"]
+
+        with span("fusion"):
+            fused = self.fuse(v_docs, b_docs, top_k=top_k, pool_mult=pool_mult, alpha=alpha)
+        return fused, v_docs, b_docs
+
+    def retrieve_batch(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        pool_mult: int = 4,
+        filters: Optional[MetadataFilter] = None,
+    ) -> List[List[DocChunk]]:
+        """
+        Fused results for many queries; stores with search_batch() get one call per leg.
+        """
+        extra = {"filters": filters} if filters is not None and not filters.is_empty() else {}
+        k = top_k * pool_mult
+        queries = list(queries)
+
+        def _search(store, qs: List[str], k: int) -> List[List[DocChunk]]:
+            if not qs:
+                return []
+            if hasattr(store, "search_batch"):
+                return store.search_batch(qs, k=k, **extra)
+            return [store.search(q, k=k, **extra) for q in qs]
+
+        b_legs = _search(self.bm25_store, queries, k)
+        if self.router is None:
+            v_legs = _search(self.vector_store, queries, k)
+            alphas: List[Optional[float]] = [None] * len(queries)
+            self.last_routes = [None] * len(queries)
+        else:
+            # one vector batch for the queries that still need it, at the deepest routed depth
+            routes = [self.router.route(q, b, top_k, pool_mult) for q, b in zip(queries, b_legs)]
+            need = [i for i, r in enumerate(routes) if r["vector_k"]]
+            found = _search(self.vector_store, [queries[i] for i in need], max([routes[i]["vector_k"] for i in need] or [0]))
+            v_legs = [[] for _ in queries]
+            for i, docs in zip(need, found):
+                v_legs[i] = docs[: routes[i]["vector_k"]]
+            alphas = [r["alpha"] for r in routes]
+            self.last_routes = routes
 
-    def retrieve(self, query: str, top_k: int = 5, pool_mult: int = 4) -> List[DocChunk]:
-        v_docs = self.vector_store.search(query, k=top_k * pool_mult)
-        b_docs = self.bm25_store.search(query, k=top_k * pool_mult)
+        with span("fusion"):
+            return [self.fuse(v, b, top_k=top_k, pool_mult=pool_mult, alpha=a) for v, b, a in zip(v_legs, b_legs, alphas)]
 
+    def fuse(
+        self,
+        v_docs: List[DocChunk],
+        b_docs: List[DocChunk],
+        top_k: int = 5,
+        pool_mult: int = 4,
+        alpha: Optional[float] = None,
+    ) -> List[DocChunk]:
+        alpha = self.alpha if alpha is None else float(alpha)
         # normalize scores so they combine meaningfully
         v_scores = _minmax_norm([d.score for d in v_docs])
         b_scores = _minmax_norm([d.score for d in b_docs])
@@ -39,17 +133,18 @@ class HybridRetriever:
 
         scored = []
         for item in merged.values():
-            score = self.alpha * item["v"] + (1.0 - self.alpha) * item["b"]
+            score = alpha * item["v"] + (1.0 - alpha) * item["b"]
             dd = item["doc"].model_copy()
             dd.score = float(score)
             dd.method = "hybrid"
             scored.append(dd)
 
         scored.sort(key=lambda x: x.score, reverse=True)
+        if self.mmr_lambda is not None:
+            return mmr_select(scored[: top_k * pool_mult], top_k=top_k, lambda_=float(self.mmr_lambda))
         return scored[:top_k]
 
 
-# ✅ REQUIRED BY pipeline.py
 def hybrid_retrieve(
     query: str,
     vector_store,
@@ -57,10 +152,16 @@ def hybrid_retrieve(
     top_k: int = 5,
     alpha: float = 0.55,
     pool_mult: int = 4,
+    mmr_lambda: Optional[float] = None,
+    filters: Optional[MetadataFilter] = None,
 ) -> List[DocChunk]:
     """
-    Thin wrapper so pipeline can import:
-    from rag_core.retrieval.hybrid import hybrid_retrieve
+    Thin functional wrapper around HybridRetriever.
     """
-    retriever = HybridRetriever(vector_store=vector_store, bm25_store=bm25_store, alpha=alpha)
-    return retriever.retrieve(query=query, top_k=top_k, pool_mult=pool_mult)
+    retriever = HybridRetriever(
+        vector_store=vector_store,
+        bm25_store=bm25_store,
+        alpha=alpha,
+        mmr_lambda=mmr_lambda,
+    )
+    return retriever.retrieve(query=query, top_k=top_k, pool_mult=pool_mult, filters=filters)
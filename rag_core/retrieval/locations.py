@@ -0,0 +1,40 @@
+# rag_core/retrieval/locations.py
+"""
+Locations sidecar (<meta>.locations.json) written by deduplicated builds.
+
+Lives on the retrieval side so loading an index never imports ingestion code.
+"""
+from __future__ import annotations
+
+import json
+import os
+from typing import Dict, List
+
+
+def locations_path(meta_path: str) -> str:
+    return os.path.splitext(meta_path)[0] + ".locations.json"
+
+
+def save_locations(meta_path: str, locations: Dict[str, List[dict]]) -> None:
+    path = locations_path(meta_path)
+    if not locations:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(locations, f, ensure_ascii=False)
+
+
+def apply_locations(meta: List[dict], meta_path: str) -> List[dict]:
+    """
+    Merge a locations sidecar (if any) into loaded meta rows, in place.
+    """
+    path = locations_path(meta_path)
+    if not os.path.exists(path):
+        return meta
+    with open(path, "r", encoding="utf-8") as f:
+        locations = json.load(f)
+    for m in meta:
+        if m["id"] in locations:
+            m["locations"] = locations[m["id"]]
+    return meta
@@ -0,0 +1,185 @@
+# rag_core/retrieval/parents.py
+"""
+Parent spans for small-to-big retrieval.
+
+With parent-child chunking (settings.ENABLE_PARENT_CHILD) the indexes hold
+small child chunks; each child names its parent span (a window of pages).
+Parent texts are stored once per index dir:
+
+  parents.txt   : parent texts back to back (utf-8)
+  parents.json  : {parent_id: [byte offset, byte length, source, ordinal, page_start, page_end]}
+
+Nothing is read at index load; the offsets table is loaded on the first
+lookup (again after a rebuild) and parent texts are read by offset only for
+the final top-k (expand_parents, called right before the answer context is
+built). parent_stores() hands out one ParentStore per index dir, so the table
+is shared by every Pipeline of the process.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from rag_core.config import settings
+from rag_core.schemas import DocChunk
+
+PARENTS_TEXT = "parents.txt"
+PARENTS_INDEX = "parents.json"
+
+
+def is_parent(record: dict) -> bool:
+    return record.get("kind") == "parent"
+
+
+def default_parent_size() -> int:
+    """
+    settings.PARENT_CHUNK_SIZE with ENABLE_PARENT_CHILD on, else 0 (plain chunks).
+    """
+    if not getattr(settings, "ENABLE_PARENT_CHILD", False):
+        return 0
+    return int(getattr(settings, "PARENT_CHUNK_SIZE", 2400))
+
+
+class ParentStore:
+    """
+    Offset-addressed parent texts of one index dir.
+    - build_from_records(records) writes the parent records of a stream (others are ignored)
+    - get_many(ids) -> {id: {text, source, ordinal, page_start, page_end}}
+    """
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        self.text_path = os.path.join(index_dir, PARENTS_TEXT)
+        self.index_path = os.path.join(index_dir, PARENTS_INDEX)
+        self._offsets: Optional[Dict[str, list]] = None
+        self._mtime = 0
+        self._lock = threading.Lock()
+
+    def exists(self) -> bool:
+        return os.path.exists(self.index_path) and os.path.exists(self.text_path)
+
+    def build_from_records(self, records: Iterable[dict]) -> int:
+        """
+        Returns the number of parents written; without any, stale files are removed.
+        """
+        self.close()
+        offsets: Dict[str, list] = {}
+        pos = 0
+        with open(self.text_path + ".part", "wb") as f:
+            for r in records:
+                if not is_parent(r) or r["id"] in offsets:
+                    continue
+                data = r["text"].encode("utf-8")
+                f.write(data)
+                offsets[r["id"]] = [pos, len(data), r["source"], int(r.get("chunk_index", 0)),
+                                    int(r.get("page_start", 0)), int(r.get("page_end", 0))]
+                pos += len(data)
+
+        if not offsets:
+            os.remove(self.text_path + ".part")
+            for path in (self.text_path, self.index_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            return 0
+
+        with open(self.index_path + ".part", "w", encoding="utf-8") as f:
+            json.dump(offsets, f, ensure_ascii=False)
+        os.replace(self.text_path + ".part", self.text_path)
+        os.replace(self.index_path + ".part", self.index_path)
+        return len(offsets)
+
+    def _load(self) -> Dict[str, list]:
+        if not self.exists():
+            self._offsets, self._mtime = {}, 0
+        else:
+            mtime = os.stat(self.index_path).st_mtime_ns
+            if self._offsets is None or mtime != self._mtime:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    self._offsets, self._mtime = json.load(f), mtime
+        return self._offsets
+
+    def get_many(self, ids: List[str]) -> Dict[str, dict]:
+        out: Dict[str, dict] = {}
+        with self._lock:
+            offsets = self._load()
+            rows = [(pid, offsets[pid]) for pid in dict.fromkeys(ids) if pid in offsets]
+        if not rows:
+            return out
+        with open(self.text_path, "rb") as f:
+            for pid, (offset, length, source, ordinal, page_start, page_end) in rows:
+                f.seek(offset)
+                out[pid] = {
+                    "text": f.read(length).decode("utf-8"),
+                    "source": source,
+                    "ordinal": ordinal,
+                    "page_start": page_start,
+                    "page_end": page_end,
+                }
+        return out
+
+    def close(self) -> None:
+        """
+        Forget the offsets table (reloaded on the next lookup).
+        """
+        with self._lock:
+            self._offsets = None
+
+
+_stores: Dict[str, ParentStore] = {}
+_stores_lock = threading.Lock()
+
+
+def parent_stores(store) -> List[ParentStore]:
+    """
+    Parent stores next to a (possibly sharded) index, one shared instance per dir.
+    """
+    shards = getattr(store, "shards", None)
+    dirs = [s.index_dir for s in shards] if shards is not None else [getattr(store, "index_dir", None)]
+    out = []
+    with _stores_lock:
+        for d in dirs:
+            if d:
+                key = os.path.abspath(d)
+                if key not in _stores:
+                    _stores[key] = ParentStore(d)
+                out.append(_stores[key])
+    return out
+
+
+def expand_parents(docs: List[DocChunk], stores: List[ParentStore]) -> List[DocChunk]:
+    """
+    Swap child chunks for their parent spans (first-seen order, one copy per
+    parent, score = best child). Children without a known parent pass through.
+    """
+    wanted = list(dict.fromkeys(d.parent_id for d in docs if d.parent_id))
+    found: Dict[str, dict] = {}
+    for store in stores:
+        todo = [p for p in wanted if p not in found]
+        if not todo:
+            break
+        found.update(store.get_many(todo))
+
+    out: List[DocChunk] = []
+    slot: Dict[str, DocChunk] = {}
+    for d in docs:
+        parent = found.get(d.parent_id) if d.parent_id else None
+        if parent is None:
+            out.append(d)
+            continue
+        if d.parent_id in slot:
+            slot[d.parent_id].score = max(slot[d.parent_id].score, float(d.score))
+            continue
+        p = DocChunk(
+            id=d.parent_id,
+            text=parent["text"],
+            source=parent["source"],
+            chunk_index=int(parent["ordinal"]),
+            score=float(d.score),
+            method="parent",
+            locations=d.locations,
+        )
+        slot[d.parent_id] = p
+        out.append(p)
+    return out
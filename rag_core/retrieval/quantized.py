@@ -0,0 +1,182 @@
+# rag_core/retrieval/quantized.py
+"""
+Compressed vector index with exact float re-scoring.
+
+First pass scans compact codes held in RAM:
+- int8   : faiss scalar quantizer, 1 byte / dim   (4x smaller than float32)
+- binary : 1 sign bit / dim, Hamming distance     (32x smaller)
+
+The shortlist (k * rescore_mult) is then re-scored exactly against float32
+vectors kept on disk and memory-mapped, so only shortlisted rows are paged in.
+"""
+from __future__ import annotations
+
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+
+MODES = ("int8", "binary")
+
+
+def _binary_codes(embs: np.ndarray, nbits: int) -> np.ndarray:
+    bits = (embs > 0).astype("uint8")
+    if bits.shape[1] < nbits:
+        bits = np.pad(bits, ((0, 0), (0, nbits - bits.shape[1])))
+    return np.packbits(bits, axis=1)
+
+
+class QuantizedIndex:
+    """
+    Drop-in for the faiss index used by VectorStore:
+    - build(embs) / load() / search(q_embs, k) -> (scores, idxs) / ntotal
+    - begin(dim) / add(batch) / finish() streams a build; float vectors go
+      straight to disk, only the codes are held in RAM
+    - scores are exact inner products from the float re-scoring pass
+    """
+
+    def __init__(self, index_dir: str, mode: str = "int8", rescore_mult: int = 4, name: str = "vector"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown quantization mode: {mode!r} (expected one of {MODES})")
+
+        self.mode = mode
+        self.rescore_mult = max(1, int(rescore_mult))
+        self.codes_path = os.path.join(index_dir, f"{name}.{mode}.faiss")
+        self.vectors_path = os.path.join(index_dir, f"{name}.f32.npy")
+
+        self.codes = None  # faiss.Index | faiss.IndexBinary
+        self.vectors: Optional[np.ndarray] = None  # mmap'd float32 [n, d]
+
+    @property
+    def ntotal(self) -> int:
+        return 0 if self.codes is None else int(self.codes.ntotal)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.codes_path) and os.path.exists(self.vectors_path)
+
+    def build(self, embs: np.ndarray) -> None:
+        embs = np.ascontiguousarray(embs, dtype="float32")
+        self.begin(int(embs.shape[1]))
+        self.add(embs)
+        self.finish()
+
+    # streaming build: begin(dim) -> add(batch)* -> finish()
+    def begin(self, dim: int, train_size: int = 16384) -> None:
+        """
+        int8 needs a training sample; the first train_size rows are buffered for it.
+        """
+        self._dim = int(dim)
+        self._train_size = int(train_size)
+        self._pending: list = []
+        self._n_pending = 0
+        import faiss
+
+        from rag_core.ingestion.streaming import NpyAppender
+
+        self._appender = NpyAppender(self.vectors_path, self._dim)
+
+        if self.mode == "int8":
+            self.codes = faiss.IndexScalarQuantizer(self._dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+        else:
+            self.codes = faiss.IndexBinaryFlat(((self._dim + 7) // 8) * 8)
+
+    def _add_codes(self, embs: np.ndarray) -> None:
+        if self.mode == "int8":
+            self.codes.add(embs)
+        else:
+            self.codes.add(_binary_codes(embs, self.codes.d))
+
+    def _flush_pending(self) -> None:
+        if not self._pending:
+            return
+        sample = np.vstack(self._pending)
+        self._pending, self._n_pending = [], 0
+        self.codes.train(sample)
+        self._add_codes(sample)
+
+    def add(self, embs: np.ndarray) -> None:
+        embs = np.ascontiguousarray(embs, dtype="float32")
+        self._appender.append(embs)
+        if self.mode == "int8" and not self.codes.is_trained:
+            self._pending.append(embs)
+            self._n_pending += len(embs)
+            if self._n_pending >= self._train_size:
+                self._flush_pending()
+            return
+        self._add_codes(embs)
+
+    def finish(self) -> None:
+        import faiss
+
+        if self.mode == "int8":
+            self._flush_pending()
+            faiss.write_index(self.codes, self.codes_path)
+        else:
+            faiss.write_index_binary(self.codes, self.codes_path)
+        self._appender.close()
+        self.vectors = np.load(self.vectors_path, mmap_mode="r")
+
+    def abort(self) -> None:
+        """
+        Discard an unfinished streaming build (no-op after finish()).
+        """
+        appender = getattr(self, "_appender", None)
+        if appender is not None:
+            appender.abort()
+
+    def load(self) -> None:
+        import faiss
+
+        if self.mode == "int8":
+            self.codes = faiss.read_index(self.codes_path)
+        else:
+            self.codes = faiss.read_index_binary(self.codes_path)
+        self.vectors = np.load(self.vectors_path, mmap_mode="r")
+
+    def _candidates(self, q_embs: np.ndarray, n: int, ids: Optional[np.ndarray] = None) -> np.ndarray:
+        if ids is not None and (self.mode == "binary" or len(ids) <= n):
+            # small allowed set (or no selector support for binary): re-score it all
+            return np.tile(ids, (len(q_embs), 1))
+
+        if self.mode == "int8":
+            import faiss
+
+            params = None
+            if ids is not None:
+                from rag_core.retrieval.filters import id_selector
+
+                params = faiss.SearchParameters(sel=id_selector(ids))
+            _, idxs = self.codes.search(q_embs, n, params=params)
+        else:
+            _, idxs = self.codes.search(_binary_codes(q_embs, self.codes.d), n)
+        return idxs
+
+    def search(
+        self,
+        q_embs: np.ndarray,
+        k: int,
+        ids: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        ids: optional sorted row ids the search is restricted to.
+        """
+        if self.codes is None or self.vectors is None:
+            raise RuntimeError("Quantized index not loaded.")
+
+        q_embs = np.ascontiguousarray(q_embs, dtype="float32")
+        n_cand = min(self.ntotal, max(k, k * self.rescore_mult))
+        cand = self._candidates(q_embs, n_cand, ids=ids)
+
+        out_scores = np.full((len(q_embs), k), -np.inf, dtype="float32")
+        out_idxs = np.full((len(q_embs), k), -1, dtype="int64")
+        for row, row_ids in enumerate(cand):
+            row_ids = row_ids[row_ids >= 0]
+            if not len(row_ids):
+                continue
+            order = np.sort(row_ids)  # sorted reads are friendlier to the mmap
+            exact = np.asarray(self.vectors[order]) @ q_embs[row]
+            top = np.argsort(-exact)[:k]
+            out_scores[row, : len(top)] = exact[top]
+            out_idxs[row, : len(top)] = order[top]
+
+        return out_scores, out_idxs
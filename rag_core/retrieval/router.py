@@ -0,0 +1,127 @@
+# rag_core/retrieval/router.py
+"""
+Cheap query router for hybrid retrieval (no model calls).
+
+classify_query() sorts a query into:
+- identifier : short lookups containing a code-like token ("NG3", "E11.9", "ICD-10 O24")
+- keyword    : short term lists without question syntax ("insulin dose pregnancy")
+- natural    : everything else (questions, sentences)
+
+QueryRouter.route() runs after the BM25 leg (cheap, no encoder) and decides
+how much of the vector leg is needed:
+- identifier / keyword with a decisive BM25 winner (top score >= exit_ratio x
+  runner-up; for identifiers the winner must contain the code) -> early exit,
+  the vector leg (query embedding + FAISS) is skipped
+- identifier / keyword otherwise -> vector leg at half depth, fusion leans on BM25
+- natural -> both legs at full depth with the configured alpha
+
+Every decision is counted (route_<kind>, route_early_exit) and, when
+settings.ROUTER_LOG is set, appended to that JSONL file for offline analysis.
+"""
+from __future__ import annotations
+
+import json
+import re
+import threading
+import time
+from typing import List, Optional
+
+from rag_core.config import settings
+from rag_core.logger import get_logger
+from rag_core.retrieval.analyzers import STOPWORDS
+from rag_core.schemas import DocChunk
+from rag_core.tracing import incr
+
+log = get_logger("rag.router")
+
+KINDS = ("identifier", "keyword", "natural")
+
+_TOKEN_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9._/-]*[A-Za-z0-9]|[A-Za-z0-9]")
+_CODE_RE = re.compile(r"^(?=.*\d)(?=.*[A-Za-z.\-/_])[A-Za-z0-9._/-]{2,}$")
+_QUESTION_WORDS = {"what", "how", "why", "when", "which", "who", "where", "should", "can", "does", "is", "are", "do"}
+
+# fusion weight of the vector leg per kind (natural uses the retriever's alpha)
+ALPHA_BY_KIND = {"identifier": 0.2, "keyword": 0.4}
+
+_log_lock = threading.Lock()
+
+
+def code_tokens(query: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(query or "") if _CODE_RE.match(t)]
+
+
+def classify_query(query: str) -> str:
+    tokens = [t.lower() for t in _TOKEN_RE.findall(query or "")]
+    if not tokens:
+        return "natural"
+    content = [t for t in tokens if t not in STOPWORDS]
+    if code_tokens(query) and len(content) <= 4:
+        return "identifier"
+    questionish = "?" in query or tokens[0] in _QUESTION_WORDS
+    if not questionish and len(tokens) <= 6 and len(content) >= 0.7 * len(tokens):
+        return "keyword"
+    return "natural"
+
+
+def _bm25_margin(b_docs: List[DocChunk]) -> float:
+    """
+    Top BM25 score over the runner-up (inf when only one doc matched).
+    """
+    if not b_docs or b_docs[0].score <= 0:
+        return 0.0
+    if len(b_docs) < 2 or b_docs[1].score <= 0:
+        return float("inf")
+    return float(b_docs[0].score) / float(b_docs[1].score)
+
+
+class QueryRouter:
+    """
+    route(query, b_docs, top_k, pool_mult) -> decision dict:
+    {query, kind, early_exit, vector_k, alpha, margin}
+    (alpha None = keep the retriever's own)
+    """
+
+    def __init__(self, exit_ratio: Optional[float] = None, log_path: Optional[str] = None):
+        self.exit_ratio = float(exit_ratio if exit_ratio is not None else getattr(settings, "ROUTER_EXIT_RATIO", 1.5))
+        self.log_path = log_path if log_path is not None else getattr(settings, "ROUTER_LOG", "")
+
+    def route(self, query: str, b_docs: List[DocChunk], top_k: int, pool_mult: int) -> dict:
+        kind = classify_query(query)
+        margin = _bm25_margin(b_docs)
+
+        early_exit = False
+        if kind != "natural" and len(b_docs) and margin >= self.exit_ratio:
+            if kind == "keyword":
+                early_exit = True
+            else:
+                top_text = (b_docs[0].text or "").lower()
+                early_exit = any(c.lower() in top_text for c in code_tokens(query))
+
+        if early_exit:
+            vector_k = 0
+        elif kind == "natural" or not b_docs:
+            vector_k = top_k * pool_mult
+        else:
+            vector_k = top_k * max(1, pool_mult // 2)
+
+        decision = {
+            "query": query[:200],
+            "kind": kind,
+            "early_exit": early_exit,
+            "vector_k": vector_k,
+            "alpha": 0.0 if early_exit else ALPHA_BY_KIND.get(kind),
+            "margin": round(margin, 3) if margin != float("inf") else None,
+        }
+        self.record(decision)
+        return decision
+
+    def record(self, decision: dict) -> None:
+        incr(f"route_{decision['kind']}")
+        if decision["early_exit"]:
+            incr("route_early_exit")
+        log.debug("route %s", decision)
+        if self.log_path:
+            row = {"ts": time.time(), **decision}
+            with _log_lock:
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
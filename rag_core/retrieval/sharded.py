@@ -0,0 +1,138 @@
+# rag_core/retrieval/sharded.py
+"""
+Sharded indexes with scatter-gather search.
+
+Chunks are partitioned by source (crc32(file name) % n_shards), so every
+PDF lives in exactly one shard and rebuilding one shard only re-reads its
+own PDFs. Shards are built and searched concurrently on a thread pool
+(FAISS, numpy and the encoders release the GIL) and per-shard top-k lists
+are merged with a heap.
+
+Notes:
+- vector scores are cosine similarities, so they merge exactly; BM25 IDF is
+  per shard, which makes cross-shard BM25 merging approximate
+- near-duplicate collapsing runs per shard
+"""
+from __future__ import annotations
+
+import heapq
+import itertools
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Union
+
+from rag_core.config import settings
+from rag_core.retrieval.filters import MetadataFilter, SourceTable
+from rag_core.schemas import DocChunk
+from rag_core.tracing import bind
+
+
+def shard_of(source: str, n_shards: int) -> int:
+    return zlib.crc32(os.path.basename(source).encode("utf-8")) % max(1, int(n_shards))
+
+
+def shard_dir(index_dir: str, shard: int) -> str:
+    return os.path.join(index_dir, f"shard_{shard:02d}")
+
+
+class ShardedStore:
+    """
+    N stores behind the usual store interface.
+    - build(pdf_dir OR pdf_paths) partitions PDFs by source and builds shards in parallel;
+      shards left without any PDF are cleared (no stale chunks of deleted files)
+    - rebuild_shard(i, pdf_paths) rebuilds a single shard
+    - search(query, k, filters) fans out to all shards and heap-merges top-k
+    - no close(): the store may be shared by several sessions; idle shard
+      threads exit when the store is garbage collected
+    """
+
+    def __init__(self, shards: List, max_workers: Optional[int] = None):
+        if not shards:
+            raise ValueError("ShardedStore needs at least one shard")
+        self.shards = list(shards)
+        self.max_workers = max_workers or len(self.shards)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="shard")
+        self._sources: Optional[SourceTable] = None
+
+    @property
+    def n_shards(self) -> int:
+        return len(self.shards)
+
+    @property
+    def meta(self) -> List[dict]:
+        return list(itertools.chain.from_iterable(s.meta for s in self.shards))
+
+    @property
+    def sources(self) -> SourceTable:
+        if self._sources is None:
+            self._sources = SourceTable(self.meta)
+        return self._sources
+
+    def _live(self) -> List:
+        return [s for s in self.shards if s.meta]
+
+    def partition(self, pdf_paths: List[str]) -> Dict[int, List[str]]:
+        parts: Dict[int, List[str]] = {i: [] for i in range(self.n_shards)}
+        for p in pdf_paths:
+            parts[shard_of(p, self.n_shards)].append(p)
+        return parts
+
+    def build(
+        self,
+        pdf_dir_or_paths: Union[str, List[str]],
+        chunk_size: int = 800,
+        overlap: int = 200,
+        **kwargs,
+    ) -> None:
+        from rag_core.ingestion.corpus import resolve_pdf_paths
+
+        parts = self.partition(resolve_pdf_paths(pdf_dir_or_paths))
+        futures = [
+            self._pool.submit(self.shards[i].build, paths, chunk_size=chunk_size, overlap=overlap, **kwargs)
+            for i, paths in parts.items()
+            if paths
+        ]
+        for i, paths in parts.items():
+            if not paths:
+                self.shards[i].clear()
+        for f in futures:
+            f.result()
+        self._sources = None
+
+    def rebuild_shard(self, shard: int, pdf_paths: List[str], **kwargs) -> None:
+        if pdf_paths:
+            self.shards[shard].build(pdf_paths, **kwargs)
+        else:
+            self.shards[shard].clear()
+        self._sources = None
+
+    def search(self, query: str, k: int = 5, filters: Optional[MetadataFilter] = None) -> List[DocChunk]:
+        live = self._live()
+        if not live:
+            raise RuntimeError("Index not built. Click Build/Refresh Index first.")
+
+        extra = {"filters": filters} if filters is not None and not filters.is_empty() else {}
+
+        # vector shards share one encoder: encode once, search every shard with the vector
+        if all(hasattr(s, "search_by_vector") and s.encoder is live[0].encoder for s in live):
+            q_emb = live[0].encode_query(query)
+            futures = [self._pool.submit(bind(s.search_by_vector), q_emb, k, **extra) for s in live]
+        else:
+            futures = [self._pool.submit(bind(s.search), query, k, **extra) for s in live]
+
+        per_shard = [f.result() for f in futures]
+        return heapq.nlargest(k, itertools.chain.from_iterable(per_shard), key=lambda d: d.score)
+
+
+def open_sharded(
+    factory: Callable[[str], object],
+    index_dir: str,
+    n_shards: int,
+    max_workers: Optional[int] = None,
+) -> ShardedStore:
+    """
+    factory(shard_index_dir) -> store; e.g. lambda d: BM25Store(index_dir=d)
+    """
+    shards = [factory(shard_dir(index_dir, i)) for i in range(int(n_shards))]
+    return ShardedStore(shards, max_workers=max_workers or getattr(settings, "SHARD_WORKERS", 0) or None)
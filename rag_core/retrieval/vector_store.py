@@ -2,17 +2,23 @@
 from __future__ import annotations
 
 import os
-import glob
 import json
-from typing import List, Optional, Union
+from typing import Iterable, List, Optional, Union
 
 import numpy as np
-import faiss
-from sentence_transformers import SentenceTransformer
 
-from rag_core.ingestion.pdf_loader import load_pdfs
-from rag_core.ingestion.chunkers import chunk_text
+from rag_core.config import settings
+from rag_core.logger import get_logger
+from rag_core.profiling import profile_stage
+from rag_core.retrieval.encoders import default_encoder, encoder_info
+from rag_core.retrieval.filters import MetadataFilter, SourceTable, id_selector
+from rag_core.retrieval.locations import apply_locations, locations_path, save_locations
+from rag_core.retrieval.parents import default_parent_size, is_parent
+from rag_core.retrieval.quantized import QuantizedIndex
 from rag_core.schemas import DocChunk
+from rag_core.tracing import span
+
+log = get_logger("rag.vector")
 
 
 def _norm(v: np.ndarray) -> np.ndarray:
@@ -27,6 +33,12 @@ class VectorStore:
     FAISS cosine similarity store (SentenceTransformer embeddings).
     - build(pdf_dir OR pdf_paths) indexes PDFs
     - search(query, k) returns DocChunk list
+    - encoder backend is pluggable (see retrieval/encoders.py)
+    - search(..., filters=MetadataFilter) restricts the scan via FAISS IDSelector
+    - quantization="int8"|"binary" keeps compressed codes in RAM and
+      re-scores the shortlist against mmap'd float vectors (see retrieval/quantized.py)
+    - the encoder identity {backend, model, dim} is saved next to the index;
+      an index built by another model or dimension is not loaded
     """
 
     def __init__(
@@ -35,118 +47,299 @@ class VectorStore:
         index_dir: str = os.path.join("data", "indexes"),
         index_name: str = "vector.faiss",
         meta_name: str = "vector_meta.json",
+        info_name: str = "vector_info.json",
+        encoder=None,
+        backend: Optional[str] = None,
+        quantization: Optional[str] = None,
     ):
         self.model_name = model_name
-        self.model = SentenceTransformer(model_name)
+        self.encoder = encoder or default_encoder(model_name, backend=backend)
 
         self.index_dir = index_dir
         os.makedirs(self.index_dir, exist_ok=True)
 
         self.index_path = os.path.join(self.index_dir, index_name)
         self.meta_path = os.path.join(self.index_dir, meta_name)
+        self.info_path = os.path.join(self.index_dir, info_name)
+
+        if quantization is None:
+            quantization = getattr(settings, "VECTOR_QUANTIZATION", "none")
+        self.quantization = (quantization or "none").strip().lower()
 
-        self.index: Optional[faiss.Index] = None
+        self.index = None  # faiss.Index | QuantizedIndex
         self.meta: List[dict] = []  # parallel to vectors
+        self.sources = SourceTable([])  # per-source row ids for filtering
 
         self._try_load()
 
+    def _quantized(self) -> QuantizedIndex:
+        return QuantizedIndex(
+            self.index_dir,
+            mode=self.quantization,
+            rescore_mult=getattr(settings, "VECTOR_RESCORE_MULT", 4),
+        )
+
     def _try_load(self) -> None:
-        if os.path.exists(self.index_path) and os.path.exists(self.meta_path):
+        qindex = self._quantized() if self.quantization != "none" else None
+        index_exists = qindex.exists() if qindex is not None else os.path.exists(self.index_path)
+
+        if index_exists and os.path.exists(self.meta_path) and self._encoder_matches():
             try:
-                self.index = faiss.read_index(self.index_path)
+                if qindex is not None:
+                    qindex.load()
+                    self.index = qindex
+                else:
+                    import faiss
+
+                    self.index = faiss.read_index(self.index_path)
                 with open(self.meta_path, "r", encoding="utf-8") as f:
-                    self.meta = json.load(f)
+                    self.meta = apply_locations(json.load(f), self.meta_path)
             except Exception:
                 self.index = None
                 self.meta = []
+        self.sources = SourceTable(self.meta)
+
+    def _encoder_matches(self) -> bool:
+        """
+        False when the saved index was embedded by a different model or dimension.
+        A different backend of the same model (e.g. onnx-int8) only warns; see encoder_parity.
+        Indexes saved before the info file existed are trusted.
+        """
+        try:
+            with open(self.info_path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return True
+        current = encoder_info(self.encoder)
+        dims = (saved.get("dim"), current["dim"])
+        if saved.get("model", "") != current["model"] or (None not in dims and dims[0] != dims[1]):
+            log.warning(
+                "%s was built with %s; current encoder is %s - not loading it, rebuild the index",
+                self.index_path, saved, current,
+            )
+            return False
+        if saved.get("backend") != current["backend"]:
+            log.warning("%s was built with backend %s, querying with %s", self.index_path, saved.get("backend"), current["backend"])
+        return True
 
     def build(
         self,
         pdf_dir_or_paths: Union[str, List[str]],
         chunk_size: int = 800,
         overlap: int = 200,
+        dedup: Optional[bool] = None,
+        parent_size: Optional[int] = None,
     ) -> None:
-        # ✅ accept folder OR list of pdf paths
-        if isinstance(pdf_dir_or_paths, list):
-            pdf_paths = sorted([p for p in pdf_dir_or_paths if str(p).lower().endswith(".pdf")])
-            if not pdf_paths:
-                raise RuntimeError("No PDF paths provided to VectorStore.build().")
-        else:
-            pdf_dir = str(pdf_dir_or_paths)
-            pdf_paths = sorted(glob.glob(os.path.join(pdf_dir, "*.pdf")))
-            if not pdf_paths:
-                raise RuntimeError(f"No PDFs found in: {pdf_dir}")
-
-        texts: List[str] = []
-        meta: List[dict] = []
-
-        for path in pdf_paths:
-            source = os.path.basename(path)
-
-            full_text = load_pdfs(path)
-
-            # ✅ make sure loader output is string
-            if isinstance(full_text, list):
-                full_text = "\n".join([str(x) for x in full_text])
-            full_text = (full_text or "").strip()
-
-            if not full_text:
-                # keep going; we will error later if nothing extracted overall
-                continue
+        """
+        parent_size=None follows settings.ENABLE_PARENT_CHILD / PARENT_CHUNK_SIZE;
+        with parents, chunk_size/overlap size the children. Parent spans are not
+        written here: jobs.index_pdfs builds both stores + ParentStore in one go.
+        """
+        from rag_core.ingestion.corpus import iter_chunk_records, resolve_pdf_paths
 
-            chunks = chunk_text(full_text, size=chunk_size, overlap=overlap)
-            for i, ch in enumerate(chunks):
-                ch = (ch or "").strip()
-                if not ch:
-                    continue
-                cid = f"{source}::chunk_{i}"
-                texts.append(ch)
-                meta.append({"id": cid, "source": source, "chunk_index": i, "text": ch})
-
-        # ✅ CRITICAL GUARD (your current error)
-        if not texts:
-            raise RuntimeError(
-                "VectorStore.build(): No extractable text chunks were created.\n"
-                "Possible reasons:\n"
-                "1) PDF is scanned image (needs OCR)\n"
-                "2) pdf_loader.load_pdfs() returning empty text\n"
-                "3) chunking settings too strict\n\n"
-                "Quick checks:\n"
-                "- Print first 500 chars of load_pdfs(pdf)\n"
-                "- If scanned PDF, use OCR (pytesseract) or pdfplumber image OCR\n"
-            )
+        with profile_stage("vector_build"):
+            # ✅ accept folder OR list of pdf paths
+            pdf_paths = resolve_pdf_paths(pdf_dir_or_paths)
+            if parent_size is None:
+                parent_size = default_parent_size()
+            records = iter_chunk_records(pdf_paths, chunk_size=chunk_size, overlap=overlap, parent_size=parent_size)
+            self.build_from_records(records, dedup=dedup)
 
-        # ✅ embed (always list -> output will be 2D)
-        embs = self.model.encode(texts, batch_size=32, show_progress_bar=False)
-        embs = np.array(embs, dtype="float32")
-        if embs.ndim == 1:
-            embs = embs.reshape(1, -1)
+    def build_from_records(self, records: Iterable[dict], dedup: Optional[bool] = False, load: bool = True) -> None:
+        """
+        Streaming build: records are encoded in bounded batches (settings.INGEST_*)
+        and appended to the index and to the on-disk meta as they arrive.
+        dedup=None follows settings.ENABLE_DEDUP; locations of collapsed
+        duplicates go to a sidecar next to the meta file.
+        load=False skips re-reading meta afterwards (build-only processes).
+        """
+        import faiss
 
-        embs = _norm(embs)
+        from rag_core.ingestion.dedup import dedup_stream
+        from rag_core.ingestion.streaming import JsonArrayWriter, batched, memory_budget_bytes
 
-        dim = int(embs.shape[1])
-        index = faiss.IndexFlatIP(dim)
-        index.add(embs)
+        records = (r for r in records if not is_parent(r))  # parent spans go to ParentStore
+        if dedup is None:
+            dedup = getattr(settings, "ENABLE_DEDUP", True)
+        locations: dict = {}
+        if dedup:
+            records, locations = dedup_stream(records, threshold=getattr(settings, "DEDUP_THRESHOLD", 0.9))
+
+        index = None
+        warned = False
+        tmp_meta = self.meta_path + ".part"
+        try:
+            with open(tmp_meta, "w", encoding="utf-8") as f, JsonArrayWriter(f) as meta_out:
+                for batch in batched(records):
+                    # ✅ embed (always list -> output will be 2D)
+                    with profile_stage("encode"):
+                        embs = self.encoder.encode([r["text"] for r in batch], batch_size=32)
+                        embs = np.array(embs, dtype="float32")
+                        if embs.ndim == 1:
+                            embs = embs.reshape(1, -1)
+                        embs = _norm(embs)
+
+                    with profile_stage("index_write"):
+                        if index is None:
+                            dim = int(embs.shape[1])
+                            index = self._begin_index(dim)
+                        index.add(embs)
+                        for r in batch:
+                            meta_out.write(r)
+
+                    if not warned and not isinstance(index, QuantizedIndex) and index.ntotal * index.d * 4 > memory_budget_bytes():
+                        log.warning("flat index exceeds INGEST_MEMORY_MB; VECTOR_QUANTIZATION=int8 keeps float vectors on disk")
+                        warned = True
+
+            # ✅ CRITICAL GUARD (your current error)
+            if index is None:
+                raise RuntimeError(
+                    "VectorStore.build(): No extractable text chunks were created.\n"
+                    "Possible reasons:\n"
+                    "1) PDF is scanned image (needs OCR)\n"
+                    "2) pdf_loader.load_pdfs() returning empty text\n"
+                    "3) chunking settings too strict\n\n"
+                    "Quick checks:\n"
+                    "- Print first 500 chars of load_pdfs(pdf)\n"
+                    "- If scanned PDF, use OCR (pytesseract) or pdfplumber image OCR\n"
+                )
+
+            with profile_stage("index_write"):
+                if isinstance(index, QuantizedIndex):
+                    index.finish()
+                else:
+                    faiss.write_index(index, self.index_path)
+                os.replace(tmp_meta, self.meta_path)
+                save_locations(self.meta_path, locations)
+                info = {**encoder_info(self.encoder), "dim": dim}
+                with open(self.info_path + ".part", "w", encoding="utf-8") as f:
+                    json.dump(info, f)
+                os.replace(self.info_path + ".part", self.info_path)
+        finally:
+            # a failed build (encoder error, full disk) leaves no partial files behind
+            if isinstance(index, QuantizedIndex):
+                index.abort()
+            for path in (tmp_meta, self.info_path + ".part"):
+                if os.path.exists(path):
+                    os.remove(path)
 
         self.index = index
-        self.meta = meta
+        self.meta = []
+        self._row_of = None
+        if load:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                self.meta = apply_locations(json.load(f), self.meta_path)
+        self.sources = SourceTable(self.meta)
+
+    def clear(self) -> None:
+        """
+        Remove this store's index files (e.g. a shard whose sources were all deleted).
+        """
+        paths = [self.index_path, self.meta_path, self.info_path, locations_path(self.meta_path)]
+        for mode in ("int8", "binary"):
+            q = QuantizedIndex(self.index_dir, mode=mode)
+            paths += [q.codes_path, q.vectors_path]
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+        self.index = None
+        self.meta = []
+        self._row_of = None
+        self.sources = SourceTable([])
+
+    def _begin_index(self, dim: int):
+        if self.quantization == "none":
+            import faiss
 
-        faiss.write_index(self.index, self.index_path)
-        with open(self.meta_path, "w", encoding="utf-8") as f:
-            json.dump(self.meta, f, ensure_ascii=False, indent=2)
+            return faiss.IndexFlatIP(dim)
+        index = self._quantized()
+        index.begin(dim)
+        return index
 
-    def search(self, query: str, k: int = 5) -> List[DocChunk]:
+    def vectors_for(self, doc_ids: List[str]) -> Optional[np.ndarray]:
+        """
+        Stored (normalized) vectors for chunk ids, or None if any id is unknown.
+        Lets graders score retrieved chunks without re-encoding them.
+        """
+        if self.index is None or not self.meta:
+            return None
+        if getattr(self, "_row_of", None) is None or len(self._row_of) != len(self.meta):
+            self._row_of = {m["id"]: i for i, m in enumerate(self.meta)}
+
+        rows = [self._row_of.get(i) for i in doc_ids]
+        if any(r is None for r in rows):
+            return None
+        if isinstance(self.index, QuantizedIndex):
+            return np.asarray(self.index.vectors[rows], dtype="float32")
+        return np.vstack([self.index.reconstruct(int(r)) for r in rows]).astype("float32")
+
+    def encode_query(self, query: str) -> np.ndarray:
+        return self.encode_queries([query])
+
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        with span("query_encode"):
+            q_emb = self.encoder.encode(list(queries))
+            q_emb = np.array(q_emb, dtype="float32")
+            return _norm(q_emb)
+
+    def search(self, query: str, k: int = 5, filters: Optional[MetadataFilter] = None) -> List[DocChunk]:
         if self.index is None or not self.meta:
             raise RuntimeError("Vector index not built. Click Build/Refresh Index first.")
 
-        q_emb = self.model.encode([query], show_progress_bar=False)
-        q_emb = np.array(q_emb, dtype="float32")
-        q_emb = _norm(q_emb)
+        return self.search_by_vector(self.encode_query(query), k=k, filters=filters)
+
+    def search_batch(
+        self,
+        queries: List[str],
+        k: int = 5,
+        filters: Optional[MetadataFilter] = None,
+    ) -> List[List[DocChunk]]:
+        """
+        One encoder call + one index search for many queries (same filters).
+        """
+        if self.index is None or not self.meta:
+            raise RuntimeError("Vector index not built. Click Build/Refresh Index first.")
+        if not queries:
+            return []
+        return self._search_matrix(self.encode_queries(queries), k=k, filters=filters)
+
+    def search_by_vector(
+        self,
+        q_emb: np.ndarray,
+        k: int = 5,
+        filters: Optional[MetadataFilter] = None,
+    ) -> List[DocChunk]:
+        """
+        Search with an already encoded + normalized query ([1, dim]).
+        """
+        if self.index is None or not self.meta:
+            raise RuntimeError("Vector index not built. Click Build/Refresh Index first.")
+        return self._search_matrix(q_emb, k=k, filters=filters)[0]
+
+    def _search_matrix(
+        self,
+        q_embs: np.ndarray,
+        k: int,
+        filters: Optional[MetadataFilter] = None,
+    ) -> List[List[DocChunk]]:
+        allowed = self.sources.allowed_ids(filters)
+        if allowed is not None and not len(allowed):
+            return [[] for _ in range(len(q_embs))]
+
+        with span("faiss_search"):
+            if allowed is None:
+                scores, idxs = self.index.search(q_embs, k)
+            elif isinstance(self.index, QuantizedIndex):
+                scores, idxs = self.index.search(q_embs, k, ids=allowed)
+            else:
+                import faiss
+
+                params = faiss.SearchParameters(sel=id_selector(allowed))
+                scores, idxs = self.index.search(q_embs, k, params=params)
 
-        scores, idxs = self.index.search(q_emb, k)
-        scores = scores[0].tolist()
-        idxs = idxs[0].tolist()
+        return [self._hits(s.tolist(), ix.tolist()) for s, ix in zip(scores, idxs)]
 
+    def _hits(self, scores: List[float], idxs: List[int]) -> List[DocChunk]:
         results: List[DocChunk] = []
         for score, ix in zip(scores, idxs):
             if ix < 0 or ix >= len(self.meta):
@@ -160,6 +353,8 @@ class VectorStore:
                     text=m["text"],
                     score=float(score),
                     method="vector",
+                    locations=m.get("locations", []),
+                    parent_id=m.get("parent_id", ""),
                 )
             )
         return results
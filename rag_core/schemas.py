@@ -1,6 +1,6 @@
 # rag_core/schemas.py
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Optional, Any
 
 class DocChunk(BaseModel):
     id: str
@@ -8,7 +8,9 @@ class DocChunk(BaseModel):
     source: str
     chunk_index: int = 0
     score: float = 0.0
-    method: str = "vector"  # vector | bm25 | hybrid | fusion | rerank
+    method: str = "vector"  # vector | bm25 | hybrid | fusion | rerank | parent
+    parent_id: str = ""  # small-to-big: parent span of a child chunk (retrieval/parents.py)
+    locations: List[Dict[str, Any]] = Field(default_factory=list)  # near-duplicate sources (dedup)
 
 class RAGResult(BaseModel):
     query: str
@@ -0,0 +1,104 @@
+# rag_core/startup_bench.py
+"""
+Cold-start benchmark: import time, RSS and which heavy libraries got loaded.
+
+Every scenario runs in a fresh interpreter so nothing is already imported.
+    python -m rag_core.startup_bench                 # all scenarios, table
+    python -m rag_core.startup_bench --repeat 5 --out data/startup.jsonl
+
+Scenarios:
+- config / pipeline / bm25_store / vector_store / jobs : plain imports
+- bm25_query : load the prebuilt BM25 index and run one search
+  (the query-only path; must not load ingestion code, faiss or pdfplumber)
+"""
+from __future__ import annotations
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+HEAVY = ("faiss", "torch", "sentence_transformers", "pdfplumber", "tiktoken", "openai")
+
+SCENARIOS: Dict[str, str] = {
+    "config": "import rag_core.config",
+    "pipeline": "import rag_core.pipeline",
+    "bm25_store": "import rag_core.retrieval.bm25_store",
+    "vector_store": "import rag_core.retrieval.vector_store",
+    "jobs": "import rag_core.jobs",
+    "bm25_query": (
+        "from rag_core.retrieval.bm25_store import BM25Store\n"
+        "store = BM25Store(index_dir=INDEX_DIR)\n"
+        "if store.bm25 is not None:\n"
+        "    store.search('gestational diabetes screening', k=5)"
+    ),
+}
+
+_PROBE = """
+import json, resource, sys, time
+INDEX_DIR = {index_dir!r}
+t0 = time.perf_counter()
+{code}
+wall = time.perf_counter() - t0
+heavy = sorted(m for m in {heavy!r} if m in sys.modules)
+print(json.dumps({{
+    "wall_s": round(wall, 4),
+    "rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1),
+    "heavy": heavy,
+    "ingestion": sorted(m for m in sys.modules if m.startswith("rag_core.ingestion")),
+}}))
+"""
+
+
+def probe(code: str, index_dir: str = os.path.join("data", "indexes")) -> dict:
+    """
+    Run one snippet in a fresh interpreter and return its measurements.
+    """
+    src = _PROBE.format(code=code, index_dir=index_dir, heavy=HEAVY)
+    out = subprocess.run([sys.executable, "-c", src], capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1] if out.stderr.strip() else "probe failed")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def run(names: Optional[List[str]] = None, repeat: int = 3, index_dir: str = os.path.join("data", "indexes")) -> List[dict]:
+    rows = []
+    for name in names or list(SCENARIOS):
+        runs = [probe(SCENARIOS[name], index_dir) for _ in range(max(1, repeat))]
+        rows.append(
+            {
+                "scenario": name,
+                "wall_s": round(statistics.median(r["wall_s"] for r in runs), 4),
+                "rss_mb": max(r["rss_mb"] for r in runs),
+                "heavy": runs[-1]["heavy"],
+                "ingestion": runs[-1]["ingestion"],
+                "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            }
+        )
+    return rows
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Measure cold-start import time and memory.")
+    ap.add_argument("scenarios", nargs="*", help=f"any of {', '.join(SCENARIOS)} (default: all)")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--index-dir", default=os.path.join("data", "indexes"))
+    ap.add_argument("--out", default="", help="append results as JSONL")
+    args = ap.parse_args()
+    unknown = [n for n in args.scenarios if n not in SCENARIOS]
+    if unknown:
+        ap.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    results = run(args.scenarios or None, repeat=args.repeat, index_dir=args.index_dir)
+    for r in results:
+        print(f"{r['scenario']:<14} {r['wall_s'] * 1000:8.1f} ms {r['rss_mb']:8.1f} MB  heavy={','.join(r['heavy']) or '-'}")
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "a", encoding="utf-8") as f:
+            for r in results:
+                f.write(json.dumps(r) + "\n")
@@ -0,0 +1,221 @@
+# rag_core/tracing.py
+"""
+Per-stage latency tracing + process-wide metrics.
+
+- span(name)     : times a stage; feeds the current trace and the stage histogram
+- incr(name, n)  : counter (cache hits, token usage, ...)
+- trace(name)    : collects spans/counters for one request (Pipeline.run / answer)
+- REGISTRY       : process-wide histograms/counters, exported as Prometheus text
+                   (serve_prometheus) and per-trace JSON lines (TRACE_JSONL)
+"""
+from __future__ import annotations
+
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional
+
+from rag_core.logger import get_logger
+
+log = get_logger("rag.trace")
+
+# seconds; tuned for stages between ~1ms (BM25) and ~10s (LLM)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Trace:
+    """
+    Spans + counters of one request. Safe to append from worker threads.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.time()
+        self._t0 = time.perf_counter()
+        self.total_ms = 0.0
+        self.spans: List[dict] = []
+        self.counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, name: str, start: float, seconds: float) -> None:
+        with self._lock:
+            self.spans.append(
+                {"name": name, "start_ms": round((start - self._t0) * 1000, 3), "ms": round(seconds * 1000, 3)}
+            )
+
+    def incr(self, name: str, n: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def breakdown(self) -> dict:
+        stages: Dict[str, float] = {}
+        for s in self.spans:
+            stages[s["name"]] = round(stages.get(s["name"], 0.0) + s["ms"], 3)
+        return {
+            "trace": self.name,
+            "total_ms": round(self.total_ms, 3),
+            "stages_ms": stages,
+            "counters": dict(self.counters),
+            "spans": list(self.spans),
+        }
+
+
+class MetricsRegistry:
+    """
+    Process-wide stage histograms and counters.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms: Dict[str, dict] = {}
+        self.counters: Dict[str, float] = {}
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            h = self.histograms.get(stage)
+            if h is None:
+                h = {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0}
+                self.histograms[stage] = h
+            for i, le in enumerate(BUCKETS):
+                if seconds <= le:
+                    h["buckets"][i] += 1
+            h["sum"] += seconds
+            h["count"] += 1
+
+    def incr(self, name: str, n: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def reset(self) -> None:
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def to_prometheus(self) -> str:
+        lines = [
+            "# HELP rag_stage_seconds Pipeline stage latency.",
+            "# TYPE rag_stage_seconds histogram",
+        ]
+        with self._lock:
+            for stage, h in sorted(self.histograms.items()):
+                for le, n in zip(BUCKETS, h["buckets"]):
+                    lines.append(f'rag_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {n}')
+                lines.append(f'rag_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {h["count"]}')
+                lines.append(f'rag_stage_seconds_sum{{stage="{stage}"}} {h["sum"]:.6f}')
+                lines.append(f'rag_stage_seconds_count{{stage="{stage}"}} {h["count"]}')
+            for name, v in sorted(self.counters.items()):
+                lines.append(f"# TYPE rag_{name}_total counter")
+                lines.append(f"rag_{name}_total {v:g}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+_current: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("rag_trace", default=None)
+_jsonl_lock = threading.Lock()
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        REGISTRY.observe(name, seconds)
+        tr = _current.get()
+        if tr is not None:
+            tr.add_span(name, start, seconds)
+
+
+def incr(name: str, n: float = 1) -> None:
+    REGISTRY.incr(name, n)
+    tr = _current.get()
+    if tr is not None:
+        tr.incr(name, n)
+
+
+@contextmanager
+def trace(name: str = "query", jsonl_path: Optional[str] = None) -> Iterator[Trace]:
+    """
+    Start a request trace. Nested calls reuse the outer trace.
+    """
+    outer = _current.get()
+    if outer is not None:
+        yield outer
+        return
+
+    tr = Trace(name)
+    token = _current.set(tr)
+    try:
+        yield tr
+    finally:
+        tr.total_ms = (time.perf_counter() - tr._t0) * 1000
+        _current.reset(token)
+        log.debug("trace %s %.1fms %s", name, tr.total_ms, tr.breakdown()["stages_ms"])
+
+        if jsonl_path is None:
+            from rag_core.config import settings
+
+            jsonl_path = getattr(settings, "TRACE_JSONL", "")
+        if jsonl_path:
+            export_jsonl(tr, jsonl_path)
+
+
+def bind(fn: Callable) -> Callable:
+    """
+    Run fn in a copy of the caller's context so spans from pool threads
+    land in the caller's trace: pool.submit(bind(fn), ...)
+    """
+    ctx = contextvars.copy_context()
+
+    def _run(*args, **kwargs):
+        return ctx.copy().run(fn, *args, **kwargs)
+
+    return _run
+
+
+def export_jsonl(tr: Trace, path: str) -> None:
+    row = {"ts": tr.started, **tr.breakdown()}
+    with _jsonl_lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+_server: Optional[ThreadingHTTPServer] = None
+
+
+def serve_prometheus(port: int = 9108, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """
+    Serve REGISTRY at http://host:port/metrics on a daemon thread (idempotent).
+    """
+    global _server
+    if _server is not None:
+        return _server
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") not in ("", "/metrics"):
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = REGISTRY.to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    _server = ThreadingHTTPServer((host, int(port)), _Handler)
+    threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+    log.info("Prometheus metrics on http://%s:%s/metrics", host, port)
+    return _server
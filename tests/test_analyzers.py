@@ -0,0 +1,31 @@
+import json
+
+from rag_core.retrieval.analyzers import Analyzer
+from rag_core.retrieval.bm25_store import BM25Store
+
+
+def test_analyzer_folds_stems_and_drops_stopwords():
+    an = Analyzer(ngrams=2)
+    assert an("The Policies of Éclampsie-screening") == ["policy", "eclampsie", "screen", "policy_eclampsie", "eclampsie_screen"]
+    assert Analyzer(stemmer="none")("Schwangerschaft während") == ["schwangerschaft", "wahrend"]
+    assert Analyzer.legacy_analyzer()("Día 5") == ["d", "a", "5"]
+
+
+def test_bm25_store_new_and_legacy_format(tmp_path):
+    records = [
+        {"id": "a.pdf::chunk_0", "source": "a.pdf", "chunk_index": 0, "text": "Gestational diabetes screening in pregnancy"},
+        {"id": "b.pdf::chunk_0", "source": "b.pdf", "chunk_index": 0, "text": "Diabète gestationnel: dépistage précoce"},
+        {"id": "c.pdf::chunk_0", "source": "c.pdf", "chunk_index": 0, "text": "Annual leave is twenty days"},
+        {"id": "d.pdf::chunk_0", "source": "d.pdf", "chunk_index": 0, "text": "Remote work needs a VPN"},
+    ]
+    bm = BM25Store(index_dir=str(tmp_path / "new"))
+    bm.build_from_records(records)
+    assert BM25Store(index_dir=str(tmp_path / "new")).search("depistage diabete", k=1)[0].id == "b.pdf::chunk_0"
+    assert bm.search("screened pregnancies", k=1)[0].id == "a.pdf::chunk_0"
+
+    legacy = tmp_path / "old"
+    legacy.mkdir()
+    tokens = [Analyzer.legacy_analyzer()(r["text"]) for r in records]
+    (legacy / "bm25_meta.json").write_text(json.dumps({"meta": records, "corpus_tokens": tokens}))
+    old = BM25Store(index_dir=str(legacy))
+    assert old.analyzer.legacy and old.search("screening", k=1)[0].id == "a.pdf::chunk_0"
@@ -0,0 +1,100 @@
+import io
+import json
+import threading
+import time
+
+import pytest
+
+from rag_core.cli import _done_lines, query_main, run_queries
+from rag_core.pipeline import Pipeline
+from rag_core.retrieval.bm25_store import BM25Store
+from rag_core.retrieval.encoders import HashingEncoder
+from rag_core.retrieval.vector_store import VectorStore
+
+RECORDS = [
+    {"id": "a.pdf::chunk_0", "source": "a.pdf", "chunk_index": 0, "text": "annual leave is twenty days per year"},
+    {"id": "b.pdf::chunk_0", "source": "b.pdf", "chunk_index": 0, "text": "remote work needs a vpn connection"},
+    {"id": "c.pdf::chunk_0", "source": "c.pdf", "chunk_index": 0, "text": "fire drills happen every quarter"},
+]
+
+
+def _pipeline(tmp_path, llm):
+    vs = VectorStore(index_dir=str(tmp_path), encoder=HashingEncoder())
+    vs.build_from_records(RECORDS)
+    bm = BM25Store(index_dir=str(tmp_path))
+    bm.build_from_records(RECORDS)
+    return Pipeline(vs, bm, llm)
+
+
+def test_run_queries_batches_and_bounds_llm_concurrency(tmp_path, monkeypatch):
+    from rag_core.config import settings
+
+    monkeypatch.setattr(settings, "ENABLE_CRAG", False)
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def llm(prompt):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.01)
+        with lock:
+            active[0] -= 1
+        return "Answer [b.pdf | chunk 0]"
+
+    pipe = _pipeline(tmp_path, llm)
+    calls = []
+    real = pipe.retrieve_batch
+    monkeypatch.setattr(pipe, "retrieve_batch", lambda qs, **kw: calls.append(len(qs)) or real(qs, **kw))
+
+    queries = [(i, q) for i, q in enumerate(["remote vpn", "annual leave", "fire drills", "vpn access", "leave days"], 1)]
+    out = io.StringIO()
+    totals = run_queries(pipe, iter(queries), out, batch_size=2, concurrency=2, skip={3})
+
+    rows = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [r["line"] for r in rows] == [1, 2, 4, 5]
+    assert calls == [2, 2]
+    assert peak[0] <= 2
+    assert totals["queries"] == 4 and totals["skipped"] == 1 and totals["errors"] == 0
+    assert rows[0]["sources"][0]["source"] == "b.pdf"
+    assert set(rows[0]["timings"]) == {"retrieve_ms", "generate_ms", "stages_ms"}
+
+
+def test_done_lines_ignores_errors_and_partial_lines(tmp_path):
+    p = tmp_path / "out.jsonl"
+    p.write_text('{"line": 1, "error": ""}\n{"line": 2, "error": "Timeout"}\n{"line": 3, "err')
+    assert _done_lines(str(p)) == {1}
+
+
+def test_rerank_runs_inside_the_concurrency_pool(tmp_path, monkeypatch):
+    from rag_core.config import settings
+
+    monkeypatch.setattr(settings, "ENABLE_CRAG", False)
+    monkeypatch.setattr(settings, "ENABLE_RERANK", True)
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def llm(prompt):
+        if "[P1]" not in prompt:
+            return "Answer [a.pdf | chunk 0]"
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return "1"
+
+    pipe = _pipeline(tmp_path, llm)
+    queries = [(i, q) for i, q in enumerate(["remote vpn", "annual leave", "fire drills", "leave days"], 1)]
+    out = io.StringIO()
+    totals = run_queries(pipe, iter(queries), out, batch_size=4, concurrency=3)
+
+    assert totals["errors"] == 0
+    assert 2 <= peak[0] <= 3
+
+
+def test_resume_requires_an_output_file(capsys):
+    with pytest.raises(SystemExit) as exc:
+        query_main(["queries.txt", "--resume"])
+    assert exc.value.code == 2 and "--resume needs --out FILE" in capsys.readouterr().err
@@ -0,0 +1,20 @@
+from rag_core.generation.context import build_context, count_tokens
+from rag_core.ingestion.chunkers import chunk_text
+from rag_core.schemas import DocChunk
+
+TEXT = " ".join(f"Sentence number {i} describes the leave policy in detail." for i in range(40))
+
+def test_adjacent_chunks_merge_without_repeating_overlap():
+    chunks = chunk_text(TEXT, size=800, overlap=200)
+    docs = [DocChunk(id=str(i), text=c, source="a.pdf", chunk_index=i, score=1.0 - i * 0.1)
+            for i, c in enumerate(chunks[:2])]
+    ctx = build_context(docs, max_tokens=10_000)
+    assert ctx.startswith("[a.pdf | chunk 0-1]")
+    assert ctx.count("Sentence number 12 ") == 1
+
+def test_budget_skips_what_does_not_fit():
+    big = DocChunk(id="1", text="x " * 2000, source="a.pdf", chunk_index=0, score=0.9)
+    small = DocChunk(id="2", text="Notice period is one month.", source="b.pdf", chunk_index=5, score=0.5)
+    ctx = build_context([big, small], max_tokens=50)
+    assert ctx == "[b.pdf | chunk 5]\nNotice period is one month."
+    assert count_tokens(ctx) <= 50
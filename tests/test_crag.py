@@ -0,0 +1,37 @@
+from rag_core.config import settings
+from rag_core.generation.crag import crag_run
+from rag_core.pipeline import Pipeline
+from rag_core.schemas import DocChunk
+
+class LegStore:
+    def __init__(self, docs):
+        self.docs = docs
+        self.calls = []
+
+    def search(self, q, k=5):
+        self.calls.append(k)
+        return self.docs[:k]
+
+def _docs(ids, scores):
+    return [DocChunk(id=i, text=f"text {i}", source="a.pdf", chunk_index=n, score=s)
+            for n, (i, s) in enumerate(zip(ids, scores))]
+
+def test_confident_query_skips_escalation():
+    prompts = []
+    vs = LegStore(_docs(["1", "2"], [0.9, 0.3]))
+    bm = LegStore(_docs(["1", "2"], [12.0, 2.0]))
+    pipe = Pipeline(vs, bm, llm=lambda p: prompts.append(p) or "answer [a.pdf | chunk 0]")
+    answer, _, docs = crag_run(pipe, "leave policy", threshold=0.5)
+    assert answer == "answer [a.pdf | chunk 0]" and docs
+    assert len(prompts) == 1 and len(vs.calls) == 1
+    assert [s["step"] for s in pipe.last_crag["steps"]] == ["initial"]
+
+def test_low_confidence_widens_before_generating(monkeypatch):
+    monkeypatch.setattr(settings, "ENABLE_RERANK", False)
+    prompts = []
+    vs = LegStore(_docs(["1", "2"], [0.1, 0.1]))
+    bm = LegStore(_docs(["3", "4"], [1.0, 1.0]))
+    pipe = Pipeline(vs, bm, llm=lambda p: prompts.append(p) or "x")
+    crag_run(pipe, "q", max_iters=1, threshold=0.9)
+    assert vs.calls[1] > vs.calls[0]
+    assert len(prompts) == 1
@@ -0,0 +1,45 @@
+from rag_core.ingestion.dedup import dedup_records
+from rag_core.retrieval.diversity import mmr_select
+from rag_core.schemas import DocChunk
+
+FOOTER = "Confidential. This policy is the property of Acme Corp and may not be shared outside the company."
+
+def test_dedup_collapses_repeated_footers():
+    records = [
+        {"id": "a.pdf::chunk_0", "source": "a.pdf", "chunk_index": 0, "text": FOOTER},
+        {"id": "a.pdf::chunk_1", "source": "a.pdf", "chunk_index": 1, "text": "Employees get 20 days of paid leave."},
+        {"id": "b.pdf::chunk_3", "source": "b.pdf", "chunk_index": 3, "text": FOOTER + "  "},
+    ]
+    out = dedup_records(records, threshold=0.9)
+    assert [r["id"] for r in out] == ["a.pdf::chunk_0", "a.pdf::chunk_1"]
+    assert {loc["source"] for loc in out[0]["locations"]} == {"a.pdf", "b.pdf"}
+
+HANDBOOK = (
+    "This handbook is issued by Acme Corp to all employees and contractors. It describes the leave policy, "
+    "the remote work rules, the equipment allowance and the code of conduct. Managers must make sure that every "
+    "new starter receives a copy during the first week. Questions about this handbook go to the people team, who "
+    "review it every year and publish changes on the intranet. Local law takes precedence where it grants more "
+    "rights. Breaches of the code of conduct are handled under the disciplinary procedure described in section 9, "
+    "and serious breaches may lead to dismissal without notice."
+)
+
+def test_dedup_default_threshold_on_real_revisions():
+    revised = HANDBOOK.replace("Acme Corp", "Acme Corporation")
+    dose = "Insulin is started at 0.1 units per kg when fasting glucose stays above 5.3 mmol/L for one week."
+    records = [
+        {"id": "v1.pdf::chunk_0", "source": "v1.pdf", "chunk_index": 0, "text": HANDBOOK},
+        {"id": "v2.pdf::chunk_0", "source": "v2.pdf", "chunk_index": 0, "text": revised},
+        {"id": "v1.pdf::chunk_1", "source": "v1.pdf", "chunk_index": 1, "text": dose},
+        {"id": "v2.pdf::chunk_1", "source": "v2.pdf", "chunk_index": 1, "text": dose.replace("5.3", "5.8")},
+    ]
+    out = dedup_records(records)  # default threshold 0.9
+    # one-word revision of a ~100-word chunk collapses; a changed dose is kept
+    assert [r["id"] for r in out] == ["v1.pdf::chunk_0", "v1.pdf::chunk_1", "v2.pdf::chunk_1"]
+    assert {loc["source"] for loc in out[0]["locations"]} == {"v1.pdf", "v2.pdf"}
+
+def test_mmr_prefers_diverse_docs():
+    docs = [DocChunk(id="1", text="leave policy days", source="a.pdf", score=1.0),
+            DocChunk(id="2", text="leave policy days", source="b.pdf", score=0.95),
+            DocChunk(id="3", text="remote work equipment", source="c.pdf", score=0.9)]
+    res = mmr_select(docs, top_k=2, lambda_=0.5)
+    assert [d.id for d in res] == ["1", "3"]
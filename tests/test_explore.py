@@ -0,0 +1,50 @@
+import json
+
+from rag_core.pipeline import Pipeline
+from rag_core.retrieval.bm25_store import BM25Store
+from rag_core.retrieval.encoders import HashingEncoder
+from rag_core.retrieval.filters import MetadataFilter
+from rag_core.retrieval.vector_store import VectorStore
+
+
+class CountingLLM:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, prompt):
+        self.calls += 1
+        return json.dumps({"snapshot": "s", "topics": ["t"], "questions": [{"q": "q?", "support": []}]})
+
+
+def _records(stamp):
+    return [
+        {"id": f"{src}::chunk_{i}", "source": src, "chunk_index": i, "text": f"{src} screening and treatment note {i}",
+         "uploaded_at": stamp}
+        for src in ("a.pdf", "b.pdf")
+        for i in range(3)
+    ]
+
+
+def _pipeline(tmp_path, records, llm):
+    vs = VectorStore(index_dir=str(tmp_path), encoder=HashingEncoder())
+    bm = BM25Store(index_dir=str(tmp_path))
+    vs.build_from_records(records)
+    bm.build_from_records(records)
+    return Pipeline(vs, bm, llm)
+
+
+def test_explore_is_cached_per_scope_and_version(tmp_path):
+    llm = CountingLLM()
+    pipe = _pipeline(tmp_path, _records("2024-01-01T00:00:00"), llm)
+
+    first = pipe.explore()
+    assert pipe.explore() == first and llm.calls == 1
+
+    assert pipe.warm_explore() == 2 and llm.calls == 3
+    pipe.explore(MetadataFilter(sources=["a.pdf"]))
+    assert llm.calls == 3
+
+    # survives a restart; a re-ingested corpus invalidates it
+    assert Pipeline(pipe.vector_store, pipe.bm25_store, llm).explore() == first and llm.calls == 3
+    _pipeline(tmp_path, _records("2024-02-01T00:00:00"), llm).explore()
+    assert llm.calls == 4
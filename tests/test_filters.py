@@ -0,0 +1,38 @@
+from rag_core.retrieval.bm25_store import BM25Store
+from rag_core.retrieval.encoders import HashingEncoder
+from rag_core.retrieval.filters import MetadataFilter
+from rag_core.retrieval.vector_store import VectorStore
+
+RECORDS = [
+    {"id": "a.pdf::chunk_0", "source": "a.pdf", "chunk_index": 0, "text": "leave policy twenty days",
+     "uploaded_at": "2024-01-10T09:00:00", "tags": ["hr"]},
+    {"id": "a.pdf::chunk_1", "source": "a.pdf", "chunk_index": 1, "text": "notice period one month",
+     "uploaded_at": "2024-01-10T09:00:00", "tags": ["hr"]},
+    {"id": "b.pdf::chunk_0", "source": "b.pdf", "chunk_index": 0, "text": "leave policy for contractors",
+     "uploaded_at": "2024-06-01T09:00:00", "tags": ["legal"]},
+]
+
+def test_filters_restrict_both_indexes(tmp_path):
+    bm = BM25Store(index_dir=str(tmp_path))
+    bm.build_from_records(RECORDS)
+    vs = VectorStore(index_dir=str(tmp_path), encoder=HashingEncoder())
+    vs.build_from_records(RECORDS)
+
+    for flt in (MetadataFilter(sources=["b.pdf"]), MetadataFilter(tags=["legal"]),
+                MetadataFilter(uploaded_after="2024-03-01")):
+        assert [d.source for d in bm.search("leave policy", k=5, filters=flt)] == ["b.pdf"]
+        assert [d.source for d in vs.search("leave policy", k=5, filters=flt)] == ["b.pdf"]
+
+    assert bm.search("leave", k=5, filters=MetadataFilter(sources=["missing.pdf"])) == []
+
+
+def test_fully_deduplicated_source_keeps_its_metadata(tmp_path):
+    copy = {**RECORDS[0], "id": "c.pdf::chunk_0", "source": "c.pdf", "uploaded_at": "2025-02-01T09:00:00", "tags": ["audit"]}
+    bm = BM25Store(index_dir=str(tmp_path))
+    bm.build_from_records([RECORDS[0], copy], dedup=True)
+
+    assert len(bm.meta) == 1 and set(bm.sources.attrs) == {"a.pdf", "c.pdf"}
+    assert "audit" in bm.sources.tags
+    for flt in (MetadataFilter(tags=["audit"]), MetadataFilter(uploaded_after="2025-01-01")):
+        assert bm.sources.matching_sources(flt) == ["c.pdf"]
+        assert len(bm.search("leave policy", k=5, filters=flt)) == 1
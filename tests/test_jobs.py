@@ -0,0 +1,66 @@
+import time
+
+import rag_core.jobs as jobs
+from rag_core.jobs import JobQueue, run_job, worker
+from rag_core.retrieval.encoders import HashingEncoder
+from rag_core.retrieval.vector_store import VectorStore
+
+
+def _fake_pdfs(tmp_path, n):
+    paths = []
+    for i in range(n):
+        p = tmp_path / f"doc{i}.pdf"
+        p.write_text(f"document {i}")
+        paths.append(str(p))
+    return paths
+
+
+def _patch_extract(monkeypatch, calls):
+    def fake(paths, chunk_size=800, overlap=200, tags=None):
+        calls.extend(paths)
+        src = paths[0].rsplit("/", 1)[-1]
+        return [{"id": f"{src}::chunk_0", "source": src, "chunk_index": 0, "text": f"policy text of {src}"}]
+
+    monkeypatch.setattr(jobs, "build_chunk_records", fake)
+
+
+def test_worker_runs_jobs_and_honours_cancel(tmp_path, monkeypatch):
+    calls = []
+    _patch_extract(monkeypatch, calls)
+    q = JobQueue(str(tmp_path / "jobs"))
+    index_dir = str(tmp_path / "idx")
+    paths = _fake_pdfs(tmp_path, 3)
+
+    keep = q.submit("build", paths, index_dir=index_dir)
+    dropped = q.submit("build", paths, index_dir=index_dir)
+    q.cancel(dropped)
+    worker(q, once=True, encoder=HashingEncoder())
+
+    job = q.get(keep)
+    assert job["status"] == "done" and len(job["progress"]["files_done"]) == 3
+    assert q.get(dropped)["status"] == "cancelled"
+    assert len(VectorStore(index_dir=index_dir, encoder=HashingEncoder()).meta) == 3
+
+    # update jobs reuse the per-file checkpoints
+    calls.clear()
+    run_job(q, q.get(q.submit("update", paths, index_dir=index_dir)), encoder=HashingEncoder())
+    assert calls == []
+
+
+def test_stale_running_job_is_requeued_and_resumes(tmp_path, monkeypatch):
+    calls = []
+    _patch_extract(monkeypatch, calls)
+    q = JobQueue(str(tmp_path / "jobs"), stale_seconds=5)
+    paths = _fake_pdfs(tmp_path, 2)
+    job_id = q.submit("build", paths, index_dir=str(tmp_path / "idx"))
+
+    # simulate a worker that finished one file and then died
+    job = q.claim()
+    jobs._write_json(q.chunk_path(paths[0], 800, 200), {"records": jobs.build_chunk_records([paths[0]])})
+    q.update(job_id, worker_pid=-1, progress={**job["progress"], "files_done": [paths[0]]})
+    jobs._write_json(q._path(job_id), {**q.get(job_id), "heartbeat": time.time() - 60})
+    calls.clear()
+
+    assert q.requeue_stale() == [job_id]
+    worker(q, once=True, encoder=HashingEncoder())
+    assert q.get(job_id)["status"] == "done" and calls == [paths[1]]
@@ -0,0 +1,75 @@
+import pytest
+
+from rag_core.llm_cache import CachedLLM, ReplayMiss
+
+
+def _counting_llm(calls):
+    def llm(prompt):
+        calls.append(prompt)
+        return f"answer to {prompt}"
+
+    return llm
+
+
+def test_readwrite_hits_and_key_includes_model_and_temperature(tmp_path):
+    path = str(tmp_path / "c.sqlite")
+    calls = []
+    llm = CachedLLM(_counting_llm(calls), model="m1", temperature=0.0, path=path, mode="readwrite")
+    assert llm("q") == llm("q") == "answer to q"
+    assert calls == ["q"] and llm.hits == 1 and llm.misses == 1
+
+    CachedLLM(_counting_llm(calls), model="m1", temperature=0.7, path=path, mode="readwrite")("q")
+    CachedLLM(_counting_llm(calls), model="m2", temperature=0.0, path=path, mode="readwrite")("q")
+    assert len(calls) == 3
+
+
+def test_record_then_replay_without_llm(tmp_path):
+    path = str(tmp_path / "c.sqlite")
+    calls = []
+    rec = CachedLLM(_counting_llm(calls), model="m", path=path, mode="record")
+    rec("a")
+    rec("a")  # record always calls through and overwrites
+    assert len(calls) == 2
+
+    replay = CachedLLM(None, model="m", path=path, mode="replay", ttl_s=1e-9)  # TTL ignored on replay
+    assert replay("a") == "answer to a"
+    with pytest.raises(ReplayMiss):
+        replay("never recorded")
+
+
+def test_ttl_and_size_eviction(tmp_path, monkeypatch):
+    import rag_core.llm_cache as lc
+
+    path = str(tmp_path / "c.sqlite")
+    calls = []
+    now = [1000.0]
+    monkeypatch.setattr(lc.time, "time", lambda: now[0])
+
+    llm = CachedLLM(_counting_llm(calls), model="m", path=path, mode="readwrite", ttl_s=10, max_mb=0.002)
+    llm("old")
+    now[0] += 11
+    llm("old")  # expired -> called again
+    assert calls == ["old", "old"]
+
+    for i in range(20):
+        now[0] += 1
+        llm(f"q{i}")
+    stats = llm.stats()
+    assert stats["mb"] <= 0.002
+    assert stats["entries"] < 21
+    llm("q19")  # most recent entry survived eviction
+    assert calls[-1] == "q19" and calls.count("q19") == 1
+
+
+def test_build_llm_wraps_stub_backend(tmp_path, monkeypatch):
+    from rag_core.config import settings
+    from rag_core.llm import build_llm
+
+    monkeypatch.setattr(settings, "LLM_BACKEND", "stub")
+    monkeypatch.setattr(settings, "LLM_CACHE_PATH", str(tmp_path / "c.sqlite"))
+    monkeypatch.setattr(settings, "STUB_LLM_LATENCY_MS", 0.0)
+    monkeypatch.setattr(settings, "STUB_LLM_TOKENS_PER_S", 0.0)
+    llm, err = build_llm(cache="readwrite")
+    assert err is None and isinstance(llm, CachedLLM)
+    prompt = "CONTEXT:\n[a.pdf | chunk 1]\ntext"
+    assert llm(prompt) == llm(prompt) and llm.hits == 1
@@ -0,0 +1,58 @@
+import pytest
+
+from rag_core.llm import StubLLM, StubLLMError
+from rag_core.loadtest import PipelineTarget, offline_pipeline, run_load, synthetic_corpus, synthetic_queries
+
+
+def test_stub_llm_cites_context_and_injects_errors():
+    llm = StubLLM(latency_ms=0, tokens_per_s=0, output_tokens=4, seed=0)
+    prompt = "Cite like [x.pdf | chunk 94]\nCONTEXT:\n[a.pdf | chunk 3]\ntext\n\nQUESTION:\nq"
+    assert llm(prompt).endswith("[a.pdf | chunk 3]")
+    assert llm("CONTEXT:\n[a.pdf | section 2]\ntext\n[b.pdf | chunk 4-6]\ntext").endswith("[a.pdf | section 2] [b.pdf | chunk 4-6]")
+
+    failing = StubLLM(latency_ms=0, tokens_per_s=0, error_rate=1.0, seed=0)
+    with pytest.raises(StubLLMError):
+        failing("CONTEXT: [a.pdf | chunk 0]")
+
+
+def test_stub_llm_latency_distributions():
+    for dist in ("fixed", "uniform", "exponential", "lognormal"):
+        llm = StubLLM(latency_ms=100, jitter=0.3, distribution=dist, seed=1)
+        samples = [llm.sample_latency() for _ in range(200)]
+        assert all(s >= 0 for s in samples)
+        assert 0.05 < sum(samples) / len(samples) < 0.2
+
+
+def test_run_load_reports_throughput_percentiles_and_stages(tmp_path, monkeypatch):
+    from rag_core.config import settings
+
+    monkeypatch.setattr(settings, "ENABLE_CRAG", False)
+    llm = StubLLM(latency_ms=5, distribution="fixed", tokens_per_s=0, error_rate=0.2, seed=3)
+    pipe = offline_pipeline(index_dir=str(tmp_path), records=synthetic_corpus(n_docs=6, chunks_per_doc=3), llm=llm)
+
+    rep = run_load(PipelineTarget(pipe), synthetic_queries(20), qps=100, duration_s=0.3, max_inflight=4, arrival="constant")
+
+    assert rep["requests"] == 30
+    assert 0 < rep["errors"] < rep["requests"]
+    assert rep["latency_ms"]["p50"] <= rep["latency_ms"]["p99"]
+    assert rep["peak_inflight"] <= 4
+    assert "llm_call" in rep["stages"] and rep["stages"]["llm_call"]["p50_ms"] >= 5
+    assert rep["bottleneck"] in rep["stages"]
+
+
+def test_configured_llm_bypasses_the_llm_cache(monkeypatch):
+    from types import SimpleNamespace
+
+    import rag_core.llm as llm_mod
+    from rag_core.loadtest import _load_target
+
+    calls = []
+
+    def fake_build_llm(**kwargs):
+        calls.append(kwargs)
+        return StubLLM(latency_ms=0, tokens_per_s=0), None
+
+    monkeypatch.setattr(llm_mod, "build_llm", fake_build_llm)
+    args = SimpleNamespace(queries="", url="", llm="configured", namespace="", synthetic_docs=2)
+    _load_target(args)
+    assert calls == [{"cache": "off"}]
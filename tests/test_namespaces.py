@@ -0,0 +1,125 @@
+import pytest
+
+from rag_core.namespaces import IndexPool, Namespace, list_namespaces, namespace_dir, namespace_exists, open_namespace
+
+
+class _Store:
+    def __init__(self, n=1):
+        self.meta = [{}] * n
+
+
+def _loader(sizes, calls):
+    def load(name, encoder=None, root=None):
+        calls.append(name)
+        ns = Namespace(name, "", _Store(), _Store())
+        ns.nbytes = sizes[name]
+        return ns
+
+    return load
+
+
+def test_pool_lru_eviction_under_budget():
+    calls = []
+    pool = IndexPool(budget_mb=3, encoder=object(), loader=_loader({"a": 1_000_000, "b": 1_000_000, "c": 1_500_000}, calls))
+
+    a = pool.get("a")
+    pool.get("b")
+    assert pool.get("a") is a  # hit, a becomes most recent
+    pool.get("c")  # 3.5 MB > 3 MB -> evict least recently used (b)
+
+    assert pool.loaded() == ["a", "c"]
+    assert calls == ["a", "b", "c"]
+    assert pool.stats()["evictions"] == 1 and pool.stats()["hits"] == 1
+
+    pool.get("b")
+    assert calls[-1] == "b" and "b" in pool.loaded()
+
+    pool.invalidate("c")
+    assert "c" not in pool.loaded()
+
+
+def test_oversized_namespace_is_kept():
+    pool = IndexPool(budget_mb=1, encoder=object(), loader=_loader({"big": 5_000_000}, []))
+    assert pool.get("big").name == "big"
+    assert pool.loaded() == ["big"]
+
+
+def test_namespace_layout_and_validation(tmp_path):
+    root = str(tmp_path)
+    assert namespace_dir("default", root) == root
+    assert namespace_dir("team-a", root) == str(tmp_path / "ns" / "team-a")
+    with pytest.raises(ValueError):
+        namespace_dir("../etc", root)
+
+    (tmp_path / "ns" / "team-a").mkdir(parents=True)
+    assert list_namespaces(root) == ["default", "team-a"]
+
+
+def test_namespaces_have_separate_indexes(tmp_path):
+    from rag_core.retrieval.bm25_store import BM25Store
+
+    root = str(tmp_path)
+    for name, text in (("team-a", "annual leave policy"), ("team-b", "fire safety drill")):
+        d = namespace_dir(name, root)
+        records = [{"id": f"{name}.pdf::chunk_0", "source": f"{name}.pdf", "chunk_index": 0, "text": text}]
+        BM25Store(index_dir=d).build_from_records(records)
+
+    ns = open_namespace("team-b", encoder=object(), root=root)
+    assert [m["source"] for m in ns.bm25_store.meta] == ["team-b.pdf"]
+    assert ns.nbytes > 0
+
+
+def test_evicted_sharded_namespace_keeps_serving_its_holders(tmp_path):
+    from rag_core.retrieval.bm25_store import BM25Store
+    from rag_core.retrieval.sharded import open_sharded
+
+    records = [{"id": "a.pdf::chunk_0", "source": "a.pdf", "chunk_index": 0, "text": "annual leave policy"}]
+
+    def load(name, encoder=None, root=None):
+        store = open_sharded(lambda d: BM25Store(index_dir=d), str(tmp_path / name), n_shards=2)
+        for shard in store.shards:
+            shard.build_from_records(records)
+        ns = Namespace(name, "", store, store)
+        ns.nbytes = 1_000_000
+        return ns
+
+    pool = IndexPool(budget_mb=1, encoder=object(), loader=load)
+    held = pool.get("a").bm25_store  # e.g. a session's Pipeline
+    pool.get("b")  # evicts "a"
+    pool.invalidate("b")
+
+    assert pool.loaded() == [] and held.search("annual leave", k=1)[0].source == "a.pdf"
+
+
+def test_typed_namespace_is_not_created(tmp_path):
+    root = str(tmp_path)
+    assert namespace_exists("default", root)
+    assert not namespace_exists("team-typo", root)
+    assert list_namespaces(root) == ["default"]
+
+
+def test_pool_reloads_namespace_rebuilt_by_another_process(tmp_path):
+    import os
+
+    from rag_core.retrieval.bm25_store import BM25Store
+
+    root = str(tmp_path)
+    d = namespace_dir("team-a", root)
+
+    def build(text, mtime):
+        BM25Store(index_dir=d).build_from_records([{"id": "a.pdf::chunk_0", "source": "a.pdf", "chunk_index": 0, "text": text}])
+        for f in os.listdir(d):
+            os.utime(os.path.join(d, f), ns=(mtime, mtime))
+
+    def load(name, encoder=None, root=None):
+        bm = BM25Store(index_dir=namespace_dir(name, root))
+        return Namespace(name, namespace_dir(name, root), bm, bm)
+
+    build("annual leave policy", 1_000_000_000)
+    pool = IndexPool(budget_mb=10, encoder=object(), loader=load, root=root)
+    first = pool.get("team-a")
+    assert pool.get("team-a") is first
+
+    build("fire safety drill", 2_000_000_000)  # e.g. rag-index in another process
+    second = pool.get("team-a")
+    assert second is not first and second.bm25_store.search("fire drill", k=1)[0].text == "fire safety drill"
@@ -0,0 +1,87 @@
+import rag_core.ingestion.corpus as corpus
+from rag_core.config import settings
+from rag_core.ingestion.corpus import iter_chunk_records, parent_windows
+from rag_core.jobs import build_indexes, index_pdfs
+from rag_core.pipeline import Pipeline
+from rag_core.retrieval.bm25_store import BM25Store
+from rag_core.retrieval.encoders import HashingEncoder
+from rag_core.retrieval.parents import ParentStore
+from rag_core.retrieval.vector_store import VectorStore
+
+PAGES = [
+    "Gestational diabetes is screened with an oral glucose tolerance test at 24 to 28 weeks.",
+    "",
+    "Insulin is started when diet fails. Doses are adjusted weekly from fasting glucose readings.",
+    "Postpartum follow-up includes a repeat glucose test six to twelve weeks after delivery. " * 3,
+]
+
+
+def test_parent_windows_group_pages():
+    wins = parent_windows(PAGES, size=200)
+    assert [(a, b) for a, b, _ in wins] == [(1, 3), (4, 4), (4, 4)]
+    assert "Insulin is started" in wins[0][2]
+    assert all(len(t) <= 200 for _, _, t in wins)
+
+
+def test_children_are_indexed_and_parents_expand_lazily(tmp_path, monkeypatch):
+    pdf = tmp_path / "gdm.pdf"
+    pdf.write_text("x")
+    monkeypatch.setattr(corpus, "load_pdf_pages", lambda path: PAGES)
+    monkeypatch.setattr(settings, "ENABLE_DEDUP", False)
+
+    records = list(iter_chunk_records([str(pdf)], chunk_size=60, overlap=10, parent_size=200))
+    children = [r for r in records if r.get("kind") != "parent"]
+    assert all(r["parent_id"].startswith("gdm.pdf::parent_") for r in children)
+
+    enc = HashingEncoder()
+    idx = str(tmp_path / "idx")
+    assert build_indexes(lambda: iter(records), idx, encoder=enc) == len(children)
+
+    vs, bm = VectorStore(index_dir=idx, encoder=enc), BM25Store(index_dir=idx)
+    assert {m["id"] for m in vs.meta} == {r["id"] for r in children}
+    assert ParentStore(idx).get_many(["gdm.pdf::parent_0"])["gdm.pdf::parent_0"]["page_end"] == 3
+
+    prompts = []
+    pipe = Pipeline(vs, bm, lambda p: prompts.append(p) or "ok [gdm.pdf | section 0]")
+    docs = pipe.retrieve_only("insulin doses adjusted weekly")
+    assert all(d.parent_id for d in docs)
+
+    answer, _, sent = pipe.generate("insulin doses adjusted weekly", docs)
+    assert len({d.id for d in sent}) == len(sent) <= len(docs)
+    assert all(d.method == "parent" for d in sent)
+    assert "[gdm.pdf | section 0" in prompts[0] and "Gestational diabetes is screened" in prompts[0]
+    assert answer.endswith("[gdm.pdf | section 0]")
+
+
+def test_index_pdfs_follows_parent_child_setting(tmp_path, monkeypatch):
+    pdf = tmp_path / "gdm.pdf"
+    pdf.write_text("x")
+    monkeypatch.setattr(corpus, "load_pdf_pages", lambda path: PAGES)
+    monkeypatch.setattr(corpus, "load_pdfs", lambda path: "\n".join(PAGES))
+    monkeypatch.setattr(settings, "ENABLE_DEDUP", False)
+    monkeypatch.setattr(settings, "ENABLE_PARENT_CHILD", True)
+    monkeypatch.setattr(settings, "PARENT_CHUNK_SIZE", 200)
+
+    idx = str(tmp_path / "idx")
+    index_pdfs([str(pdf)], idx, encoder=HashingEncoder(), chunk_size=60, overlap=10)
+    vs, bm = VectorStore(index_dir=idx, encoder=HashingEncoder()), BM25Store(index_dir=idx)
+    assert all(m.get("parent_id") for m in vs.meta) and len(bm.meta) == len(vs.meta)
+    assert "Insulin is started" in ParentStore(idx).get_many(["gdm.pdf::parent_0"])["gdm.pdf::parent_0"]["text"]
+
+    monkeypatch.setattr(settings, "ENABLE_PARENT_CHILD", False)
+    index_pdfs([str(pdf)], idx, encoder=HashingEncoder(), chunk_size=60, overlap=10)
+    vs = VectorStore(index_dir=idx, encoder=HashingEncoder())
+    assert not any(m.get("parent_id") for m in vs.meta) and not ParentStore(idx).exists()
+
+
+def test_parent_stores_are_shared_and_follow_rebuilds(tmp_path):
+    from rag_core.retrieval.parents import parent_stores
+
+    vs = VectorStore(index_dir=str(tmp_path), encoder=HashingEncoder())
+    ParentStore(str(tmp_path)).build_from_records([{"id": "p", "kind": "parent", "source": "a.pdf", "text": "old span"}])
+    store = parent_stores(vs)[0]
+    assert store is parent_stores(vs)[0]
+    assert store.get_many(["p"])["p"]["text"] == "old span"
+
+    ParentStore(str(tmp_path)).build_from_records([{"id": "p", "kind": "parent", "source": "a.pdf", "text": "new span"}])
+    assert store.get_many(["p"])["p"]["text"] == "new span"
@@ -0,0 +1,20 @@
+import json
+
+from rag_core.config import settings
+from rag_core.profiling import enable_profiling, profile_stage
+
+def test_profile_session_writes_stage_report(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILE_DIR", str(tmp_path))
+    enable_profiling(True)
+    try:
+        with profile_stage("index_build"):
+            for _ in range(2):
+                with profile_stage("tokenize"):
+                    _ = [str(i) for i in range(10000)]
+    finally:
+        enable_profiling(False)
+
+    report = json.loads(next(tmp_path.glob("index_build-*.json")).read_text())
+    assert report["stages"]["tokenize"]["calls"] == 2
+    assert report["peak_mb"] > 0
+    assert list(tmp_path.glob("index_build-*.folded"))
@@ -0,0 +1,43 @@
+from rag_core.generation.context import build_context
+from rag_core.ingestion.raptor import RaptorIndex
+from rag_core.retrieval.encoders import HashingEncoder
+from rag_core.retrieval.filters import MetadataFilter
+
+TOPICS = ["annual leave is twenty days per year for staff", "remote work needs a vpn connection at all times"]
+RECORDS = [
+    {"id": f"{src}::chunk_{i}", "source": src, "chunk_index": i, "text": f"{TOPICS[j]}. Note number {i} applies here."}
+    for j, src in enumerate(["a.pdf", "b.pdf"])
+    for i in range(8)
+]
+
+def test_raptor_build_search_and_reload(tmp_path):
+    enc = HashingEncoder()
+    idx = RaptorIndex(index_dir=str(tmp_path))
+    idx.build(RECORDS, encoder=enc, branching=3, max_levels=3, max_workers=2)
+    assert idx.nodes and all(n["children"] for n in idx.nodes)
+
+    hits = idx.search(enc.encode(["vpn for remote work"])[0], k=2)
+    assert hits and hits[0].source == "b.pdf" and hits[0].method == "raptor"
+
+    top = RaptorIndex(index_dir=str(tmp_path)).top_nodes(MetadataFilter(sources=["a.pdf"]), per_source=1)
+    assert len(top) == 1 and top[0].source == "a.pdf"
+    assert build_context(top).startswith("[a.pdf | summary ")
+
+
+def test_raptor_honours_tag_and_date_filters(tmp_path):
+    from rag_core.retrieval.filters import SourceTable
+
+    enc = HashingEncoder()
+    attrs = {"a.pdf": {"tags": ["hr"], "uploaded_at": "2024-01-05T10:00:00"},
+             "b.pdf": {"tags": ["it"], "uploaded_at": "2025-03-01T09:00:00"}}
+    records = [{**r, **attrs[r["source"]]} for r in RECORDS]
+    idx = RaptorIndex(index_dir=str(tmp_path))
+    idx.build(records, encoder=enc, branching=3, max_levels=2)
+
+    q = enc.encode(["vpn for remote work"])[0]
+    assert {d.source for d in idx.search(q, k=10, filters=MetadataFilter(tags=["hr"]))} == {"a.pdf"}
+    assert {d.source for d in idx.top_nodes(MetadataFilter(uploaded_after="2025-01-01"))} == {"b.pdf"}
+
+    # the leaf stores' table wins (e.g. tags changed after the tree was built)
+    table = SourceTable([{**r, "tags": ["it"]} for r in records])
+    assert {d.source for d in idx.search(q, k=10, filters=MetadataFilter(tags=["hr"]), sources=table)} == set()
@@ -0,0 +1,61 @@
+import re
+import threading
+import time
+
+from rag_core.reranking.llm_reranker import LLMReranker, parse_ranking, trim_passage, windows
+from rag_core.schemas import DocChunk
+
+
+def _docs(n):
+    return [DocChunk(id=f"d{i}", source="a.pdf", chunk_index=i, text=f"passage relevance {i:03d}") for i in range(n)]
+
+
+def _oracle_llm(calls, peak, delay=0.0):
+    """Ranks passages by the number in their text, highest first."""
+    active = [0]
+    lock = threading.Lock()
+
+    def llm(prompt):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(delay)
+        blocks = re.findall(r"\[P(\d+)\]\npassage relevance (\d+)", prompt)
+        calls.append(len(blocks))
+        with lock:
+            active[0] -= 1
+        return ",".join(p for p, _ in sorted(blocks, key=lambda b: -int(b[1])))
+
+    return llm
+
+
+def test_small_pool_is_one_prompt():
+    calls, peak = [], [0]
+    out = LLMReranker(_oracle_llm(calls, peak), window=20).rerank("q", _docs(8), top_k=3)
+    assert [d.id for d in out] == ["d7", "d6", "d5"]
+    assert calls == [8] and all(d.method == "rerank" for d in out)
+
+
+def test_tournament_finds_global_top_k_with_bounded_parallelism():
+    calls, peak = [], [0]
+    rr = LLMReranker(_oracle_llm(calls, peak, delay=0.01), window=20, stride=15, max_workers=3)
+    out = rr.rerank("q", _docs(120), top_k=5)
+    assert [d.id for d in out] == ["d119", "d118", "d117", "d116", "d115"]
+    assert max(calls) <= 20
+    assert peak[0] <= 3
+    assert rr.last_rounds <= 4
+
+
+def test_unparseable_window_keeps_input_order():
+    out = LLMReranker(lambda p: "no idea", window=20).rerank("q", _docs(10), top_k=2)
+    assert [d.id for d in out] == ["d0", "d1"]
+
+
+def test_helpers():
+    assert parse_ranking('{"ranking": [2, 2, 9, 1]}', 3) == [1, 0]
+    assert parse_ranking("3, 1", 3) == [2, 0]
+    assert [list(w) for w in windows(10, 4, 3)] == [[0, 1, 2, 3], [3, 4, 5, 6], [6, 7, 8, 9]]
+
+    text = "Intro text here. " * 30 + "Insulin dosing in pregnancy is adjusted weekly. " + "Filler sentence. " * 30
+    trimmed = trim_passage(text, "insulin dosing pregnancy", max_sentences=1)
+    assert trimmed == "Insulin dosing in pregnancy is adjusted weekly."
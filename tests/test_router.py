@@ -0,0 +1,79 @@
+import json
+
+from rag_core.retrieval.hybrid import HybridRetriever
+from rag_core.retrieval.router import QueryRouter, classify_query
+from rag_core.schemas import DocChunk
+
+DOCS = {
+    "ng3": DocChunk(id="ng3", text="NG3 diabetes in pregnancy guideline", source="ng3.pdf"),
+    "cg62": DocChunk(id="cg62", text="CG62 antenatal care", source="cg62.pdf"),
+    "diet": DocChunk(id="diet", text="diet advice for pregnant women", source="diet.pdf"),
+}
+
+
+class CountingVS:
+    def __init__(self):
+        self.queries = []
+
+    def search(self, q, k=5):
+        return self.search_batch([q], k=k)[0]
+
+    def search_batch(self, qs, k=5):
+        self.queries.extend(qs)
+        return [[DOCS["diet"].model_copy(update={"score": 0.8}), DOCS["cg62"].model_copy(update={"score": 0.3})][:k] for _ in qs]
+
+
+class KeywordBM:
+    def search(self, q, k=5):
+        terms = q.lower().split()
+        hits = [d.model_copy(update={"score": float(sum(t in d.text.lower() for t in terms))}) for d in DOCS.values()]
+        return sorted([d for d in hits if d.score > 0], key=lambda d: -d.score)[:k]
+
+
+def test_classify_query():
+    assert classify_query("NG3") == "identifier"
+    assert classify_query("guideline E11.9 section 1.2") == "identifier"
+    assert classify_query("insulin dose pregnancy") == "keyword"
+    assert classify_query("What should pregnant women eat to control glucose?") == "natural"
+
+
+def test_identifier_lookup_skips_vector_leg(tmp_path):
+    log_path = tmp_path / "routes.jsonl"
+    vs = CountingVS()
+    hy = HybridRetriever(vs, KeywordBM(), alpha=0.55, router=QueryRouter(log_path=str(log_path)))
+
+    res = hy.retrieve("NG3", top_k=2)
+    assert [d.id for d in res] == ["ng3"] and vs.queries == []
+    assert hy.last_route["kind"] == "identifier" and hy.last_route["early_exit"]
+
+    res = hy.retrieve("how should diet change in pregnancy", top_k=2)
+    assert vs.queries == ["how should diet change in pregnancy"]
+    assert res[0].id == "diet" and not hy.last_route["early_exit"]
+
+    rows = [json.loads(line) for line in log_path.read_text().splitlines()]
+    assert [r["kind"] for r in rows] == ["identifier", "natural"]
+
+
+def test_batch_encodes_only_routed_queries():
+    vs = CountingVS()
+    hy = HybridRetriever(vs, KeywordBM(), router=QueryRouter(log_path=""))
+    out = hy.retrieve_batch(["CG62", "which diet is advised during pregnancy"], top_k=2)
+    assert vs.queries == ["which diet is advised during pregnancy"]
+    assert out[0][0].id == "cg62" and out[1][0].id == "diet"
+
+
+def test_pipeline_run_early_exit_never_embeds_the_query(tmp_path, monkeypatch):
+    from rag_core.config import settings
+    from rag_core.loadtest import offline_pipeline, synthetic_corpus
+
+    for name, value in [("ENABLE_ROUTER", True), ("ENABLE_EVIDENCE_GATE", True), ("ENABLE_CRAG", False), ("ROUTER_LOG", "")]:
+        monkeypatch.setattr(settings, name, value)
+    records = synthetic_corpus(n_docs=4, chunks_per_doc=3) + [
+        {"id": "gdm.pdf::chunk_0", "source": "gdm.pdf", "chunk_index": 0, "text": "GDM-07 glucose targets in pregnancy"}
+    ]
+    p = offline_pipeline(str(tmp_path), records=records, llm=lambda prompt: "Targets are listed [gdm.pdf | chunk 0]")
+
+    answer, _, docs = p.run("GDM-07")
+    stages = p.last_trace.breakdown()["stages_ms"]
+    assert p.last_route["early_exit"] and docs[0].id == "gdm.pdf::chunk_0"
+    assert answer.startswith("Targets") and "query_encode" not in stages and "self_rag_grade" not in stages
@@ -0,0 +1,46 @@
+from rag_core.generation.self_rag import EvidenceGrader
+from rag_core.retrieval.encoders import HashingEncoder
+from rag_core.retrieval.vector_store import VectorStore
+
+RECORDS = [
+    {"id": "a.pdf::chunk_0", "source": "a.pdf", "chunk_index": 0, "text": "annual leave is twenty days per year"},
+    {"id": "b.pdf::chunk_0", "source": "b.pdf", "chunk_index": 0, "text": "remote work needs a vpn connection"},
+]
+
+def test_grader_filters_and_short_circuits(tmp_path):
+    vs = VectorStore(index_dir=str(tmp_path), encoder=HashingEncoder())
+    vs.build_from_records(RECORDS)
+    grader = EvidenceGrader(vs, min_relevance=0.2, min_sufficiency=0.3)
+
+    docs = vs.search("how many days of annual leave per year", k=2)
+    kept, sufficient = grader.filter("how many days of annual leave per year", docs)
+    assert sufficient and [d.id for d in kept] == ["a.pdf::chunk_0"]
+
+    kept, sufficient = grader.filter("quarterly revenue forecast", docs)
+    assert not sufficient
+
+
+def test_gate_keeps_exact_code_matches(tmp_path):
+    vs = VectorStore(index_dir=str(tmp_path), encoder=HashingEncoder())
+    vs.build_from_records(RECORDS + [{"id": "c.pdf::chunk_0", "source": "c.pdf", "chunk_index": 0,
+                                      "text": "Protocol GDM-07 covers glucose monitoring"}])
+    grader = EvidenceGrader(vs, min_relevance=0.99, min_sufficiency=0.99)
+
+    docs = vs.search("GDM-07", k=3)
+    kept, sufficient = grader.filter("GDM-07", docs)
+    assert sufficient and [d.id for d in kept] == ["c.pdf::chunk_0"]
+
+
+def test_gate_is_opt_in(tmp_path, monkeypatch):
+    from rag_core.config import settings
+    from rag_core.loadtest import offline_pipeline, synthetic_corpus
+
+    monkeypatch.setattr(settings, "ENABLE_CRAG", False)
+    monkeypatch.setattr(settings, "ENABLE_EVIDENCE_GATE", False)
+    records = synthetic_corpus(n_docs=4, chunks_per_doc=3) + [
+        {"id": "gdm.pdf::chunk_0", "source": "gdm.pdf", "chunk_index": 0, "text": "GDM-07 glucose targets in pregnancy"}
+    ]
+    prompts = []
+    p = offline_pipeline(str(tmp_path), records=records, llm=lambda prompt: prompts.append(prompt) or "ok [gdm.pdf | chunk 0]")
+    answer, _, docs = p.run("GDM-07")
+    assert answer != "Not available in documents." and docs[0].id == "gdm.pdf::chunk_0" and prompts
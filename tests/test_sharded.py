@@ -0,0 +1,47 @@
+from rag_core.retrieval.encoders import HashingEncoder
+from rag_core.retrieval.sharded import open_sharded, shard_of
+from rag_core.retrieval.vector_store import VectorStore
+
+def test_sharded_search_merges_top_k(tmp_path):
+    enc = HashingEncoder()
+    store = open_sharded(lambda d: VectorStore(index_dir=d, encoder=enc), str(tmp_path), n_shards=3)
+    records = [{"id": f"doc{i}.pdf::chunk_0", "source": f"doc{i}.pdf", "chunk_index": 0,
+                "text": f"policy number {i} covers topic {i}"} for i in range(9)]
+    for i, shard in enumerate(store.shards):
+        part = [r for r in records if shard_of(r["source"], 3) == i]
+        if part:
+            shard.build_from_records(part)
+
+    res = store.search("policy number 4 covers topic 4", k=3)
+    assert res[0].id == "doc4.pdf::chunk_0"
+    assert [d.score for d in res] == sorted([d.score for d in res], reverse=True)
+    assert len(store.sources.sources) == 9
+
+
+def test_emptied_shard_is_cleared_not_kept(tmp_path):
+    enc = HashingEncoder()
+    store = open_sharded(lambda d: VectorStore(index_dir=d, encoder=enc), str(tmp_path), n_shards=2)
+    store.shards[0].build_from_records([{"id": "old.pdf::chunk_0", "source": "old.pdf", "chunk_index": 0, "text": "old policy"}])
+    store.rebuild_shard(0, [])
+
+    reopened = open_sharded(lambda d: VectorStore(index_dir=d, encoder=enc), str(tmp_path), n_shards=2)
+    assert reopened.sources.sources == [] and not reopened.shards[0].meta
+
+
+def test_rebuild_without_a_source_clears_its_shard(tmp_path, monkeypatch):
+    from rag_core.config import settings
+    from rag_core.jobs import build_indexes
+
+    monkeypatch.setattr(settings, "INDEX_SHARDS", 4)
+    monkeypatch.setattr(settings, "ENABLE_RAPTOR", False)
+    enc = HashingEncoder()
+    gone = "retired.pdf"
+    names = [gone] + [n for n in (f"doc{i}.pdf" for i in range(12)) if shard_of(n, 4) != shard_of(gone, 4)]
+    records = [{"id": f"{n}::chunk_0", "source": n, "chunk_index": 0, "text": f"policy text of {n}"} for n in names]
+
+    build_indexes(lambda: iter(records), str(tmp_path), encoder=enc)
+    build_indexes(lambda: iter([r for r in records if r["source"] != gone]), str(tmp_path), encoder=enc)
+
+    store = open_sharded(lambda d: VectorStore(index_dir=d, encoder=enc), str(tmp_path), n_shards=4)
+    assert gone not in store.sources.sources and len(store.sources.sources) == len(names) - 1
+    assert all(d.source != gone for d in store.search(f"policy text of {gone}", k=len(names)))
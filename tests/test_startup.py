@@ -0,0 +1,14 @@
+from rag_core.retrieval.bm25_store import BM25Store
+from rag_core.startup_bench import SCENARIOS, probe
+
+
+def test_bm25_query_path_skips_ingestion_and_heavy_imports(tmp_path):
+    records = [
+        {"id": f"d{i}.pdf::chunk_0", "source": f"d{i}.pdf", "chunk_index": 0, "text": text}
+        for i, text in enumerate(["gestational diabetes screening", "annual leave policy", "fire safety drill"])
+    ]
+    BM25Store(index_dir=str(tmp_path)).build_from_records(records)
+
+    out = probe(SCENARIOS["bm25_query"], index_dir=str(tmp_path))
+    assert out["heavy"] == []
+    assert out["ingestion"] == []
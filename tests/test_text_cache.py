@@ -0,0 +1,61 @@
+import rag_core.ingestion.pdf_loader as pdf_loader
+from rag_core.config import settings
+from rag_core.ingestion.pdf_loader import load_pdf_pages
+from rag_core.ingestion.text_cache import TextCache, cached_pages
+
+
+def _fake_extract(monkeypatch, calls, method="text"):
+    def fake(path, ocr=True, max_pages=None):
+        calls.append((path, ocr, max_pages))
+        pages = [{"text": f"page {i} of {open(path).read()}", "method": method} for i in range(3)]
+        return pages[:max_pages] if max_pages else pages
+
+    monkeypatch.setattr(pdf_loader, "extract_pages", fake)
+
+
+def test_pages_are_extracted_once_per_content(tmp_path, monkeypatch):
+    calls = []
+    _fake_extract(monkeypatch, calls)
+    monkeypatch.setattr(settings, "TEXT_CACHE_DIR", str(tmp_path / "cache"))
+    a = tmp_path / "a.pdf"
+    a.write_text("v1")
+
+    assert load_pdf_pages(str(a)) == ["page 0 of v1", "page 1 of v1", "page 2 of v1"]
+    assert load_pdf_pages(str(a))[0] == "page 0 of v1"
+    copy = tmp_path / "renamed.pdf"
+    copy.write_text("v1")
+    assert cached_pages(str(copy))[1] == {"text": "page 1 of v1", "method": "text"}
+    assert len(calls) == 1
+
+    a.write_text("v2")
+    assert load_pdf_pages(str(a))[0] == "page 0 of v2"
+    assert len(calls) == 2
+
+    # the no-OCR two-page preview is served by the full text-layer extraction
+    assert [p["text"] for p in cached_pages(str(a), ocr=False, max_pages=2)] == ["page 0 of v2", "page 1 of v2"]
+    assert len(calls) == 2
+
+
+def test_ocr_pages_do_not_serve_no_ocr_requests(tmp_path, monkeypatch):
+    calls = []
+    _fake_extract(monkeypatch, calls, method="ocr")
+    cache = TextCache(str(tmp_path / "cache"))
+    scan = tmp_path / "scan.pdf"
+    scan.write_text("scanned")
+
+    assert cached_pages(str(scan), cache=cache)[0]["method"] == "ocr"
+    cached_pages(str(scan), ocr=False, max_pages=2, cache=cache)
+    assert calls == [(str(scan), True, None), (str(scan), False, 2)]
+
+
+def test_empty_extractions_are_not_cached(tmp_path, monkeypatch):
+    results = [[], [{"text": "", "method": "empty"}], [{"text": "recovered", "method": "ocr"}]]
+    monkeypatch.setattr(pdf_loader, "extract_pages", lambda path, ocr=True, max_pages=None: results.pop(0))
+    cache = TextCache(str(tmp_path / "cache"))
+    scan = tmp_path / "scan.pdf"
+    scan.write_text("scanned")
+
+    assert cached_pages(str(scan), cache=cache) == []
+    assert cached_pages(str(scan), cache=cache)[0]["method"] == "empty"
+    assert cached_pages(str(scan), cache=cache)[0]["text"] == "recovered"
+    assert cached_pages(str(scan), cache=cache)[0]["text"] == "recovered" and results == []
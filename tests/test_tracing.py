@@ -0,0 +1,14 @@
+from rag_core.tracing import REGISTRY, incr, span, trace
+
+def test_trace_collects_spans_and_counters():
+    with trace("t") as tr:
+        with span("bm25_score"):
+            pass
+        with span("bm25_score"):
+            pass
+        incr("cache_hits", 2)
+    out = tr.breakdown()
+    assert set(out["stages_ms"]) == {"bm25_score"}
+    assert len(out["spans"]) == 2
+    assert out["counters"] == {"cache_hits": 2}
+    assert 'rag_stage_seconds_count{stage="bm25_score"}' in REGISTRY.to_prometheus()
@@ -0,0 +1,82 @@
+import pytest
+
+from rag_core.retrieval.encoders import HashingEncoder, encoder_parity
+from rag_core.retrieval.vector_store import VectorStore
+
+RECORDS = [
+    {"id": "a.pdf::chunk_0", "source": "a.pdf", "chunk_index": 0, "text": "annual leave is twenty days"},
+    {"id": "b.pdf::chunk_0", "source": "b.pdf", "chunk_index": 0, "text": "remote work needs a vpn"},
+]
+
+def test_vector_store_with_pluggable_encoder(tmp_path):
+    vs = VectorStore(index_dir=str(tmp_path), encoder=HashingEncoder())
+    vs.build_from_records(RECORDS)
+    res = vs.search("remote work vpn", k=1)
+    assert res[0].id == "b.pdf::chunk_0"
+
+def test_encoder_parity_identical():
+    enc = HashingEncoder()
+    report = encoder_parity(enc, enc, ["leave policy", "notice period"])
+    assert report["max_drift"] < 1e-6
+
+def test_quantized_vector_store_rescoring(tmp_path):
+    for mode in ("int8", "binary"):
+        vs = VectorStore(index_dir=str(tmp_path / mode), encoder=HashingEncoder(), quantization=mode)
+        vs.build_from_records(RECORDS)
+        reloaded = VectorStore(index_dir=str(tmp_path / mode), encoder=HashingEncoder(), quantization=mode)
+        res = reloaded.search("remote work vpn", k=2)
+        assert res[0].id == "b.pdf::chunk_0"
+        assert res[0].score > res[1].score
+
+def test_streaming_build_batches_and_dedup_sidecar(tmp_path, monkeypatch):
+    from rag_core.config import settings
+    from rag_core.retrieval.bm25_store import BM25Store
+
+    monkeypatch.setattr(settings, "INGEST_BATCH_SIZE", 2)
+    records = [
+        {"id": f"{src}::chunk_{i}", "source": src, "chunk_index": i, "text": f"shared disclaimer text {i} for everyone"}
+        for src in ("a.pdf", "b.pdf")
+        for i in range(3)
+    ]
+    for mode in ("none", "int8"):
+        vs = VectorStore(index_dir=str(tmp_path / mode), encoder=HashingEncoder(), quantization=mode)
+        vs.build_from_records(iter(records), dedup=True)
+        reloaded = VectorStore(index_dir=str(tmp_path / mode), encoder=HashingEncoder(), quantization=mode)
+        assert reloaded.index.ntotal == 3 and len(reloaded.meta) == 3
+        assert sorted(loc["source"] for loc in reloaded.meta[0]["locations"]) == ["a.pdf", "b.pdf"]
+        assert sorted(reloaded.sources.sources) == ["a.pdf", "b.pdf"]
+
+    bm = BM25Store(index_dir=str(tmp_path / "bm25"))
+    bm.build_from_records(iter(records), dedup=True)
+    assert len(bm.meta) == 3 and bm.bm25.n_docs == 3
+    assert bm.search("disclaimer 2", k=1)[0].id == "a.pdf::chunk_2"
+
+def test_index_built_by_another_encoder_is_not_loaded(tmp_path):
+    vs = VectorStore(index_dir=str(tmp_path), encoder=HashingEncoder(dim=64))
+    vs.build_from_records(RECORDS)
+    assert VectorStore(index_dir=str(tmp_path), encoder=HashingEncoder(dim=64)).index.ntotal == 2
+
+    other = VectorStore(index_dir=str(tmp_path), encoder=HashingEncoder(dim=128))
+    assert other.index is None
+    with pytest.raises(RuntimeError):
+        other.search("remote work vpn", k=1)
+
+def test_failed_build_leaves_no_partial_files(tmp_path, monkeypatch):
+    from rag_core.config import settings
+
+    class FlakyEncoder(HashingEncoder):
+        calls = 0
+
+        def encode(self, texts, batch_size=32):
+            FlakyEncoder.calls += 1
+            if FlakyEncoder.calls > 1:
+                raise OSError("encoder crashed")
+            return super().encode(texts, batch_size)
+
+    monkeypatch.setattr(settings, "INGEST_BATCH_SIZE", 1)
+    for mode in ("none", "int8"):
+        FlakyEncoder.calls = 0
+        vs = VectorStore(index_dir=str(tmp_path / mode), encoder=FlakyEncoder(), quantization=mode)
+        with pytest.raises(OSError):
+            vs.build_from_records(RECORDS)
+        assert not [p.name for p in (tmp_path / mode).iterdir() if p.name.endswith(".part")]